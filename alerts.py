@@ -0,0 +1,168 @@
+"""NWS active-alerts poller.
+
+AlertPoller polls /alerts/active for one point on its own short cadence with
+conditional requests, so an unchanged poll is a 304 with no body to parse.
+It tracks alerts by ID, and when a new alert appears or an existing one is
+upgraded to a higher severity it sets its `wake` event, letting the render
+loop redraw at once instead of waiting out its regular sleep.
+"""
+
+import json
+import threading
+from collections import namedtuple
+from urllib.parse import urlsplit
+
+import http_client
+import rate_limit
+from log_config import get_logger
+
+logger = get_logger('alerts', 'alerts.log')
+
+# Constants
+ALERTS_URL = "https://api.weather.gov/alerts/active?point={lat},{lon}"
+POLL_INTERVAL = 60  # seconds
+POLL_TIMEOUT = 10  # seconds
+SEVERITY_RANK = {"Unknown": 0, "Minor": 1, "Moderate": 2, "Severe": 3, "Extreme": 4}
+
+
+class Alert(namedtuple("Alert", "id event headline severity urgency expires references")):
+    """
+    One active NWS alert.
+    """
+    __slots__ = ()
+
+    @property
+    def rank(self):
+        return SEVERITY_RANK.get(self.severity, 0)
+
+
+def decode_alerts(data):
+    """
+    Decode an /alerts/active GeoJSON response into Alert records.
+    """
+    alerts = []
+    for feature in data.get("features", []):
+        p = feature.get("properties", {})
+        alerts.append(Alert(
+            p.get("id") or feature.get("id"),
+            p.get("event", ""),
+            p.get("headline") or p.get("event", ""),
+            p.get("severity", "Unknown"),
+            p.get("urgency", "Unknown"),
+            p.get("expires") or p.get("ends"),
+            tuple(ref.get("identifier") for ref in p.get("references", [])),
+        ))
+    return alerts
+
+
+class AlertPoller:
+    """
+    Polls the active alerts for a point and wakes the render loop on new or
+    upgraded alerts.
+    """
+
+    def __init__(self, lat, lon, interval=POLL_INTERVAL, wake=None):
+        # Location's fallback coordinates are strings
+        self.url = ALERTS_URL.format(lat=round(float(lat), 4), lon=round(float(lon), 4))
+        self.host = urlsplit(self.url).hostname
+        self.interval = interval
+        self.wake = wake or threading.Event()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._etag = None
+        self._last_modified = None
+        self.alerts = {}  # id -> Alert
+        self.polls = 0
+        self.not_modified = 0
+
+    def poll(self):
+        """
+        Poll once. Returns the new or upgraded alerts (empty if nothing changed).
+        """
+        if not rate_limit.get_limiter().try_acquire(self.host):
+            logger.info("Over request budget for %s, skipping alerts poll", self.host)
+            return []
+        headers = {"Accept": "application/geo+json"}
+        if self._etag:
+            headers["If-None-Match"] = self._etag
+        if self._last_modified:
+            headers["If-Modified-Since"] = self._last_modified
+        response = http_client.get_client().request(self.url, headers=headers, timeout=POLL_TIMEOUT)
+        self.polls += 1
+        if response.status == 304:
+            self.not_modified += 1
+            return []
+        if response.status >= 400:
+            raise OSError(f"alerts poll failed: {response.status} {response.reason}")
+        self._etag = response.headers.get("ETag")
+        self._last_modified = response.headers.get("Last-Modified")
+        return self._update(decode_alerts(json.loads(response.body)))
+
+    def _update(self, alerts):
+        with self._lock:
+            previous = self.alerts
+            self.alerts = {alert.id: alert for alert in alerts}
+        changed = []
+        for alert in alerts:
+            if alert.id in previous:
+                before = [previous[alert.id]]
+            else:
+                # NWS issues an update as a new ID that references the alert it replaces
+                before = [previous[ref] for ref in alert.references if ref in previous]
+                if not before:
+                    changed.append(alert)
+                    continue
+            if alert.rank > max(b.rank for b in before):
+                changed.append(alert)
+        if changed:
+            logger.warning("New or upgraded alerts: %s", ", ".join(f"{a.event} ({a.severity})" for a in changed))
+            self.wake.set()
+        return changed
+
+    def active(self):
+        """
+        Return the active alerts, most severe first.
+        """
+        with self._lock:
+            return sorted(self.alerts.values(), key=lambda alert: -alert.rank)
+
+    def headline(self):
+        """
+        Return the most severe active alert's event name, or None.
+        """
+        active = self.active()
+        return active[0].event if active else None
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.poll()
+            except Exception as e:
+                logger.warning("Alerts poll failed: %s", e)
+            self._stop.wait(self.interval)
+
+    def start(self):
+        """
+        Start polling on a background thread.
+        """
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="alerts", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+
+def main():
+    lat, lon = 47.697, -122.3222  # Example coordinates
+    poller = AlertPoller(lat, lon)
+    print("New:", poller.poll())
+    print("Again:", poller.poll(), f"({poller.not_modified} not modified)")
+    for alert in poller.active():
+        print(f"{alert.severity}: {alert.headline}")
+
+
+if __name__ == "__main__":
+    main()
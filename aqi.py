@@ -1,7 +1,6 @@
 #!/usr/bin/python3
 
-import urllib.request
-import json
+import resilience
 from datetime import datetime
 
 # Constants
@@ -40,8 +39,7 @@ class RemoteAQI:
         """
         Fetch raw AQI forecast data from the API.
         """
-        response = urllib.request.urlopen(self.forecast_url)
-        return json.loads(response.read().decode('utf8'))
+        return resilience.get_json(self.forecast_url)
 
     def generate_forecasts(self):
         """
@@ -1,40 +1,56 @@
+import math
 import time
-import board
-import busio
 from adafruit_bme680 import Adafruit_BME680_I2C
+import i2c_bus
 # from log_config import get_logger
 
 # logger = get_logger('bme', 'bme.log')
 
+# Constants
+HEATER_TEMP = 320  # degC, the driver's default gas heater profile
+HEATER_TIME = 150  # ms
+
+
+def pressure_altitude(pressure, sea_level_pressure):
+    """
+    Altitude in metres from pressure in hPa (the international barometric formula,
+    as the Adafruit driver computes it).
+    """
+    if pressure is None or pressure <= 0:
+        return None
+    return 44330 * (1.0 - math.pow(pressure / sea_level_pressure, 0.1903))
+
+
 class BME688Sensor:
     """
     A class to interface with the BME688 sensor using CircuitPython.
     """
 
-    def __init__(self, i2c=None, sea_level_pressure=1013.25):
+    def __init__(self, i2c=None, sea_level_pressure=1013.25, address=None):
         """
         Initialize the BME688 sensor.
-        :param i2c: Optional I2C bus object. If None, a default I2C bus is created.
+        :param i2c: Optional I2C bus object. If None, the shared bus (i2c_bus) is used.
         :param sea_level_pressure: Sea level pressure in hPa for altitude calculations.
+        :param address: I2C address known to work. If None, common addresses are probed.
         """
         if i2c is None:
-            try:
-                i2c = busio.I2C(board.SCL, board.SDA)
-            except Exception as e:
-                # logger.exception("Failed to initialize I2C: %s", e)
-                raise
+            i2c = i2c_bus.get_bus()
 
         # Try common I2C addresses for BME sensors
-        addresses = [None, 0x77, 0x76]
+        addresses = [None, 0x77, 0x76] if address is None else [address]
         self.sensor = None
+        self.address = None
+        self.last_error = None
         for addr in addresses:
             try:
                 if addr is None:
                     # logger.debug("Attempting to create BME sensor without explicit address")
                     self.sensor = Adafruit_BME680_I2C(i2c)
+                    self.address = 0x77  # the driver's default
                 else:
                     # logger.debug("Attempting to create BME sensor with address 0x%02X", addr)
                     self.sensor = Adafruit_BME680_I2C(i2c, address=addr)
+                    self.address = addr
                 # If creation succeeded, break
                 # logger.info("BME sensor initialized (address=%s)", hex(addr) if addr else 'auto')
                 break
@@ -47,31 +63,78 @@ class BME688Sensor:
             # logger.error("Failed to initialize BME sensor on any known address")
             raise RuntimeError("BME sensor not found on I2C bus")
 
+        self.sea_level_pressure = sea_level_pressure
         self.sensor.sea_level_pressure = sea_level_pressure
+        self.gas_enabled = True  # the driver starts with the heater on
+
+    def _set_gas(self, enabled):
+        """
+        Turn the gas heater on or off. Returns False if the driver cannot.
+        """
+        if enabled == self.gas_enabled:
+            return True
+        set_gas_heater = getattr(self.sensor, 'set_gas_heater', None)
+        if set_gas_heater is None:
+            return False
+        # The driver disables the heater when given None
+        ok = set_gas_heater(HEATER_TEMP, HEATER_TIME) if enabled else set_gas_heater(None, None)
+        if ok is not False:
+            self.gas_enabled = enabled
+        return self.gas_enabled == enabled
+
+    def _snapshot(self, gas):
+        """
+        Take one forced measurement and derive every field from it.
+
+        Each driver property calls _perform_reading(), which starts a new
+        conversion (and gas heater cycle) unless the last one is younger than
+        _min_refresh_time. Pinning that for the duration makes every property
+        read the same conversion.
+        """
+        perform_reading = getattr(self.sensor, '_perform_reading', None)
+        if perform_reading is None:
+            # Unknown driver version; fall back to the properties as they are
+            return self.sensor.temperature, self.sensor.humidity, self.sensor.pressure, \
+                self.sensor.gas if gas else None
+        refresh_time = self.sensor._min_refresh_time
+        self.sensor._last_reading = 0  # force a conversion now
+        perform_reading()
+        self.sensor._min_refresh_time = float('inf')
+        try:
+            return self.sensor.temperature, self.sensor.humidity, self.sensor.pressure, \
+                self.sensor.gas if gas else None
+        finally:
+            self.sensor._min_refresh_time = refresh_time
 
-    def read_data(self):
+    def read_data(self, fast=False):
         """
-        Read data from the BME688 sensor.
+        Read data from the BME688 sensor from a single conversion.
         Returns both Celsius and Fahrenheit for temperature to remain backward-compatible:
         - "temperature" (Celsius)
         - "temperature_f" (Fahrenheit)
+        :param fast: Skip the gas heater and return only temperature, humidity and
+                     pressure; gas_resistance is None.
         """
         try:
-            temp_c = self.sensor.temperature
+            gas = not fast
+            if not self._set_gas(gas):
+                gas = True  # the driver cannot turn the heater off; read gas anyway
+            temp_c, humidity, pressure, gas_resistance = self._snapshot(gas)
             temp_f = (temp_c * 9 / 5) + 32 if temp_c is not None else None
             data = {
                 "temperature": temp_c,
                 "temperature_f": temp_f,
-                "humidity": getattr(self.sensor, 'humidity', None),
-                "pressure": getattr(self.sensor, 'pressure', None),
-                "gas_resistance": getattr(self.sensor, 'gas', None),
-                "relative_humidity": getattr(self.sensor, 'relative_humidity', None),
-                "altitude": getattr(self.sensor, 'altitude', None),
+                "humidity": humidity,
+                "pressure": pressure,
+                "gas_resistance": gas_resistance if not fast else None,
+                "relative_humidity": humidity,
+                "altitude": pressure_altitude(pressure, self.sea_level_pressure),
             }
             # logger.debug("Read BME data: %s", data)
             return data
         except Exception as e:
             # logger.exception("Error reading BME sensor data: %s", e)
+            self.last_error = e
             return {
                 "temperature": None,
                 "temperature_f": None,
@@ -0,0 +1,157 @@
+"""Persistent bootstrap cache for location and NWS grid resolution.
+
+Keeps the IP geolocation answer and the /points gridId/gridX/gridY lookups in a
+small JSON file with a TTL, so a cold start can go straight to the forecast
+fetch instead of calling ident.me, ip-api.com and /points every cycle.
+"""
+
+import json
+import os
+import threading
+import time
+
+from log_config import get_logger
+
+logger = get_logger('bootstrap_cache', 'bootstrap_cache.log')
+
+# Constants
+CACHE_FILE = os.path.join("cache", "bootstrap.json")
+LOCATION_TTL = 24 * 3600  # seconds before the IP geolocation is looked up again
+IP_CHECK_INTERVAL = 3600  # seconds before the public IP is checked for changes
+GRID_TTL = 30 * 24 * 3600  # seconds before a /points answer is looked up again
+
+
+def grid_key(lat, lon):
+    """
+    Key a lat/lon pair the way api.weather.gov rounds it (4 decimal places).
+    """
+    return f"{float(lat):.4f},{float(lon):.4f}"
+
+
+class BootstrapCache:
+    """
+    A JSON file holding the resolved location and NWS grid data.
+    """
+
+    def __init__(self, path=CACHE_FILE):
+        self.path = path
+        self._lock = threading.Lock()
+        self.data = self._read()
+
+    def _read(self):
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            data = {}
+        data.setdefault("location", None)
+        data.setdefault("grids", {})
+        return data
+
+    def _write(self):
+        tmp_path = self.path + ".tmp"
+        try:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(self.data, f)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            logger.warning("Could not write bootstrap cache %s: %s", self.path, e)
+
+    def get_location(self):
+        """
+        Return the cached location data if it is within its TTL and the public
+        IP was confirmed recently enough that it need not be checked again.
+        """
+        with self._lock:
+            entry = self.data["location"]
+            if entry is None:
+                return None
+            now = time.time()
+            if now - entry["resolved_at"] > LOCATION_TTL or now - entry["ip_checked_at"] > IP_CHECK_INTERVAL:
+                return None
+            return entry["data"]
+
+    def get_location_for_ip(self, ip):
+        """
+        Return the cached location data if it was resolved for this IP and is
+        within its TTL, marking the IP as confirmed.
+        """
+        with self._lock:
+            entry = self.data["location"]
+            if entry is None or entry["ip"] != ip or time.time() - entry["resolved_at"] > LOCATION_TTL:
+                return None
+            entry["ip_checked_at"] = time.time()
+            self._write()
+            return entry["data"]
+
+    def put_location(self, ip, data):
+        """
+        Store the location data resolved for an IP.
+        """
+        with self._lock:
+            now = time.time()
+            self.data["location"] = {"ip": ip, "data": data, "resolved_at": now, "ip_checked_at": now}
+            self._write()
+
+    def get_grid(self, lat, lon):
+        """
+        Return the cached (gridId, gridX, gridY) for a lat/lon, or None.
+        """
+        with self._lock:
+            entry = self.data["grids"].get(grid_key(lat, lon))
+            if entry is None or time.time() - entry["resolved_at"] > GRID_TTL:
+                return None
+            return entry["gridId"], entry["gridX"], entry["gridY"]
+
+    def put_grid(self, lat, lon, grid_id, grid_x, grid_y):
+        """
+        Store the NWS grid resolved for a lat/lon.
+        """
+        with self._lock:
+            self.data["grids"][grid_key(lat, lon)] = {
+                "gridId": grid_id,
+                "gridX": grid_x,
+                "gridY": grid_y,
+                "resolved_at": time.time(),
+            }
+            self._write()
+
+    def iter_grids(self):
+        """
+        Yield (lat, lon, gridId, gridX, gridY) for every cached grid within its TTL.
+        """
+        with self._lock:
+            entries = list(self.data["grids"].items())
+        now = time.time()
+        for key, entry in entries:
+            if now - entry["resolved_at"] > GRID_TTL:
+                continue
+            lat, lon = (float(v) for v in key.split(","))
+            yield lat, lon, entry["gridId"], entry["gridX"], entry["gridY"]
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_cache():
+    """
+    Return the process-wide shared BootstrapCache.
+    """
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = BootstrapCache()
+        return _cache
+
+
+def set_cache(cache):
+    """
+    Replace the process-wide BootstrapCache (None creates a new one on next
+    use). Returns the previous one, so callers can put it back.
+    """
+    global _cache
+    with _cache_lock:
+        previous, _cache = _cache, cache
+        return previous
@@ -3,6 +3,7 @@ from datetime import datetime
 from weather import RemoteWeather
 from openweatheraqi import RemoteAQI, COMPONENT_NAMES
 from location import Location
+import coalesce
 
 # Constants
 CLOCK_FREQUENCY = 60  # seconds
@@ -19,15 +20,17 @@ class AlarmClock:
         Initialize the AlarmClock with location, weather, and AQI data.
         """
         self.location = Location()
+        self.printed = {}  # section -> message last printed
         self.weather = RemoteWeather(self.location.get_lat(), self.location.get_lon())
         with open('/private/keys/openweather.txt', encoding="utf-8") as f:
             api_key = f.read().strip()
         self.aqi = RemoteAQI(self.location.get_lat(), self.location.get_lon(), api_key)
-        self.time_message = self.get_time()
-        self.weather_message = self.get_weather()
-        self.hourly_forecast = self.get_hourly_forecast()
-        self.daily_forecast = self.get_daily_summary_forecast()
-        self.aqi_forecast = self.get_hourly_aqi_forecast()
+        with coalesce.cycle("clock_init"):
+            self.time_message = self.get_time()
+            self.weather_message = self.get_weather()
+            self.hourly_forecast = self.get_hourly_forecast()
+            self.daily_forecast = self.get_daily_summary_forecast()
+            self.aqi_forecast = self.get_hourly_aqi_forecast()
 
     def get_time(self):
         """
@@ -111,9 +114,12 @@ class AlarmClock:
         Print the current time, weather, and forecast to the screen.
         """
         print(self.time_message)
-        print(self.weather_message)
-        print(self.hourly_forecast)
-        print(self.daily_forecast)
+        # Forecast sections are only reprinted when their content changed
+        for section in ("weather_message", "hourly_forecast", "daily_forecast"):
+            message = getattr(self, section)
+            if self.printed.get(section) != message:
+                print(message)
+                self.printed[section] = message
 
 
     def run(self):
@@ -128,14 +134,16 @@ class AlarmClock:
             short_counter += 1
             long_counter += 1
 
-            if short_counter % WEATHER_FREQUENCY == 0:
-                self.weather_message = self.get_weather()
+            # The weather and AQI views below share one download per source
+            with coalesce.cycle("clock_tick"):
+                if short_counter % WEATHER_FREQUENCY == 0:
+                    self.weather_message = self.get_weather()
 
-            if long_counter == FORECAST_FREQUENCY:
-                self.hourly_forecast = self.get_hourly_forecast()
-                self.aqi_forecast = self.get_hourly_aqi_forecast()
-                self.daily_forecast = self.get_daily_summary_forecast()
-                long_counter = 0
+                if long_counter == FORECAST_FREQUENCY:
+                    self.hourly_forecast = self.get_hourly_forecast()
+                    self.aqi_forecast = self.get_hourly_aqi_forecast()
+                    self.daily_forecast = self.get_daily_summary_forecast()
+                    long_counter = 0
 
             self.print_output()
             time.sleep(CLOCK_FREQUENCY)  # Wait for 1 minute
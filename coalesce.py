@@ -0,0 +1,165 @@
+"""Single-flight request coalescing.
+
+Identical fetches that are in flight at the same time share one call, and
+inside a refresh cycle (see cycle()) a finished result is reused by every
+later caller asking for the same key, so a DataAggregator pass downloads each
+URL once no matter how many views are built from it.
+
+Each cycle owns its results and stats. The current cycle is a context
+variable, so overlapping cycles on different threads (the render loop and a
+fleet pass, say) stay apart; work handed to another thread joins the
+caller's cycle through submit() or in_cycle().
+"""
+
+import contextvars
+import threading
+from contextlib import contextmanager
+
+from log_config import get_logger
+
+logger = get_logger('coalesce', 'coalesce.log')
+
+
+class _Call:
+    """
+    A fetch in progress that other callers can wait on.
+    """
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class CycleStats:
+    """
+    Fetch counts for one refresh cycle.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.fetches = 0
+        self.duplicates = 0
+
+    def as_dict(self):
+        return {"name": self.name, "fetches": self.fetches, "duplicates_removed": self.duplicates}
+
+
+class _Cycle:
+    """
+    One refresh cycle: the results it shares and its fetch counts.
+    """
+
+    def __init__(self, name):
+        self.stats = CycleStats(name)
+        self.results = {}  # key -> value
+
+
+class Coalescer:
+    """
+    Shares one fetch between identical concurrent or same-cycle requests.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._inflight = {}  # key -> _Call
+        self._current = contextvars.ContextVar("coalesce_cycle", default=None)
+
+    def fetch(self, key, fn):
+        """
+        Return fn() for key, sharing the call with any identical request that
+        is in flight or has already completed in the current cycle.
+        """
+        cycle = self._current.get()
+        with self._lock:
+            if cycle is not None and key in cycle.results:
+                self._count(cycle, duplicate=True)
+                return cycle.results[key]
+            call = self._inflight.get(key)
+            leader = call is None
+            if leader:
+                call = self._inflight[key] = _Call()
+            else:
+                self._count(cycle, duplicate=True)
+
+        if not leader:
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return call.value
+
+        try:
+            call.value = fn()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._inflight[key]
+                if call.error is None and cycle is not None:
+                    cycle.results[key] = call.value
+                self._count(cycle, duplicate=False)
+            call.event.set()
+        return call.value
+
+    def _count(self, cycle, duplicate):
+        if cycle is None:
+            return
+        if duplicate:
+            cycle.stats.duplicates += 1
+        else:
+            cycle.stats.fetches += 1
+
+    @contextmanager
+    def cycle(self, name="cycle"):
+        """
+        Scope a refresh cycle in the current context. A nested cycle joins the
+        enclosing one; results are shared until the outermost exits, at which
+        point they are dropped and the stats are logged.
+        """
+        current = self._current.get()
+        if current is not None:
+            yield current.stats
+            return
+        current = _Cycle(name)
+        token = self._current.set(current)
+        try:
+            yield current.stats
+        finally:
+            self._current.reset(token)
+            stats = current.stats
+            logger.info("Cycle %s: %d fetches, %d duplicate fetches removed",
+                        stats.name, stats.fetches, stats.duplicates)
+
+
+_coalescer = Coalescer()
+
+
+def fetch(key, fn):
+    """
+    Coalesce fn() under key using the process-wide Coalescer.
+    """
+    return _coalescer.fetch(key, fn)
+
+
+def cycle(name="cycle"):
+    """
+    Scope a refresh cycle on the process-wide Coalescer.
+    """
+    return _coalescer.cycle(name)
+
+
+def in_cycle(fn):
+    """
+    Return fn bound to the caller's cycle, for running on another thread
+    (threads do not inherit context variables).
+    """
+    context = contextvars.copy_context()
+    return lambda *args, **kwargs: context.run(fn, *args, **kwargs)
+
+
+def submit(executor, fn, *args, **kwargs):
+    """
+    Submit fn to an executor so it runs in the caller's cycle.
+    """
+    return executor.submit(in_cycle(fn), *args, **kwargs)
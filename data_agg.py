@@ -1,20 +1,74 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
 from weather_gov import RemoteWeather
+from onecall_weather import OneCallWeather
 from openweatheraqi import RemoteAQI
-from bme import BME688Sensor
-from sgp30_sensor import SGP30Sensor
 from location import Location
+import coalesce
+import hedge
+import resilience
+import sensors
+from weather_view import HOURLY_HORIZON, compose_weather
+from log_config import get_logger
+
+logger = get_logger('data_agg', 'data_agg.log')
+
+# Constants
+CYCLE_DEADLINE = 60  # seconds allowed for one concurrent fetch pass
+MAX_WORKERS = 4
+SENSOR_TIMEOUT = 10  # seconds to wait for a started sensor read
+PROVIDERS = {
+    "nws": RemoteWeather,  # api.weather.gov: points, daily and hourly requests
+    "openweather": OneCallWeather,  # one One Call request for everything
+}
 
 class DataAggregator:
 
+    def __init__(self, concurrent=False, deadline=CYCLE_DEADLINE, hedged=False, provider="nws"):
+        """
+        :param concurrent: Run the remote fetches and sensor reads in parallel.
+        :param deadline: Seconds a concurrent pass may take; sources that miss it
+                         are left out and the result is marked partial.
+        :param hedged: In a concurrent pass, take current conditions and the daily
+                       forecast from whichever of NWS and OpenWeather answers
+                       first (see hedge.py).
+        :param provider: Weather provider, a key of PROVIDERS.
+        """
+        self.concurrent = concurrent
+        self.deadline = deadline
+        self.hedged = hedged
+        self.provider = PROVIDERS[provider]
+        # One pool for every pass; a fetch that misses its deadline keeps its
+        # worker, and later passes wait on it instead of starting another
+        self._executor = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix="fetch")
+        self._inflight = {}  # source name -> Future of its latest fetch
+        self._inflight_lock = threading.Lock()
+
     def fetch_all_data(self):
+        started = time.monotonic()
+        # Share identical downloads (daily forecast, sunrise/sunset) within this pass
+        with coalesce.cycle("fetch_all_data"):
+            if self.concurrent:
+                weather, aqi, bme, sgp30 = self._fetch_all_data_concurrent()
+            else:
+                weather, aqi, bme, sgp30 = self._fetch_all_data()
+        # Sources answered from their last good data, with its age in seconds
+        weather["stale"] = resilience.stale_sources(since=started)
+        return weather, aqi, bme, sgp30
 
+    def _fetch_all_data(self):
+
+        # Start the sensor conversions first so they overlap the network fetches
+        bme_read = sensors.start_read(sensors.BME)
+        sgp30_read = sensors.start_read(sensors.SGP30)
         location = Location()
         lat = location.get_lat()
         lon = location.get_lon()
         # --- Weather ---
-        weather_api = RemoteWeather(lat, lon)
+        weather_api = self.provider(lat, lon)
         daily = weather_api.get_daily_forecast()
-        hourly = weather_api.get_hourly_forecast()
+        hourly = weather_api.get_hourly_forecast(HOURLY_HORIZON)
         current = weather_api.get_current_weather()
         # print("Current Weather:", current)
         sunrise = weather_api.get_sunrise()
@@ -23,20 +77,90 @@ class DataAggregator:
         # aqi_api = RemoteAQI(47.697, -122.3222, open('/private/keys/openweather.txt').read().strip())
         # aqi_now = aqi_api.get_detailed_current_aqi()
         # --- BME688 ---
-        bme = BME688Sensor().read_data()
+        bme = sensors.collect(sensors.BME, bme_read, SENSOR_TIMEOUT)
         # --- SGP30 ---
-        sgp30 = SGP30Sensor().read_data()
+        sgp30 = sensors.collect(sensors.SGP30, sgp30_read, SENSOR_TIMEOUT)
         # --- Compose data dicts for rendering ---
-        weather = {
-            'current_temp': int(current['temperature']),
-            'current_desc': current['short_forecast'],
-            'daily': daily,
-            'hourly': hourly,
-            'sunrise': sunrise,
-            'sunset': sunset,
+        weather = compose_weather(current, daily, hourly, sunrise, sunset)
+        return weather, None, bme, sgp30
+
+    def _fetch_all_data_concurrent(self):
+        """
+        Fetch every source on a bounded thread pool under one overall deadline.
+        Sources that fail or miss the deadline are listed in weather['missing']
+        and weather['partial'] is set, instead of holding up the render.
+        """
+        end = time.monotonic() + self.deadline
+        futures = {
+            # Sensors don't depend on the location, so start them right away;
+            # they run on the registry's threads, leaving the pool to the network
+            "bme": sensors.start_read(sensors.BME),
+            "sgp30": sensors.start_read(sensors.SGP30),
         }
+        bootstrap = self._submit("weather_api", self._weather_api)
+        wait([bootstrap], timeout=max(0, end - time.monotonic()))
+        weather_api = self._result("weather_api", bootstrap)
+        if weather_api is not None:
+            if self.hedged and self.provider is RemoteWeather:
+                futures["forecast"] = self._submit("forecast", hedge.get_weather, weather_api.lat, weather_api.lon,
+                                                   weather_api)
+            else:
+                futures["daily"] = self._submit("daily", weather_api.get_daily_forecast)
+                futures["current"] = self._submit("current", weather_api.get_current_weather)
+            futures["hourly"] = self._submit("hourly", weather_api.get_hourly_forecast, HOURLY_HORIZON)
+            futures["sunrise"] = self._submit("sunrise", weather_api.get_sunrise)
+            futures["sunset"] = self._submit("sunset", weather_api.get_sunset)
+        wait(futures.values(), timeout=max(0, end - time.monotonic()))
+
+        results = {name: self._result(name, future) for name, future in futures.items()}
+        forecast = results.pop("forecast", None)
+        if forecast is not None:
+            normalized, provider = forecast
+            results["current"] = normalized["current"]
+            results["daily"] = normalized["daily"]
+            logger.info("Forecast served by %s", provider)
+        missing = [name for name in ("daily", "hourly", "current", "sunrise", "sunset", "bme", "sgp30")
+                   if results.get(name) is None]
+        weather = compose_weather(results.get("current"), results.get("daily"), results.get("hourly"),
+                                  results.get("sunrise"), results.get("sunset"))
+        weather["partial"] = bool(missing)
+        weather["missing"] = missing
+        if missing:
+            logger.warning("Partial fetch, missing sources: %s", ", ".join(missing))
+        bme = results.get("bme") or dict(sensors.EMPTY_BME)
+        sgp30 = results.get("sgp30") or dict(sensors.EMPTY_SGP30)
         return weather, None, bme, sgp30
-    
+
+    def _submit(self, name, fn, *args):
+        """
+        Start fetching a source on the pool, or return its fetch from an
+        earlier pass if that is still running.
+        """
+        with self._inflight_lock:
+            future = self._inflight.get(name)
+            if future is not None and not future.done():
+                logger.info("Source %s still in flight from an earlier pass, waiting on it", name)
+                return future
+            future = self._inflight[name] = coalesce.submit(self._executor, fn, *args)
+            return future
+
+    def _weather_api(self):
+        location = Location()
+        return self.provider(location.get_lat(), location.get_lon())
+
+    def _result(self, name, future):
+        """
+        Return a finished future's result, or None if it failed or is not done.
+        """
+        if not future.done():
+            logger.warning("Source %s missed the %ss deadline", name, self.deadline)
+            return None
+        try:
+            return future.result()
+        except Exception as e:
+            logger.exception("Source %s failed: %s", name, e)
+            return None
+
 
 def main():
     data_aggregator = DataAggregator()
@@ -50,4 +174,4 @@ def main():
     print("SGP30 Data:", sgp30)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
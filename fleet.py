@@ -0,0 +1,213 @@
+"""Fleet mode: many display sites served from one process.
+
+Sites that share an NWS grid cell get identical gridpoint forecasts, and
+sites close together get the same OpenWeather AQI forecast. A Fleet resolves
+each site to its grid once, then every cycle fetches each distinct gridpoint
+forecast and AQI cell once and fans the results out to the sites using them.
+Sunrise and sunset are computed per site, since they depend on the exact
+coordinates and cost no network call.
+"""
+
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+import coalesce
+import solar
+from log_config import get_logger
+from openweatheraqi import RemoteAQI
+from weather_gov import RemoteWeather
+from weather_view import HOURLY_HORIZON, compose_weather
+
+logger = get_logger('fleet', 'fleet.log')
+
+# Constants
+AQI_CELL = 0.1  # degrees; OpenWeather's air pollution model is far coarser than this
+MAX_WORKERS = 4
+
+
+class Site(namedtuple("Site", "name lat lon")):
+    """
+    One display location.
+    """
+    __slots__ = ()
+
+
+def aqi_cell(lat, lon):
+    """
+    Return the AQI cell a lat/lon falls in, as the cell centre's (lat, lon).
+    """
+    return (round(round(lat / AQI_CELL) * AQI_CELL, 4), round(round(lon / AQI_CELL) * AQI_CELL, 4))
+
+
+class FleetStats:
+    """
+    Fetch counts for one fleet cycle. `requested` is what per-site stacks
+    would have downloaded; `fetched` is what the fleet actually downloaded.
+    """
+
+    def __init__(self, sites, grids, aqi_cells):
+        self.sites = sites
+        self.grids = grids
+        self.aqi_cells = aqi_cells
+        self.requested = 0
+        self.fetched = 0
+        self.failed = 0
+        self.elapsed = 0.0
+
+    @property
+    def deduplicated(self):
+        return self.requested - self.fetched
+
+    def as_dict(self):
+        return {
+            "sites": self.sites,
+            "grids": self.grids,
+            "aqi_cells": self.aqi_cells,
+            "requested": self.requested,
+            "fetched": self.fetched,
+            "deduplicated": self.deduplicated,
+            "failed": self.failed,
+            "elapsed": round(self.elapsed, 3),
+        }
+
+
+class Fleet:
+    """
+    Fetch weather and AQI for many sites, once per shared NWS grid cell and AQI cell.
+    """
+
+    def __init__(self, sites, aqi_key=None, max_workers=MAX_WORKERS):
+        """
+        :param sites: Site records (or (name, lat, lon) tuples) with unique names.
+        :param aqi_key: OpenWeather API key; AQI is skipped without one.
+        """
+        self.sites = [Site(*site) for site in sites]
+        names = [site.name for site in self.sites]
+        duplicates = sorted({name for name in names if names.count(name) > 1})
+        if duplicates:
+            raise ValueError(f"Duplicate site names: {', '.join(duplicates)}")
+        self.aqi_key = aqi_key
+        self.max_workers = max_workers
+        self.grids = {}  # (gridId, gridX, gridY) -> RemoteWeather
+        self.site_grid = {}  # site name -> grid tuple
+        self.aqi_cells = {}  # cell -> RemoteAQI
+        self.site_cell = {}  # site name -> cell
+        self.last_stats = None
+        self.resolve()
+
+    def resolve(self):
+        """
+        Resolve every site to its NWS grid and AQI cell. Sites at the same
+        coordinates share one /points lookup; grids come from the bootstrap
+        cache when they were resolved before.
+        """
+        by_point = {}
+        for site in self.sites:
+            point = (round(site.lat, 4), round(site.lon, 4))
+            weather_api = by_point.get(point)
+            if weather_api is None:
+                try:
+                    weather_api = by_point[point] = RemoteWeather(site.lat, site.lon)
+                except Exception as e:
+                    logger.exception("Could not resolve grid for site %s: %s", site.name, e)
+                    continue
+            grid = (weather_api.grid_id, weather_api.grid_x, weather_api.grid_y)
+            # The first site in a grid cell serves the forecasts for all of them
+            self.grids.setdefault(grid, weather_api)
+            self.site_grid[site.name] = grid
+
+            if self.aqi_key:
+                cell = aqi_cell(site.lat, site.lon)
+                if cell not in self.aqi_cells:
+                    self.aqi_cells[cell] = RemoteAQI(cell[0], cell[1], self.aqi_key)
+                self.site_cell[site.name] = cell
+        logger.info("Fleet resolved %d sites to %d grids and %d AQI cells",
+                    len(self.sites), len(self.grids), len(self.aqi_cells))
+
+    def _fetch_grid(self, weather_api):
+        return {
+            "daily": weather_api.get_daily_forecast(),
+            "hourly": weather_api.get_hourly_forecast(HOURLY_HORIZON),
+            "current": weather_api.get_current_weather(),
+        }
+
+    def _fetch_cell(self, aqi_api):
+        return {
+            "current": aqi_api.get_detailed_current_aqi(),
+            "hourly": aqi_api.get_hourly_aqi_forecast_periods(),
+            "daily": aqi_api.get_daily_aqi_forecast(),
+        }
+
+    def _gather(self, executor, fn, sources, stats):
+        """
+        Run fn over each distinct source in parallel; failed sources map to None.
+        """
+        futures = {key: coalesce.submit(executor, fn, source) for key, source in sources.items()}
+        results = {}
+        for key, future in futures.items():
+            stats.fetched += 1
+            try:
+                results[key] = future.result()
+            except Exception as e:
+                logger.exception("Fleet fetch for %s failed: %s", key, e)
+                results[key] = None
+                stats.failed += 1
+        return results
+
+    def fetch_all(self):
+        """
+        Fetch one cycle for the whole fleet. Returns {site name: (weather, aqi)}
+        with weather in the shape DataAggregator produces; a site whose grid or
+        AQI cell failed gets empty parts rather than holding up the others.
+        """
+        stats = FleetStats(len(self.sites), len(self.grids), len(self.aqi_cells))
+        start = time.monotonic()
+        with coalesce.cycle("fleet") as cycle_stats, \
+                ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            forecasts = self._gather(executor, self._fetch_grid, self.grids, stats)
+            aqi = self._gather(executor, self._fetch_cell, self.aqi_cells, stats)
+
+        results = {}
+        for site in self.sites:
+            grid = self.site_grid.get(site.name)
+            forecast = forecasts.get(grid) or {}
+            if grid is not None:
+                stats.requested += 1
+            cell = self.site_cell.get(site.name)
+            if cell is not None:
+                stats.requested += 1
+            sun = solar.sun_times(site.lat, site.lon)
+            weather = compose_weather(forecast.get("current"), forecast.get("daily"), forecast.get("hourly"),
+                                      solar.format_local(sun["sunrise"]), solar.format_local(sun["sunset"]))
+            results[site.name] = (weather, aqi.get(cell))
+
+        stats.elapsed = time.monotonic() - start
+        self.last_stats = stats
+        logger.info("Fleet cycle: %d sites, %d fetched, %d deduplicated, %d failed, "
+                    "%d duplicate downloads removed in %.2fs",
+                    stats.sites, stats.fetched, stats.deduplicated, stats.failed,
+                    cycle_stats.duplicates, stats.elapsed)
+        return results
+
+    def get_stats(self):
+        """
+        Return the last cycle's FleetStats as a dict, or None before the first cycle.
+        """
+        return self.last_stats.as_dict() if self.last_stats else None
+
+
+def main():
+    sites = [
+        Site("maple-leaf", 47.697, -122.3222),
+        Site("roosevelt", 47.6767, -122.3172),
+        Site("capitol-hill", 47.6253, -122.3222),
+    ]
+    fleet = Fleet(sites)
+    for name, (weather, aqi) in fleet.fetch_all().items():
+        print(name, weather['current_temp'], weather['current_desc'], weather['sunrise'], weather['sunset'])
+    print("Stats:", fleet.get_stats())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,182 @@
+"""Change sets between successive weather/AQI snapshots.
+
+ForecastDiffer keeps the previous snapshot and, for each new one, returns a
+ChangeSet saying which current conditions, hourly slots, daily entries, sun
+times, AQI entries and status flags changed, and by how much for numeric
+fields. Consumers use it to skip or narrow work: the renderer skips a full
+e-ink refresh when nothing it draws has changed.
+"""
+
+import numbers
+from collections import namedtuple
+
+# Constants
+HOURLY_SLOTS = 12  # hourly entries the renderer draws
+DAILY_SLOTS = 4  # daily entries the renderer draws
+CURRENT_FIELDS = ("current_temp", "current_desc")
+HOURLY_FIELDS = ("temperature", "probabilityOfPrecipitation")
+DAILY_FIELDS = ("low_temp", "high_temp", "percentageOfPrecipitation")
+SUN_FIELDS = ("sunrise", "sunset")
+AQI_FIELDS = ("aqi", "category")
+STATUS_FIELDS = ("partial", "stale", "alerts")
+
+ADDED = "added"
+REMOVED = "removed"
+CHANGED = "changed"
+
+
+class FieldChange(namedtuple("FieldChange", "field old new delta")):
+    """
+    One changed field; delta is new - old for numeric values, otherwise None.
+    """
+    __slots__ = ()
+
+
+class SlotChange(namedtuple("SlotChange", "key kind changes")):
+    """
+    One added, removed or changed entry of a series, with its field changes.
+    """
+    __slots__ = ()
+
+
+def _delta(old, new):
+    if isinstance(old, numbers.Number) and isinstance(new, numbers.Number) \
+            and not isinstance(old, bool) and not isinstance(new, bool):
+        return new - old
+    return None
+
+
+def diff_fields(old, new, fields):
+    """
+    Return the FieldChanges between two dicts over the given fields.
+    """
+    old = old or {}
+    new = new or {}
+    return tuple(
+        FieldChange(field, old.get(field), new.get(field), _delta(old.get(field), new.get(field)))
+        for field in fields
+        if old.get(field) != new.get(field)
+    )
+
+
+def diff_series(old, new, key, fields, limit=None):
+    """
+    Return the SlotChanges between two lists of dicts, matching entries by
+    their `key` field and comparing only the first `limit` entries of each.
+    Entries moving in or out of the window show up as added or removed.
+    """
+    old_by_key = {entry.get(key): entry for entry in (old or [])[:limit]}
+    new_by_key = {entry.get(key): entry for entry in (new or [])[:limit]}
+    changes = []
+    for k, entry in new_by_key.items():
+        if k not in old_by_key:
+            changes.append(SlotChange(k, ADDED, diff_fields(None, entry, fields)))
+            continue
+        fields_changed = diff_fields(old_by_key[k], entry, fields)
+        if fields_changed:
+            changes.append(SlotChange(k, CHANGED, fields_changed))
+    for k, entry in old_by_key.items():
+        if k not in new_by_key:
+            changes.append(SlotChange(k, REMOVED, diff_fields(entry, None, fields)))
+    return tuple(changes)
+
+
+class ChangeSet:
+    """
+    Everything that changed between two snapshots.
+    """
+
+    SECTIONS = ("current", "hourly", "daily", "sun", "aqi", "status")
+
+    def __init__(self, current=(), hourly=(), daily=(), sun=(), aqi=(), status=(), first=False):
+        self.current = current
+        self.hourly = hourly
+        self.daily = daily
+        self.sun = sun
+        self.aqi = aqi
+        self.status = status
+        self.first = first  # no previous snapshot to compare with
+
+    @property
+    def empty(self):
+        return not self.first and not any(getattr(self, section) for section in self.SECTIONS)
+
+    def changed_sections(self):
+        """
+        Return the names of the sections with changes.
+        """
+        return [section for section in self.SECTIONS if getattr(self, section)]
+
+    def max_delta(self, section, field):
+        """
+        Return the largest absolute numeric change of a field in a section, or 0.
+        """
+        changes = getattr(self, section)
+        deltas = []
+        for change in changes:
+            for field_change in (change.changes if isinstance(change, SlotChange) else (change,)):
+                if field_change.field == field and field_change.delta is not None:
+                    deltas.append(abs(field_change.delta))
+        return max(deltas, default=0)
+
+    def summary(self):
+        """
+        Return a one-line description for logging.
+        """
+        if self.first:
+            return "first snapshot"
+        if self.empty:
+            return "no changes"
+        return ", ".join(f"{section}: {len(getattr(self, section))}" for section in self.changed_sections())
+
+    def as_dict(self):
+        return {section: [c._asdict() for c in getattr(self, section)] for section in self.SECTIONS}
+
+
+def _status(weather):
+    """
+    The status flags as the renderer shows them: whether data is partial or
+    cached (not how old), and which alerts are active.
+    """
+    return {
+        "partial": bool(weather.get("partial")),
+        "stale": bool(weather.get("stale")),
+        "alerts": tuple(getattr(alert, "id", alert) for alert in weather.get("alerts") or ()),
+    }
+
+
+def diff(old_weather, new_weather, old_aqi=None, new_aqi=None):
+    """
+    Return the ChangeSet between two weather dicts (as built by
+    DataAggregator.fetch_all_data) and optional daily AQI lists, limited
+    to what the renderer shows.
+    """
+    if old_weather is None:
+        return ChangeSet(first=True)
+    return ChangeSet(
+        current=diff_fields(old_weather, new_weather, CURRENT_FIELDS),
+        hourly=diff_series(old_weather.get("hourly"), new_weather.get("hourly"), "hour", HOURLY_FIELDS, HOURLY_SLOTS),
+        daily=diff_series(old_weather.get("daily"), new_weather.get("daily"), "name", DAILY_FIELDS, DAILY_SLOTS),
+        sun=diff_fields(old_weather, new_weather, SUN_FIELDS),
+        aqi=diff_series(old_aqi, new_aqi, "date", AQI_FIELDS),
+        status=diff_fields(_status(old_weather), _status(new_weather), STATUS_FIELDS),
+    )
+
+
+class ForecastDiffer:
+    """
+    Remembers the last snapshot and diffs each new one against it.
+    """
+
+    def __init__(self):
+        self.weather = None
+        self.aqi = None
+
+    def update(self, weather, aqi=None):
+        """
+        Diff a new snapshot against the previous one and remember it.
+        """
+        changes = diff(self.weather, weather, self.aqi, aqi)
+        self.weather = weather
+        self.aqi = aqi
+        return changes
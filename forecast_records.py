@@ -0,0 +1,112 @@
+"""Compact records for decoded forecast data.
+
+The NWS and OpenWeather payloads carry far more per period than the clock
+uses. The decoders here read only the fields consumers need into slotted
+namedtuples, parse timestamps with a fast ISO path and stop after an optional
+horizon, so building a 12-hour view does not touch all ~156 hourly periods.
+"""
+
+from collections import namedtuple
+from datetime import datetime
+from itertools import islice
+
+
+def iso_hour(timestamp):
+    """
+    Return the two-digit local hour of an ISO-8601 timestamp such as
+    2025-03-24T21:00:00-07:00, without a full strptime parse.
+    """
+    if len(timestamp) >= 13 and timestamp[10] == "T":
+        return timestamp[11:13]
+    return datetime.fromisoformat(timestamp).strftime("%H")
+
+
+def iso_date(timestamp):
+    """
+    Return the local YYYY-MM-DD date of an ISO-8601 timestamp.
+    """
+    if len(timestamp) >= 10 and timestamp[4] == "-" and timestamp[7] == "-":
+        return timestamp[:10]
+    return datetime.fromisoformat(timestamp).strftime("%Y-%m-%d")
+
+
+def _precip(period):
+    return (period.get("probabilityOfPrecipitation") or {}).get("value")
+
+
+class HourlyPeriod(namedtuple("HourlyPeriod", "start hour temperature wind_speed wind_direction short_forecast precip")):
+    """
+    One NWS hourly forecast period.
+    """
+    __slots__ = ()
+
+    def as_dict(self):
+        """
+        Return the dict shape RemoteWeather.get_hourly_forecast has always returned.
+        """
+        return {
+            "hour": self.hour,
+            "temperature": self.temperature,
+            "wind_speed": self.wind_speed,
+            "wind_direction": self.wind_direction,
+            "short_forecast": self.short_forecast,
+            "probabilityOfPrecipitation": self.precip,
+        }
+
+
+class DailyPeriod(namedtuple("DailyPeriod", "name start is_daytime temperature temp_unit wind_speed short_forecast precip")):
+    """
+    One NWS named forecast period ("Tonight", "Monday Night", ...).
+    """
+    __slots__ = ()
+
+
+class AqiEntry(namedtuple("AqiEntry", "dt aqi components")):
+    """
+    One OpenWeather hourly air pollution entry; dt is a UTC epoch timestamp.
+    """
+    __slots__ = ()
+
+
+def decode_hourly(periods, limit=None):
+    """
+    Decode NWS hourly periods into HourlyPeriod records, stopping after `limit`.
+    """
+    return [
+        HourlyPeriod(
+            p["startTime"],
+            iso_hour(p["startTime"]),
+            p["temperature"],
+            p["windSpeed"],
+            p["windDirection"],
+            p["shortForecast"],
+            _precip(p),
+        )
+        for p in islice(periods, limit)
+    ]
+
+
+def decode_daily(periods, limit=None):
+    """
+    Decode NWS named periods into DailyPeriod records, stopping after `limit`.
+    """
+    return [
+        DailyPeriod(
+            p["name"],
+            p["startTime"],
+            p["isDaytime"],
+            p["temperature"],
+            p["temperatureUnit"],
+            p["windSpeed"],
+            p["shortForecast"],
+            _precip(p),
+        )
+        for p in islice(periods, limit)
+    ]
+
+
+def decode_aqi(entries, limit=None):
+    """
+    Decode OpenWeather air pollution entries into AqiEntry records, stopping after `limit`.
+    """
+    return [AqiEntry(e["dt"], e["main"]["aqi"], e["components"]) for e in islice(entries, limit)]
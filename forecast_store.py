@@ -0,0 +1,204 @@
+"""Columnar NumPy store for forecast series.
+
+ForecastStore holds one array per field (timestamps, local day, temperature,
+precipitation probability, wind speed, AQI) for a time-sorted series, so
+daily min/max rollups, run-length grouping and window slices are
+computed with vectorized reductions instead of Python loops. NWS hourly and
+daily periods and OpenWeather AQI entries all load into the same shape.
+"""
+
+import re
+from datetime import datetime
+
+import numpy as np
+
+import localtime
+
+# Constants
+ISO_LENGTH = 25  # 2025-03-24T21:00:00-07:00
+_WIND_NUMBER = re.compile(r"\d+(?:\.\d+)?")
+
+
+def parse_iso_series(timestamps):
+    """
+    Parse ISO-8601 timestamps with UTC offsets into (epoch seconds, local day)
+    arrays. Fixed-width NWS timestamps are parsed as a byte matrix in one
+    vectorized pass; anything else falls back to datetime.fromisoformat.
+    """
+    n = len(timestamps)
+    if n == 0:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype="datetime64[D]")
+    raw = np.array(timestamps, dtype=f"S{ISO_LENGTH}")
+    if all(len(t) == ISO_LENGTH for t in timestamps):
+        local = raw.astype("U19").astype("datetime64[s]")
+        chars = raw.view(np.uint8).reshape(n, ISO_LENGTH).astype(np.int64) - ord("0")
+        offset = (chars[:, 20] * 10 + chars[:, 21]) * 3600 + (chars[:, 23] * 10 + chars[:, 24]) * 60
+        offset = np.where(raw.view(np.uint8).reshape(n, ISO_LENGTH)[:, 19] == ord("-"), -offset, offset)
+        epochs = local.astype(np.int64) - offset
+        return epochs, local.astype("datetime64[D]")
+    parsed = [datetime.fromisoformat(t) for t in timestamps]
+    epochs = np.array([int(p.timestamp()) for p in parsed], dtype=np.int64)
+    days = np.array([p.strftime("%Y-%m-%d") for p in parsed], dtype="datetime64[D]")
+    return epochs, days
+
+
+def local_days(epochs):
+    """
+    Return the local calendar day of each epoch timestamp.
+    """
+    return localtime.localize(epochs)["date"]
+
+
+def parse_wind(wind_speed):
+    """
+    Return the highest speed in an NWS wind string such as "5 to 10 mph".
+    """
+    numbers = _WIND_NUMBER.findall(wind_speed or "")
+    return max(float(n) for n in numbers) if numbers else np.nan
+
+
+def _column(values):
+    return np.array([np.nan if v is None else v for v in values], dtype=np.float64)
+
+
+def _to_python(value):
+    """
+    Convert a NumPy scalar to an int/float, or None for NaN.
+    """
+    if np.isnan(value):
+        return None
+    return int(value) if float(value).is_integer() else float(value)
+
+
+class ForecastStore:
+    """
+    A time-sorted forecast series held as parallel NumPy columns.
+    Missing values are NaN.
+    """
+
+    FIELDS = ("temperature", "precip", "wind", "aqi")
+
+    def __init__(self, time, day, temperature=None, precip=None, wind=None, aqi=None, is_daytime=None):
+        n = len(time)
+        empty = np.full(n, np.nan)
+        self.time = np.asarray(time, dtype=np.int64)
+        self.day = np.asarray(day, dtype="datetime64[D]")
+        self.temperature = empty if temperature is None else temperature
+        self.precip = empty if precip is None else precip
+        self.wind = empty if wind is None else wind
+        self.aqi = empty if aqi is None else aqi
+        self.is_daytime = np.ones(n, dtype=bool) if is_daytime is None else is_daytime
+
+    def __len__(self):
+        return len(self.time)
+
+    @classmethod
+    def from_hourly(cls, periods):
+        """
+        Load forecast_records.HourlyPeriod records.
+        """
+        time, day = parse_iso_series([p.start for p in periods])
+        return cls(time, day,
+                   temperature=_column(p.temperature for p in periods),
+                   precip=_column(p.precip for p in periods),
+                   wind=np.array([parse_wind(p.wind_speed) for p in periods], dtype=np.float64))
+
+    @classmethod
+    def from_daily(cls, periods):
+        """
+        Load forecast_records.DailyPeriod records.
+        """
+        time, day = parse_iso_series([p.start for p in periods])
+        return cls(time, day,
+                   temperature=_column(p.temperature for p in periods),
+                   precip=_column(p.precip for p in periods),
+                   wind=np.array([parse_wind(p.wind_speed) for p in periods], dtype=np.float64),
+                   is_daytime=np.array([bool(p.is_daytime) for p in periods], dtype=bool))
+
+    @classmethod
+    def from_aqi(cls, entries):
+        """
+        Load forecast_records.AqiEntry records.
+        """
+        time = np.array([e.dt for e in entries], dtype=np.int64)
+        return cls(time, local_days(time), aqi=_column(e.aqi for e in entries))
+
+    def _take(self, index):
+        return ForecastStore(self.time[index], self.day[index],
+                             self.temperature[index], self.precip[index],
+                             self.wind[index], self.aqi[index], self.is_daytime[index])
+
+    def window(self, start=None, end=None):
+        """
+        Return the entries with start <= time < end (epoch seconds).
+        """
+        lo = 0 if start is None else np.searchsorted(self.time, start, side="left")
+        hi = len(self.time) if end is None else np.searchsorted(self.time, end, side="left")
+        return self._take(slice(lo, hi))
+
+    def head(self, n):
+        """
+        Return the first n entries.
+        """
+        return self._take(slice(0, n))
+
+    def day_starts(self):
+        """
+        Return (days, starts): each distinct local day and the index where it begins.
+        """
+        if len(self.day) == 0:
+            return self.day, np.empty(0, dtype=np.intp)
+        starts = np.flatnonzero(np.concatenate(([True], self.day[1:] != self.day[:-1])))
+        return self.day[starts], starts
+
+    def daily_reduce(self, field, how, mask=None):
+        """
+        Reduce a field per local day with 'min', 'max' or 'sum', ignoring NaN
+        and entries outside `mask`. Returns (days, values).
+        """
+        values = getattr(self, field)
+        if mask is not None:
+            values = np.where(mask, values, np.nan)
+        days, starts = self.day_starts()
+        if len(starts) == 0:
+            return days, np.empty(0)
+        ufunc = {"min": np.fmin, "max": np.fmax}.get(how)
+        if ufunc is not None:
+            return days, ufunc.reduceat(values, starts)
+        if how == "sum":
+            return days, np.add.reduceat(np.nan_to_num(values), starts)
+        raise ValueError(f"Unknown reduction: {how}")
+
+    def runs(self, field):
+        """
+        Return (starts, ends) index arrays of runs of equal consecutive values
+        in a field; ends are exclusive.
+        """
+        values = getattr(self, field)
+        if len(values) == 0:
+            return np.empty(0, dtype=np.intp), np.empty(0, dtype=np.intp)
+        starts = np.flatnonzero(np.concatenate(([True], values[1:] != values[:-1])))
+        ends = np.append(starts[1:], len(values))
+        return starts, ends
+
+    def daily_summary(self):
+        """
+        Roll named day/night periods up into one entry per local day with the
+        daytime high, the overnight low and the highest precipitation chance.
+        A day with no daytime period (the leading "Tonight" in the evening) is
+        left out, as a half-day has no high to show.
+        """
+        days, highs = self.daily_reduce("temperature", "max", mask=self.is_daytime)
+        _, lows = self.daily_reduce("temperature", "min", mask=~self.is_daytime)
+        _, precip = self.daily_reduce("precip", "max")
+        names = days.astype("datetime64[D]").astype(object)
+        return [
+            {
+                "name": names[i].strftime("%a"),
+                "high_temp": _to_python(highs[i]),
+                "low_temp": _to_python(lows[i]),
+                "percentageOfPrecipitation": _to_python(np.nan_to_num(precip[i])),
+            }
+            for i in range(len(days))
+            if not np.isnan(highs[i])
+        ]
@@ -0,0 +1,224 @@
+"""Offline index mapping lat/lon to NWS grid cells.
+
+Each NWS forecast office covers its area with a regular 2.5 km grid, so
+within one office gridX/gridY are close to an affine function of lat/lon.
+GridIndex is built from the /points answers already in the bootstrap cache:
+it answers exact coordinates from a hash, and for new coordinates fits the
+office's grid from the cached samples and answers in memory when the fit is
+good, the point lies inside the convex hull of that office's samples, it is
+not near a cell boundary and the predicted cell is one /points has already
+returned for that office. Anything it cannot answer confidently (unknown
+area, two offices nearby, outside the sampled area, too few samples, a cell
+never seen) returns None and the caller falls back to /points.
+"""
+
+import threading
+from collections import defaultdict
+
+import numpy as np
+
+import bootstrap_cache
+from log_config import get_logger
+
+logger = get_logger('grid_index', 'grid_index.log')
+
+# Constants
+BIN_SIZE = 0.25  # degrees per spatial hash bin (roughly 25 km)
+MIN_SAMPLES = 6  # cached /points answers an office needs before its grid is fitted
+MAX_RESIDUAL = 0.35  # RMS fit error, in grid cells, above which a fit is not trusted
+BOUNDARY_MARGIN = 0.2  # cells a prediction must clear from a cell boundary
+
+
+def _bin(lat, lon):
+    return int(np.floor(lat / BIN_SIZE)), int(np.floor(lon / BIN_SIZE))
+
+
+def _cross(o, a, b):
+    return (a[0] - o[0]) * (b[1] - o[1]) - (a[1] - o[1]) * (b[0] - o[0])
+
+
+def convex_hull(points):
+    """
+    Return the counter-clockwise convex hull (Andrew's monotone chain) of
+    (lat, lon) points as an (n, 2) array.
+    """
+    points = sorted(set(points))
+    if len(points) < 3:
+        return np.array(points, dtype=np.float64)
+    lower, upper = [], []
+    for p in points:
+        while len(lower) >= 2 and _cross(lower[-2], lower[-1], p) <= 0:
+            lower.pop()
+        lower.append(p)
+    for p in reversed(points):
+        while len(upper) >= 2 and _cross(upper[-2], upper[-1], p) <= 0:
+            upper.pop()
+        upper.append(p)
+    return np.array(lower[:-1] + upper[:-1], dtype=np.float64)
+
+
+class _OfficeModel:
+    """
+    A least-squares affine fit of (gridX, gridY) on (lat, lon) for one office.
+    """
+
+    def __init__(self, samples):
+        points = np.array([(lat, lon) for lat, lon, _, _ in samples], dtype=np.float64)
+        cells = np.array([(x, y) for _, _, x, y in samples], dtype=np.float64)
+        self.origin = points.mean(axis=0)
+        design = np.column_stack((points - self.origin, np.ones(len(points))))
+        self.coef, _, rank, _ = np.linalg.lstsq(design, cells, rcond=None)
+        self.rank = rank
+        self.residual = float(np.sqrt(np.mean((design @ self.coef - cells) ** 2)))
+        self.hull = convex_hull((lat, lon) for lat, lon, _, _ in samples)
+        self.cells = {(x, y) for _, _, x, y in samples}  # gridpoints /points has returned
+
+    @property
+    def usable(self):
+        return self.rank == 3 and self.residual <= MAX_RESIDUAL
+
+    def covers(self, lat, lon):
+        """
+        Return True if the point lies inside (or on) the hull of the office's
+        samples. A bin with samples from only this office can still reach into
+        an unsampled neighbouring office; outside the hull it is not trusted.
+        """
+        if len(self.hull) < 3:
+            return False
+        edges = np.roll(self.hull, -1, axis=0) - self.hull
+        offsets = np.array((lat, lon)) - self.hull
+        return bool(np.all(edges[:, 0] * offsets[:, 1] - edges[:, 1] * offsets[:, 0] >= -1e-12))
+
+    def predict(self, lat, lon):
+        """
+        Return (gridX, gridY), or None when the point is too close to a cell boundary.
+        """
+        estimate = np.append(np.array((lat, lon)) - self.origin, 1.0) @ self.coef
+        nearest = np.rint(estimate)
+        # NWS answers with the nearest gridpoint; near the midpoint either neighbour is plausible
+        if np.any(np.abs(estimate - nearest) > 0.5 - BOUNDARY_MARGIN):
+            return None
+        return int(nearest[0]), int(nearest[1])
+
+
+class GridIndex:
+    """
+    In-memory lat/lon -> (gridId, gridX, gridY) lookups.
+    """
+
+    def __init__(self, grids=()):
+        """
+        :param grids: (lat, lon, gridId, gridX, gridY) tuples from /points answers.
+        """
+        self._lock = threading.Lock()
+        self._exact = {}  # grid_key -> (gridId, gridX, gridY)
+        self._bins = defaultdict(set)  # spatial bin -> offices with samples in it
+        self._samples = defaultdict(list)  # office -> [(lat, lon, gridX, gridY)]
+        self._models = {}  # office -> _OfficeModel, fitted on first use
+        self.hits = 0
+        self.inferred = 0
+        self.misses = 0
+        for grid in grids:
+            self.add(*grid)
+
+    @classmethod
+    def from_bootstrap_cache(cls, cache=None):
+        """
+        Build an index from every grid in the bootstrap cache.
+        """
+        cache = cache or bootstrap_cache.get_cache()
+        index = cls(cache.iter_grids())
+        logger.info("Grid index built from %d cached /points answers", len(index))
+        return index
+
+    def __len__(self):
+        return len(self._exact)
+
+    def add(self, lat, lon, grid_id, grid_x, grid_y):
+        """
+        Add a /points answer to the index. Coordinates may be numbers or
+        strings, as Location returns them.
+        """
+        lat, lon = float(lat), float(lon)
+        key = bootstrap_cache.grid_key(lat, lon)
+        with self._lock:
+            if key in self._exact:
+                return
+            self._exact[key] = (grid_id, grid_x, grid_y)
+            self._bins[_bin(lat, lon)].add(grid_id)
+            self._samples[grid_id].append((lat, lon, grid_x, grid_y))
+            self._models.pop(grid_id, None)
+
+    def _model(self, office):
+        model = self._models.get(office)
+        if model is None and len(self._samples[office]) >= MIN_SAMPLES:
+            model = self._models[office] = _OfficeModel(self._samples[office])
+            if not model.usable:
+                logger.info("Grid fit for %s not trusted (rank %d, residual %.2f cells)",
+                            office, model.rank, model.residual)
+        return model
+
+    def lookup(self, lat, lon):
+        """
+        Return (gridId, gridX, gridY) for a lat/lon, or None if the index
+        cannot answer it confidently.
+        """
+        lat, lon = float(lat), float(lon)
+        with self._lock:
+            exact = self._exact.get(bootstrap_cache.grid_key(lat, lon))
+            if exact is not None:
+                self.hits += 1
+                return exact
+            offices = self._bins.get(_bin(lat, lon), ())
+            # Only infer inside a bin one office owns; near office boundaries ask /points
+            if len(offices) == 1:
+                office = next(iter(offices))
+                model = self._model(office)
+                cell = model.predict(lat, lon) \
+                    if model is not None and model.usable and model.covers(lat, lon) else None
+                # Curvature or a concave office area can still put the fit on a
+                # gridpoint /points never returned; only trust cells it has
+                if cell is not None and cell in model.cells:
+                    self.inferred += 1
+                    return (office,) + cell
+            self.misses += 1
+            return None
+
+    def get_stats(self):
+        """
+        Return lookup counts and index size.
+        """
+        with self._lock:
+            return {
+                "points": len(self._exact),
+                "offices": len(self._samples),
+                "hits": self.hits,
+                "inferred": self.inferred,
+                "misses": self.misses,
+            }
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_index():
+    """
+    Return the process-wide GridIndex, built from the bootstrap cache on first use.
+    """
+    global _index
+    with _index_lock:
+        if _index is None:
+            _index = GridIndex.from_bootstrap_cache()
+        return _index
+
+
+def set_index(index):
+    """
+    Replace the process-wide GridIndex (None rebuilds it on next use).
+    Returns the previous one, so callers can put it back.
+    """
+    global _index
+    with _index_lock:
+        previous, _index = _index, index
+        return previous
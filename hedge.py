@@ -0,0 +1,289 @@
+"""Hedged requests across redundant weather and AQI providers.
+
+A Hedge calls its primary provider and, if no answer has arrived after that
+provider's recent latency percentile, starts the secondary as well. The
+first valid normalized response wins and the other request is cancelled
+through its http_client.CancelToken, so a slow api.weather.gov no longer
+sets the tail latency of a refresh.
+
+Providers return normalized data:
+
+  weather  {"current": {"temperature": °F, "short_forecast": str},
+            "daily": [{"name", "high_temp", "low_temp", "percentageOfPrecipitation"}]}
+  aqi      {"scale": "us_epa" | "owm", "daily": [{"date", "aqi", "category"}]}
+"""
+
+import queue
+import threading
+import time
+from collections import deque
+import numpy as np
+
+import aqi
+import coalesce
+import http_client
+import openweatheraqi
+from log_config import get_logger
+from onecall_weather import OneCallWeather
+from weather_gov import RemoteWeather
+
+logger = get_logger('hedge', 'hedge.log')
+
+# Constants
+HEDGE_PERCENTILE = 90  # hedge once the primary is slower than this share of its recent calls
+MIN_SAMPLES = 5  # latencies recorded before the percentile is trusted
+DEFAULT_DELAY = 2.0  # seconds to wait for the primary before enough samples exist
+MIN_DELAY = 0.25
+MAX_DELAY = 10.0
+HEDGE_TIMEOUT = 30  # seconds to wait for any provider
+WINDOW = 50  # recent latencies kept per provider
+OPENWEATHER_KEY_FILE = '/private/keys/openweather.txt'
+AIRNOW_KEY_FILE = '/private/keys/aqi.txt'
+
+
+class LatencyTracker:
+    """
+    Recent network-call latencies per provider. A call cancelled because the
+    other provider won is recorded with its elapsed time as a lower bound,
+    so slow calls are not dropped from the percentile.
+    """
+
+    def __init__(self, window=WINDOW):
+        self._lock = threading.Lock()
+        self._latencies = {}
+        self.window = window
+
+    def record(self, name, seconds):
+        with self._lock:
+            self._latencies.setdefault(name, deque(maxlen=self.window)).append(seconds)
+
+    def hedge_delay(self, name, percentile=HEDGE_PERCENTILE):
+        """
+        Return how long to wait for a provider before hedging.
+        """
+        with self._lock:
+            samples = list(self._latencies.get(name, ()))
+        if len(samples) < MIN_SAMPLES:
+            return DEFAULT_DELAY
+        return float(np.clip(np.percentile(samples, percentile), MIN_DELAY, MAX_DELAY))
+
+    def get_stats(self):
+        with self._lock:
+            return {
+                name: {"samples": len(samples), "p50": round(float(np.percentile(samples, 50)), 3),
+                       "p90": round(float(np.percentile(samples, 90)), 3)}
+                for name, samples in self._latencies.items() if samples
+            }
+
+
+class Provider:
+    """
+    A named fetch function returning normalized data, or None if it has none.
+    """
+
+    def __init__(self, name, fetch):
+        self.name = name
+        self.fetch = fetch
+
+
+class Hedge:
+    """
+    Runs a primary provider and hedges with a secondary one when the primary is slow.
+    """
+
+    def __init__(self, primary, secondary, tracker=None, percentile=HEDGE_PERCENTILE, timeout=HEDGE_TIMEOUT):
+        self.primary = primary
+        self.secondary = secondary
+        self.tracker = tracker or LatencyTracker()
+        self.percentile = percentile
+        self.timeout = timeout
+        self.hedged = 0
+        self.wins = {primary.name: 0, secondary.name: 0}
+
+    def _start(self, provider, results):
+        token = http_client.CancelToken()
+
+        def run():
+            start = time.monotonic()
+            try:
+                with http_client.cancel_scope(token):
+                    value = provider.fetch()
+            except http_client.RequestCancelled:
+                # It took at least this long; leaving it out would pull the percentile down
+                self.tracker.record(provider.name, time.monotonic() - start)
+                return
+            except Exception as e:
+                logger.warning("Provider %s failed: %s", provider.name, e)
+                results.put((provider, None, e))
+                return
+            # A call answered from the HTTP cache says nothing about upstream latency
+            if token.requests:
+                self.tracker.record(provider.name, time.monotonic() - start)
+            results.put((provider, value, None))
+
+        threading.Thread(target=coalesce.in_cycle(run), name=f"hedge-{provider.name}", daemon=True).start()
+        return token
+
+    def call(self):
+        """
+        Return (value, provider name) from the first provider with a valid
+        answer. Raises the last error if neither provider answers.
+        """
+        results = queue.Queue()
+        end = time.monotonic() + self.timeout
+        tokens = {self.primary.name: self._start(self.primary, results)}
+        delay = self.tracker.hedge_delay(self.primary.name, self.percentile)
+        pending = 1
+        error = None
+
+        while pending:
+            hedge_now = self.secondary.name not in tokens
+            wait = delay if hedge_now else end - time.monotonic()
+            try:
+                provider, value, e = results.get(timeout=max(0, wait))
+            except queue.Empty:
+                if hedge_now:
+                    logger.info("%s slower than %.2fs, hedging with %s",
+                                self.primary.name, delay, self.secondary.name)
+                    self.hedged += 1
+                    tokens[self.secondary.name] = self._start(self.secondary, results)
+                    pending += 1
+                    continue
+                break
+            pending -= 1
+            if value is not None:
+                # First valid answer wins; abort whatever is still in flight
+                for name, token in tokens.items():
+                    if name != provider.name:
+                        token.cancel()
+                self.wins[provider.name] += 1
+                return value, provider.name
+            error = e or error
+            if hedge_now:
+                # The primary failed outright; go to the secondary without waiting
+                self.hedged += 1
+                tokens[self.secondary.name] = self._start(self.secondary, results)
+                pending += 1
+
+        for token in tokens.values():
+            token.cancel()
+        raise error or TimeoutError(f"no provider answered within {self.timeout}s")
+
+    def get_stats(self):
+        return {"hedged": self.hedged, "wins": dict(self.wins), "latency": self.tracker.get_stats()}
+
+
+def _read_key(path):
+    with open(path, encoding="utf-8") as f:
+        return f.read().strip()
+
+
+_apis = {}  # (class, args) -> provider client
+_apis_lock = threading.Lock()
+
+
+def _api(cls, *args):
+    """
+    Return the provider client for these arguments, creating it on first use.
+    Reusing clients keeps their per-instance caches (e.g. the AqiSnapshot)
+    across hedged calls.
+    """
+    with _apis_lock:
+        api = _apis.get((cls, args))
+        if api is None:
+            api = _apis[(cls, args)] = cls(*args)
+        return api
+
+
+def nws_weather(lat, lon, weather_api=None):
+    """
+    Current conditions and daily forecast from api.weather.gov.
+    :param weather_api: An already resolved RemoteWeather for this location.
+    """
+    if weather_api is None:
+        weather_api = _api(RemoteWeather, lat, lon)
+    daily = weather_api.get_daily_forecast()
+    current = weather_api.get_current_weather()
+    if not daily or current.get("temperature") is None:
+        return None
+    return {
+        "current": {"temperature": current["temperature"], "short_forecast": current["short_forecast"]},
+        "daily": daily,
+    }
+
+
+def openweather_weather(lat, lon):
+    """
+    Current conditions and daily forecast from one OpenWeather One Call request.
+    """
+    weather_api = _api(OneCallWeather, lat, lon, _read_key(OPENWEATHER_KEY_FILE))
+    daily = weather_api.get_daily_forecast()
+    if not daily:
+        return None
+    current = weather_api.get_current_weather()
+    return {
+        "current": {"temperature": current["temperature"], "short_forecast": current["short_forecast"]},
+        "daily": daily,
+    }
+
+
+def airnow_aqi(zip_code):
+    """
+    Daily AQI forecast from AirNow, on the US EPA scale.
+    """
+    forecasts = _api(aqi.RemoteAQI, zip_code, _read_key(AIRNOW_KEY_FILE)).get_forecasts()
+    if not forecasts:
+        return None
+    return {
+        "scale": "us_epa",
+        "daily": [
+            {"date": day.date.strftime("%Y-%m-%d"), "aqi": day.aqi, "category": day.human_readable}
+            for day in sorted(forecasts.values(), key=lambda day: day.date)
+        ],
+    }
+
+
+def openweather_aqi(lat, lon):
+    """
+    Daily AQI forecast from OpenWeather, on its 1-5 scale.
+    """
+    daily = _api(openweatheraqi.RemoteAQI, lat, lon, _read_key(OPENWEATHER_KEY_FILE)).get_daily_aqi_forecast()
+    if not daily:
+        return None
+    return {"scale": "owm", "daily": daily}
+
+
+_tracker = LatencyTracker()
+
+
+def weather_hedge(lat, lon, weather_api=None):
+    """
+    Return a Hedge of api.weather.gov (primary) and OpenWeather (secondary).
+    :param weather_api: An already resolved RemoteWeather for this location.
+    """
+    return Hedge(Provider("api.weather.gov", lambda: nws_weather(lat, lon, weather_api)),
+                 Provider("openweather", lambda: openweather_weather(lat, lon)),
+                 tracker=_tracker)
+
+
+def aqi_hedge(lat, lon, zip_code):
+    """
+    Return a Hedge of AirNow (primary) and OpenWeather air pollution (secondary).
+    """
+    return Hedge(Provider("airnow", lambda: airnow_aqi(zip_code)),
+                 Provider("openweather-aqi", lambda: openweather_aqi(lat, lon)),
+                 tracker=_tracker)
+
+
+def get_weather(lat, lon, weather_api=None):
+    """
+    Return (normalized weather, provider name) from the faster healthy provider.
+    """
+    return weather_hedge(lat, lon, weather_api).call()
+
+
+def get_aqi(lat, lon, zip_code):
+    """
+    Return (normalized daily AQI, provider name) from the faster healthy provider.
+    """
+    return aqi_hedge(lat, lon, zip_code).call()
@@ -0,0 +1,450 @@
+"""HTTP response cache for the remote forecast sources.
+
+ResponseCache sits in front of the shared HttpClient. It serves entries that
+are still fresh according to Cache-Control / Expires without touching the
+network, revalidates stale entries with If-None-Match / If-Modified-Since, and
+keeps gzip-compressed bodies on disk so the cache survives restarts. Network
+requests draw on the cross-process rate_limit budget; when a host is over
+budget, a cached entry is served even if stale. Bodies
+the server already sent gzip-encoded are stored exactly as transferred, and
+iter_chunks() decompresses them incrementally for streaming decoders; on a
+miss it decompresses the body as it arrives from the network and stores the
+transferred bytes once complete.
+"""
+
+import gzip
+import hashlib
+import json
+import os
+import threading
+import time
+import urllib.error
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlsplit
+
+import http_client
+import json_stream
+import rate_limit
+from log_config import get_logger
+
+logger = get_logger('http_cache', 'http_cache.log')
+
+# Constants
+CACHE_DIR = os.path.join("cache", "http")
+HEURISTIC_FRACTION = 0.1  # of (Date - Last-Modified) when no explicit lifetime is given
+MAX_HEURISTIC_LIFETIME = 3600  # seconds
+
+
+def parse_http_date(value):
+    """
+    Parse an HTTP date header into epoch seconds, or None if it is invalid.
+    """
+    if not value:
+        return None
+    try:
+        return parsedate_to_datetime(value).timestamp()
+    except (TypeError, ValueError, IndexError, OverflowError):
+        return None
+
+
+def parse_cache_control(value):
+    """
+    Parse a Cache-Control header into a dict of lower-case directives.
+    """
+    directives = {}
+    for part in (value or "").split(","):
+        part = part.strip()
+        if not part:
+            continue
+        name, _, arg = part.partition("=")
+        directives[name.strip().lower()] = arg.strip().strip('"') or None
+    return directives
+
+
+def freshness_lifetime(headers, response_time):
+    """
+    Work out how long a response stays fresh (RFC 9111 section 4.2.1).
+    Returns None if the response must not be stored.
+    """
+    directives = parse_cache_control(headers.get("Cache-Control"))
+    if "no-store" in directives:
+        return None
+    if "no-cache" in directives:
+        return 0
+    for name in ("s-maxage", "max-age"):
+        if directives.get(name) is not None:
+            try:
+                return max(0, int(directives[name]))
+            except ValueError:
+                return 0
+    date = parse_http_date(headers.get("Date")) or response_time
+    expires = headers.get("Expires")
+    if expires is not None:
+        expires_at = parse_http_date(expires)
+        return max(0, expires_at - date) if expires_at is not None else 0
+    last_modified = parse_http_date(headers.get("Last-Modified"))
+    if last_modified is not None:
+        return min(MAX_HEURISTIC_LIFETIME, max(0, (date - last_modified) * HEURISTIC_FRACTION))
+    return 0
+
+
+def current_age(headers, response_time):
+    """
+    Return the age of a response at the moment it was received.
+    """
+    age = 0
+    try:
+        age = int(headers.get("Age") or 0)
+    except ValueError:
+        pass
+    date = parse_http_date(headers.get("Date"))
+    if date is not None:
+        age = max(age, response_time - date)
+    return max(0, age)
+
+
+class CacheEntry:
+    """
+    Metadata for one cached response. The body itself lives on disk.
+    """
+
+    def __init__(self, stored_at, expires_at, etag=None, last_modified=None):
+        self.stored_at = stored_at
+        self.expires_at = expires_at
+        self.etag = etag
+        self.last_modified = last_modified
+
+    def is_fresh(self, now=None):
+        return (now or time.time()) < self.expires_at
+
+    def as_dict(self):
+        return {
+            "stored_at": self.stored_at,
+            "expires_at": self.expires_at,
+            "etag": self.etag,
+            "last_modified": self.last_modified,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data["stored_at"], data["expires_at"], data.get("etag"), data.get("last_modified"))
+
+
+class ResponseCache:
+    """
+    A disk-backed HTTP response cache with conditional revalidation.
+    """
+
+    def __init__(self, directory=CACHE_DIR, client=None):
+        self.directory = directory
+        self.client = client or http_client.get_client()
+        self._lock = threading.Lock()
+        self._entries = {}  # key -> CacheEntry
+        self._bodies = {}  # key -> gzip-compressed bytes
+        self.hits = 0
+        self.revalidated = 0
+        self.misses = 0
+        self.throttled = 0
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+        except OSError:
+            logger.warning("Could not create cache directory %s", self.directory)
+
+    def _key(self, url):
+        return hashlib.sha1(url.encode("utf8")).hexdigest()
+
+    def _paths(self, key):
+        base = os.path.join(self.directory, key)
+        return base + ".meta.json", base + ".gz"
+
+    def _load(self, key):
+        """
+        Load an entry from memory, falling back to disk.
+        """
+        entry = self._entries.get(key)
+        if entry is not None:
+            return entry
+        meta_path, _ = self._paths(key)
+        try:
+            with open(meta_path, encoding="utf-8") as f:
+                entry = CacheEntry.from_dict(json.load(f))
+        except (OSError, ValueError, KeyError):
+            return None
+        self._entries[key] = entry
+        return entry
+
+    def _body(self, key):
+        """
+        Return the gzip-compressed body for an entry.
+        """
+        body = self._bodies.get(key)
+        if body is None:
+            _, body_path = self._paths(key)
+            with open(body_path, "rb") as f:
+                body = f.read()
+            self._bodies[key] = body
+        return body
+
+    def _write_meta(self, key, entry):
+        meta_path, _ = self._paths(key)
+        tmp_path = meta_path + ".tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(entry.as_dict(), f)
+            os.replace(tmp_path, meta_path)
+        except OSError as e:
+            logger.warning("Could not write cache metadata %s: %s", meta_path, e)
+
+    def _store(self, key, response, response_time):
+        lifetime = freshness_lifetime(response.headers, response_time)
+        if lifetime is None:
+            self._discard(key)
+            return
+        expires_at = response_time + lifetime - current_age(response.headers, response_time)
+        entry = CacheEntry(response_time, expires_at,
+                           response.headers.get("ETag"), response.headers.get("Last-Modified"))
+        encoding = (response.content_encoding or "").strip().lower()
+        if encoding in ("gzip", "x-gzip"):
+            body = response.raw
+        else:
+            body = gzip.compress(response.body)
+        _, body_path = self._paths(key)
+        tmp_path = body_path + ".tmp"
+        try:
+            with open(tmp_path, "wb") as f:
+                f.write(body)
+            os.replace(tmp_path, body_path)
+        except OSError as e:
+            logger.warning("Could not write cache body %s: %s", body_path, e)
+        self._write_meta(key, entry)
+        self._entries[key] = entry
+        self._bodies[key] = body
+        return body
+
+    def _discard(self, key):
+        self._entries.pop(key, None)
+        self._bodies.pop(key, None)
+        for path in self._paths(key):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def _refresh(self, key, entry, response, response_time):
+        """
+        Update an entry's freshness after a 304 Not Modified.
+        """
+        lifetime = freshness_lifetime(response.headers, response_time) or 0
+        entry.stored_at = response_time
+        entry.expires_at = response_time + lifetime - current_age(response.headers, response_time)
+        entry.etag = response.headers.get("ETag") or entry.etag
+        entry.last_modified = response.headers.get("Last-Modified") or entry.last_modified
+        self._write_meta(key, entry)
+
+    def get(self, url, timeout=None):
+        """
+        Return the response body for a URL, from the cache when fresh,
+        revalidating or downloading it otherwise.
+        """
+        return gzip.decompress(self._get_compressed(url, timeout))
+
+    def iter_chunks(self, url, timeout=None):
+        """
+        Yield the response body for a URL in decompressed chunks, so a
+        streaming decoder never holds the whole decompressed document.
+        """
+        key = self._key(url)
+        body, entry = self._lookup(key, url)
+        if body is None:
+            body = yield from self._stream(key, url, entry, timeout)
+        if body is not None:
+            yield from json_stream.iter_decompressed(json_stream.iter_bytes(body), "gzip")
+
+    def _stream(self, key, url, entry, timeout):
+        """
+        Download a body with HttpClient.stream(), yielding it decompressed as it
+        arrives, and store it once complete. Returns None, or the cached body
+        when the server answers 304 Not Modified.
+        """
+        received = []
+        chunks = self.client.stream(url, headers=self._conditional_headers(entry), timeout=timeout,
+                                    raw=True, on_response=received.append)
+        first = next(chunks, None)  # sends the request; on_response has run
+        response = received[0]
+        response_time = time.time()
+        if response.status == 304 and entry is not None:
+            with self._lock:
+                try:
+                    body = self._body(key)
+                except OSError:
+                    body = None
+                if body is not None:
+                    self._refresh(key, entry, response, response_time)
+                    self.revalidated += 1
+                    logger.debug("Revalidated %s", url)
+                    return body
+            # The cached body is gone; fetch it again unconditionally, as a new request
+            chunks.close()
+            rate_limit.get_limiter().acquire(urlsplit(url).hostname)
+            return (yield from self._stream(key, url, None, timeout))
+
+        raw = []
+
+        def tee():
+            if first is not None:
+                raw.append(first)
+                yield first
+            for chunk in chunks:
+                raw.append(chunk)
+                yield chunk
+
+        try:
+            yield from json_stream.iter_decompressed(tee(), response.content_encoding)
+        except GeneratorExit:
+            # The consumer stopped early (e.g. after `limit` items); read the rest
+            # without decoding it so the entry can still be cached
+            try:
+                raw.extend(chunks)
+            except Exception as e:
+                logger.debug("Not caching %s, body incomplete: %s", url, e)
+                return None
+            self._store_streamed(key, response, raw, response_time)
+            raise
+        self._store_streamed(key, response, raw, response_time)
+        return None
+
+    def _store_streamed(self, key, response, raw, response_time):
+        response = http_client.HttpResponse(response.url, response.status, response.reason,
+                                            response.headers, b"".join(raw))
+        with self._lock:
+            self.misses += 1
+            self._store(key, response, response_time)
+
+    def _conditional_headers(self, entry):
+        headers = {}
+        if entry is not None:
+            if entry.etag:
+                headers["If-None-Match"] = entry.etag
+            if entry.last_modified:
+                headers["If-Modified-Since"] = entry.last_modified
+        return headers
+
+    def _lookup(self, key, url):
+        """
+        Return (body, entry). body is the cached gzip body when it can be served
+        without a request (fresh, or the host is over budget), otherwise None,
+        with the entry to revalidate (or None) and a request taken from the budget.
+        """
+        with self._lock:
+            entry = self._load(key)
+            if entry is not None and entry.is_fresh():
+                try:
+                    body = self._body(key)
+                    self.hits += 1
+                    return body, entry
+                except OSError:
+                    entry = None
+
+        host = urlsplit(url).hostname
+        limiter = rate_limit.get_limiter()
+        if limiter.wait_time(host) > 0:
+            # Over budget: stale cached data beats an error or a throttled request
+            with self._lock:
+                try:
+                    body = self._body(key) if entry is not None else None
+                except OSError:
+                    body = None
+                if body is not None:
+                    self.throttled += 1
+                    logger.info("Over request budget for %s, serving cached %s", host, url)
+                    return body, entry
+        limiter.acquire(host)
+        return None, entry
+
+    def _get_compressed(self, url, timeout=None):
+        """
+        Return the gzip-compressed response body for a URL.
+        """
+        key = self._key(url)
+        body, entry = self._lookup(key, url)
+        if body is not None:
+            return body
+        response = self.client.request(url, headers=self._conditional_headers(entry), timeout=timeout)
+        response_time = time.time()
+        if response.status == 304 and entry is not None:
+            with self._lock:
+                try:
+                    body = self._body(key)
+                except OSError:
+                    body = None
+                if body is not None:
+                    self._refresh(key, entry, response, response_time)
+                    self.revalidated += 1
+                    logger.debug("Revalidated %s", url)
+                    return body
+            # The cached body is gone; fetch it again unconditionally, as a new
+            # request and without holding the lock over the network
+            rate_limit.get_limiter().acquire(urlsplit(url).hostname)
+            response = self.client.request(url, timeout=timeout)
+            response_time = time.time()
+        if response.status >= 400:
+            raise urllib.error.HTTPError(response.url, response.status, response.reason, response.headers, None)
+        with self._lock:
+            self.misses += 1
+            body = self._store(key, response, response_time)
+            if body is None:
+                body = gzip.compress(response.body)
+            return body
+
+    def get_json(self, url, timeout=None):
+        """
+        Return the decoded JSON body for a URL.
+        """
+        return json.loads(self.get(url, timeout=timeout).decode("utf8"))
+
+    def iter_array_items(self, url, key, limit=None, timeout=None):
+        """
+        Incrementally decode the array stored under `key` in a JSON response,
+        stopping after `limit` items.
+        """
+        return json_stream.iter_array_items(self.iter_chunks(url, timeout=timeout), key, limit)
+
+    def get_stats(self):
+        """
+        Return hit, revalidation, miss and over-budget counts.
+        """
+        return {"hits": self.hits, "revalidated": self.revalidated, "misses": self.misses,
+                "throttled": self.throttled}
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_cache():
+    """
+    Return the process-wide shared ResponseCache.
+    """
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = ResponseCache()
+        return _cache
+
+
+def set_cache(cache):
+    """
+    Replace the process-wide ResponseCache (None creates a new one on next
+    use). Returns the previous one, so callers can put it back.
+    """
+    global _cache
+    with _cache_lock:
+        previous, _cache = _cache, cache
+        return previous
+
+
+def get_json(url, timeout=None):
+    """
+    Fetch a URL through the shared response cache and decode the body as JSON.
+    """
+    return get_cache().get_json(url, timeout=timeout)
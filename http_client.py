@@ -0,0 +1,606 @@
+"""Shared pooled HTTP client for the remote data sources.
+
+Every remote fetch (NWS, OpenWeather, AirNow, ident.me, ip-api.com) goes
+through one process-wide HttpClient so that connections are kept alive per
+host, DNS answers are cached and TLS sessions are resumed between refresh
+cycles instead of paying for a new lookup, connect and handshake each time.
+
+Requests made inside a cancel_scope() can be aborted from another thread by
+cancelling its CancelToken, which shuts down the sockets they are using.
+
+Setting an upstream (set_upstream() or the ALARM_CLOCK_UPSTREAM environment
+variable) sends every request to a stand-in server instead, as
+http://upstream/<host><path>; see replay.py. Observers added with
+add_observer() see every completed response, which is how replay records.
+"""
+
+import http.client
+import json
+import os
+import socket
+import ssl
+import threading
+import time
+import urllib.error
+from contextlib import contextmanager
+from urllib.parse import urljoin, urlsplit
+
+import json_stream
+from log_config import get_logger
+
+logger = get_logger('http_client', 'http_client.log')
+
+# Constants
+DEFAULT_TIMEOUT = 30  # seconds
+DNS_TTL = 300  # seconds
+MAX_IDLE_PER_HOST = 4
+MAX_REDIRECTS = 5
+USER_AGENT = "alarm-clock (https://github.com/alex-donaldson/alarm-clock)"
+ACCEPT_ENCODING = "gzip, deflate"
+REDIRECT_STATUSES = (301, 302, 303, 307, 308)
+UPSTREAM_ENV = "ALARM_CLOCK_UPSTREAM"
+
+
+class RequestCancelled(Exception):
+    """
+    Raised by a request whose CancelToken was cancelled while it was in flight.
+    """
+
+
+class CancelToken:
+    """
+    Lets one thread abort the requests another thread makes inside cancel_scope().
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._conns = set()
+        self.cancelled = False
+        self.requests = 0  # network requests made under this token
+
+    def cancel(self):
+        """
+        Abort every request in flight under this token, and any started later.
+        """
+        with self._lock:
+            self.cancelled = True
+            conns = list(self._conns)
+        for conn in conns:
+            # Shutting the socket down wakes a recv() blocked in the other thread
+            if conn.sock is not None:
+                try:
+                    conn.sock.shutdown(socket.SHUT_RDWR)
+                except OSError:
+                    pass
+
+    def register(self, conn):
+        with self._lock:
+            if self.cancelled:
+                raise RequestCancelled("request cancelled")
+            self._conns.add(conn)
+            self.requests += 1
+
+    def unregister(self, conn):
+        with self._lock:
+            self._conns.discard(conn)
+
+
+_scope = threading.local()
+
+
+@contextmanager
+def cancel_scope(token):
+    """
+    Make requests from this thread abortable through token.cancel().
+    """
+    previous = getattr(_scope, "token", None)
+    _scope.token = token
+    try:
+        yield token
+    finally:
+        _scope.token = previous
+
+
+def current_token():
+    """
+    Return the CancelToken of the enclosing cancel_scope(), or None.
+    """
+    return getattr(_scope, "token", None)
+
+
+class HttpResponse:
+    """
+    A fully read HTTP response. `raw` holds the body as transferred (possibly
+    gzip/deflate compressed); `body` is decompressed on first access.
+    """
+
+    def __init__(self, url, status, reason, headers, raw):
+        self.url = url
+        self.status = status
+        self.reason = reason
+        self.headers = headers
+        self.raw = raw
+        self.content_encoding = headers.get("Content-Encoding")
+        self._body = None
+
+    @property
+    def body(self):
+        if self._body is None:
+            self._body = json_stream.decompress(self.raw, self.content_encoding)
+        return self._body
+
+    def text(self):
+        """
+        Decode the response body as UTF-8 text.
+        """
+        return self.body.decode("utf8")
+
+    def json(self):
+        """
+        Decode the response body as JSON.
+        """
+        return json.loads(self.text())
+
+
+class HostStats:
+    """
+    Connection statistics for a single host.
+    """
+
+    def __init__(self):
+        self.requests = 0
+        self.connections = 0
+        self.reused = 0
+        self.tls_resumed = 0
+        self.dns_lookups = 0
+        self.dns_hits = 0
+
+    def as_dict(self):
+        return {
+            "requests": self.requests,
+            "connections": self.connections,
+            "reused": self.reused,
+            "tls_resumed": self.tls_resumed,
+            "dns_lookups": self.dns_lookups,
+            "dns_hits": self.dns_hits,
+        }
+
+
+def _connect(addresses, timeout, on_failure=None):
+    """
+    Connect to the first reachable (family, sockaddr) in order, as
+    socket.create_connection() does for a host name. on_failure(address) is
+    called for each address that could not be reached.
+    """
+    error = None
+    for address in addresses:
+        family, sockaddr = address
+        sock = socket.socket(family, socket.SOCK_STREAM)
+        try:
+            if timeout is not None:
+                sock.settimeout(timeout)
+            sock.connect(sockaddr)
+        except OSError as e:
+            sock.close()
+            error = e
+            if on_failure is not None:
+                on_failure(address)
+            continue
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        return sock
+    raise error or OSError("no addresses to connect to")
+
+
+class _PooledHTTPConnection(http.client.HTTPConnection):
+    """
+    An HTTPConnection that connects to pre-resolved addresses.
+    """
+
+    def __init__(self, host, port, addresses, timeout, on_failure=None):
+        super().__init__(host, port, timeout=timeout)
+        self._addresses = addresses
+        self._on_failure = on_failure
+
+    def connect(self):
+        self.sock = _connect(self._addresses, self.timeout, self._on_failure)
+
+
+class _PooledHTTPSConnection(http.client.HTTPSConnection):
+    """
+    An HTTPSConnection that connects to pre-resolved addresses and offers a
+    previously negotiated TLS session for resumption.
+    """
+
+    def __init__(self, host, port, addresses, timeout, context, session, on_failure=None):
+        super().__init__(host, port, timeout=timeout, context=context)
+        self._addresses = addresses
+        self._session = session
+        self._on_failure = on_failure
+
+    def connect(self):
+        sock = _connect(self._addresses, self.timeout, self._on_failure)
+        self.sock = self._context.wrap_socket(sock, server_hostname=self.host, session=self._session)
+
+
+class HttpClient:
+    """
+    A keep-alive HTTP client with a per-host connection pool, a DNS cache and
+    TLS session resumption.
+    """
+
+    def __init__(self, timeout=DEFAULT_TIMEOUT, dns_ttl=DNS_TTL, max_idle_per_host=MAX_IDLE_PER_HOST):
+        self.timeout = timeout
+        self.dns_ttl = dns_ttl
+        self.max_idle_per_host = max_idle_per_host
+        self.ssl_context = ssl.create_default_context()
+        self._lock = threading.Lock()
+        self._idle = {}  # (scheme, host, port) -> [connection, ...]
+        self._dns = {}  # (host, port) -> ([(family, sockaddr), ...], expires_at)
+        self._sessions = {}  # (host, port) -> ssl.SSLSession
+        self._stats = {}  # host -> HostStats
+        self.upstream = os.environ.get(UPSTREAM_ENV) or None
+        self.observers = []
+
+    def _route(self, url):
+        """
+        Return the URL to connect to: the URL itself, or its path on the
+        stand-in upstream when one is set.
+        """
+        if not self.upstream:
+            return url
+        parts = urlsplit(url)
+        routed = f"{self.upstream.rstrip('/')}/{parts.hostname}{parts.path or '/'}"
+        return f"{routed}?{parts.query}" if parts.query else routed
+
+    def _notify(self, response):
+        for observer in self.observers:
+            try:
+                observer(response)
+            except Exception as e:
+                logger.warning("Response observer failed: %s", e)
+
+    def _host_stats(self, host):
+        stats = self._stats.get(host)
+        if stats is None:
+            stats = self._stats[host] = HostStats()
+        return stats
+
+    def resolve(self, host, port):
+        """
+        Resolve a host name to every (family, sockaddr) it has, answering from
+        the DNS cache while the entry is fresh.
+        """
+        now = time.monotonic()
+        with self._lock:
+            stats = self._host_stats(host)
+            cached = self._dns.get((host, port))
+            if cached is not None and cached[1] > now:
+                stats.dns_hits += 1
+                return cached[0]
+            stats.dns_lookups += 1
+        infos = socket.getaddrinfo(host, port, type=socket.SOCK_STREAM)
+        addresses = []
+        for family, _, _, _, sockaddr in infos:
+            if (family, sockaddr) not in addresses:
+                addresses.append((family, sockaddr))
+        with self._lock:
+            self._dns[(host, port)] = (addresses, now + self.dns_ttl)
+        return list(addresses)
+
+    def _demote(self, host, port, address):
+        """
+        Move an address that could not be reached to the end of the cached
+        list, so later connections try the others first.
+        """
+        with self._lock:
+            cached = self._dns.get((host, port))
+            if cached is not None and address in cached[0] and cached[0][-1] != address:
+                addresses = [a for a in cached[0] if a != address] + [address]
+                self._dns[(host, port)] = (addresses, cached[1])
+                logger.info("Could not reach %s at %s, trying other addresses first", host, address[1][0])
+
+    def _checkout(self, scheme, host, port, timeout):
+        """
+        Take an idle connection from the pool, or open a new one.
+        Returns a (connection, reused) tuple.
+        """
+        key = (scheme, host, port)
+        with self._lock:
+            idle = self._idle.get(key)
+            if idle:
+                conn = idle.pop()
+                conn.timeout = timeout
+                if conn.sock is not None:
+                    conn.sock.settimeout(timeout)
+                return conn, True
+            session = self._sessions.get((host, port))
+        addresses = self.resolve(host, port)
+        on_failure = lambda address: self._demote(host, port, address)
+        if scheme == "https":
+            conn = _PooledHTTPSConnection(host, port, addresses, timeout, self.ssl_context, session, on_failure)
+        else:
+            conn = _PooledHTTPConnection(host, port, addresses, timeout, on_failure)
+        return conn, False
+
+    def _checkin(self, scheme, host, port, conn):
+        """
+        Return a connection to the pool, remembering its TLS session.
+        """
+        key = (scheme, host, port)
+        with self._lock:
+            if isinstance(conn.sock, ssl.SSLSocket) and conn.sock.session is not None:
+                self._sessions[(host, port)] = conn.sock.session
+            idle = self._idle.setdefault(key, [])
+            if len(idle) < self.max_idle_per_host:
+                idle.append(conn)
+                return
+        conn.close()
+
+    def _request_once(self, url, headers, timeout):
+        parts = urlsplit(self._route(url))
+        scheme = parts.scheme
+        host = parts.hostname
+        port = parts.port or (443 if scheme == "https" else 80)
+        path = parts.path or "/"
+        if parts.query:
+            path = f"{path}?{parts.query}"
+
+        request_headers = {"User-Agent": USER_AGENT, "Accept": "*/*", "Accept-Encoding": ACCEPT_ENCODING}
+        request_headers.update(headers or {})
+
+        token = current_token()
+        # A pooled connection may have been closed by the server while idle;
+        # retry once on a fresh connection if that happens.
+        for attempt in range(2):
+            conn, reused = self._checkout(scheme, host, port, timeout)
+            if token is not None:
+                token.register(conn)
+            try:
+                conn.request("GET", path, headers=request_headers)
+                response = conn.getresponse()
+                body = response.read()
+            except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError):
+                conn.close()
+                if token is not None and token.cancelled:
+                    raise RequestCancelled(f"request for {url} cancelled") from None
+                if reused and attempt == 0:
+                    logger.debug("Stale pooled connection to %s, reconnecting", host)
+                    continue
+                raise
+            except Exception:
+                conn.close()
+                if token is not None and token.cancelled:
+                    raise RequestCancelled(f"request for {url} cancelled") from None
+                raise
+            finally:
+                if token is not None:
+                    token.unregister(conn)
+            break
+
+        # A socket shut down mid-read can look like a short, complete body
+        if token is not None and token.cancelled:
+            conn.close()
+            raise RequestCancelled(f"request for {url} cancelled")
+
+        with self._lock:
+            stats = self._host_stats(host)
+            stats.requests += 1
+            if reused:
+                stats.reused += 1
+            else:
+                stats.connections += 1
+                if isinstance(conn.sock, ssl.SSLSocket) and conn.sock.session_reused:
+                    stats.tls_resumed += 1
+
+        if response.will_close:
+            conn.close()
+        else:
+            self._checkin(scheme, host, port, conn)
+
+        result = HttpResponse(url, response.status, response.reason, response.headers, body)
+        self._notify(result)
+        return result
+
+    def request(self, url, headers=None, timeout=None):
+        """
+        Issue a GET request, following redirects, and return the HttpResponse
+        whatever its status.
+        """
+        if timeout is None:
+            timeout = self.timeout
+        for _ in range(MAX_REDIRECTS + 1):
+            response = self._request_once(url, headers, timeout)
+            location = response.headers.get("Location")
+            if response.status not in REDIRECT_STATUSES or not location:
+                return response
+            url = urljoin(url, location)
+        return response
+
+    def stream(self, url, headers=None, timeout=None, chunk_size=json_stream.CHUNK_SIZE,
+               raw=False, on_response=None):
+        """
+        Issue a GET request and yield the body in decompressed chunks as it
+        arrives. The connection goes back to the pool only if the body is read
+        to the end; closing the generator early closes the connection.
+        :param raw: Yield the chunks as transferred, still compressed.
+        :param on_response: Called with an HttpResponse (status, headers, empty
+                            body) for the final response before its body is read.
+        """
+        if timeout is None:
+            timeout = self.timeout
+        parts = urlsplit(self._route(url))
+        scheme = parts.scheme
+        host = parts.hostname
+        port = parts.port or (443 if scheme == "https" else 80)
+        path = parts.path or "/"
+        if parts.query:
+            path = f"{path}?{parts.query}"
+        request_headers = {"User-Agent": USER_AGENT, "Accept": "*/*", "Accept-Encoding": ACCEPT_ENCODING}
+        request_headers.update(headers or {})
+
+        token = current_token()
+        conn, reused = self._checkout(scheme, host, port, timeout)
+        if token is not None:
+            token.register(conn)
+        complete = False
+        try:
+            conn.request("GET", path, headers=request_headers)
+            response = conn.getresponse()
+            with self._lock:
+                stats = self._host_stats(host)
+                stats.requests += 1
+                if reused:
+                    stats.reused += 1
+                else:
+                    stats.connections += 1
+            if response.status in REDIRECT_STATUSES and response.headers.get("Location"):
+                response.read()
+                complete = True
+                yield from self.stream(urljoin(url, response.headers["Location"]), headers, timeout, chunk_size,
+                                       raw, on_response)
+                return
+            if response.status >= 400:
+                response.read()
+                complete = True
+                raise urllib.error.HTTPError(url, response.status, response.reason, response.headers, None)
+            if on_response is not None:
+                on_response(HttpResponse(url, response.status, response.reason, response.headers, b""))
+            # read1() returns what has arrived instead of waiting for a full chunk;
+            # it never marks the body finished, so a last read() does that
+            raw_chunks = iter(lambda: response.read1(chunk_size) or response.read(), b"")
+            if self.observers:
+                raw_chunks = self._recording(url, response, raw_chunks)
+            if raw:
+                yield from raw_chunks
+            else:
+                yield from json_stream.iter_decompressed(raw_chunks, response.headers.get("Content-Encoding"))
+            if token is not None and token.cancelled:
+                raise RequestCancelled(f"request for {url} cancelled")
+            complete = True
+        except Exception:
+            if token is not None and token.cancelled:
+                raise RequestCancelled(f"request for {url} cancelled") from None
+            raise
+        finally:
+            if token is not None:
+                token.unregister(conn)
+            if complete and not response.will_close:
+                self._checkin(scheme, host, port, conn)
+            else:
+                conn.close()
+
+    def _recording(self, url, response, raw_chunks):
+        """
+        Pass raw chunks through, notifying observers once the body is complete.
+        """
+        received = []
+        for chunk in raw_chunks:
+            received.append(chunk)
+            yield chunk
+        self._notify(HttpResponse(url, response.status, response.reason, response.headers, b"".join(received)))
+
+    def get(self, url, headers=None, timeout=None):
+        """
+        Issue a GET request and return the HttpResponse. Raises
+        urllib.error.HTTPError for error statuses, like urlopen does.
+        """
+        response = self.request(url, headers=headers, timeout=timeout)
+        if response.status >= 400:
+            raise urllib.error.HTTPError(response.url, response.status, response.reason, response.headers, None)
+        return response
+
+    def get_json(self, url, headers=None, timeout=None):
+        """
+        Fetch a URL and decode the body as JSON.
+        """
+        return self.get(url, headers=headers, timeout=timeout).json()
+
+    def get_text(self, url, headers=None, timeout=None):
+        """
+        Fetch a URL and decode the body as UTF-8 text.
+        """
+        return self.get(url, headers=headers, timeout=timeout).text()
+
+    def get_stats(self):
+        """
+        Return per-host connection reuse counts.
+        """
+        with self._lock:
+            return {host: stats.as_dict() for host, stats in self._stats.items()}
+
+    def close(self):
+        """
+        Close every idle pooled connection.
+        """
+        with self._lock:
+            idle, self._idle = self._idle, {}
+        for conns in idle.values():
+            for conn in conns:
+                conn.close()
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client():
+    """
+    Return the process-wide shared HttpClient.
+    """
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = HttpClient()
+        return _client
+
+
+def set_upstream(upstream):
+    """
+    Send every request from the shared client to a stand-in server, or back
+    to the real hosts when upstream is None.
+    """
+    client = get_client()
+    client.close()
+    client.upstream = upstream
+
+
+def add_observer(observer):
+    """
+    Call observer(HttpResponse) for every response the shared client completes.
+    """
+    get_client().observers.append(observer)
+
+
+def get_json(url, headers=None, timeout=None):
+    """
+    Fetch a URL through the shared client and decode the body as JSON.
+    """
+    return get_client().get_json(url, headers=headers, timeout=timeout)
+
+
+def get_text(url, headers=None, timeout=None):
+    """
+    Fetch a URL through the shared client and decode the body as UTF-8 text.
+    """
+    return get_client().get_text(url, headers=headers, timeout=timeout)
+
+
+def get_stats():
+    """
+    Return per-host connection reuse counts for the shared client.
+    """
+    return get_client().get_stats()
+
+
+def main():
+    """
+    Main function to test the shared HTTP client.
+    """
+    for _ in range(3):
+        get_json("https://api.weather.gov/points/47.697,-122.3222")
+    for host, stats in get_stats().items():
+        print(f"{host}: {stats}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,296 @@
+"""One arbitrated I2C bus shared by every device driver.
+
+The BME688, SGP30, VEML7700 and AW9523 all sit on the same physical bus, and
+the SGP30 sampler, the registry's read threads and the separate clock,
+display and indoor_data processes all talk to it. SharedI2C wraps the
+busio.I2C object the Adafruit drivers expect and serializes every
+transaction with a thread lock plus an exclusive flock on a lock file, so
+neither threads nor processes interleave transfers.
+
+Register access that is not going through a driver can be batched:
+transaction(address) holds the bus once for a group of register reads and
+writes, and merges back-to-back writes to consecutive registers into a
+single auto-increment transfer. Devices driven through their own SMBus
+handle (the AW9523 fallback) pass their block read/write functions in and
+get the same locking, merging and statistics. get_stats() reports bus utilization, lock
+contention and per-device latency.
+"""
+
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # not available on Windows; the lock is then per process
+    fcntl = None
+
+from log_config import get_logger
+
+logger = get_logger('i2c_bus', 'i2c_bus.log')
+
+# Constants
+# Anchored to this directory so processes started from anywhere lock the same file
+LOCK_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "cache", "i2c.lock")
+TRY_LOCK_WAIT = 0.01  # seconds try_lock() waits before reporting the bus busy
+FLOCK_POLL = 0.001  # seconds between attempts on the file lock
+CONTENDED = 0.001  # seconds of waiting that count as contention
+
+
+class Transaction:
+    """
+    A group of register reads and writes to one device under one bus hold.
+    Writes are queued and sent before the next read or when the block ends;
+    consecutive ones to adjacent registers go out as one transfer.
+    """
+
+    def __init__(self, bus, address, write_block=None, read_block=None):
+        """
+        :param write_block: write_block(register, data) sending one transfer; by
+                            default an auto-increment write on the bus.
+        :param read_block: read_block(register, length) returning bytes; by
+                           default a write-then-read on the bus.
+        """
+        self.bus = bus
+        self.address = address
+        self._write_block = write_block or self._bus_write
+        self._read_block = read_block or self._bus_read
+        self._writes = []  # [register, bytearray]
+
+    def _bus_write(self, register, data):
+        self.bus.i2c.writeto(self.address, bytes([register]) + data)
+
+    def _bus_read(self, register, length):
+        buffer = bytearray(length)
+        self.bus.i2c.writeto_then_readfrom(self.address, bytes([register]), buffer)
+        return bytes(buffer)
+
+    def write(self, register, data):
+        """
+        Queue a write of one byte (an int) or several bytes starting at a register.
+        """
+        data = bytes([data]) if isinstance(data, int) else bytes(data)
+        if self._writes:
+            last_register, last_data = self._writes[-1]
+            if last_register + len(last_data) == register:
+                last_data.extend(data)
+                self.bus.merged += 1
+                return
+        self._writes.append([register, bytearray(data)])
+
+    def read(self, register, length=1):
+        """
+        Read `length` bytes starting at a register.
+        """
+        self.flush()
+        return self.bus._timed(self.address, 1 + length, self._read_block, register, length)
+
+    def flush(self):
+        writes, self._writes = self._writes, []
+        for register, data in writes:
+            self.bus._timed(self.address, 1 + len(data), self._write_block, register, bytes(data))
+
+
+class SharedI2C:
+    """
+    A busio.I2C stand-in that serializes access between threads and processes
+    and keeps timing statistics. Drivers use it exactly like busio.I2C.
+    """
+
+    def __init__(self, i2c=None, lock_path=LOCK_FILE):
+        """
+        :param i2c: An open busio.I2C (or compatible) object. If None, one is
+                    opened on board.SCL/board.SDA on first use.
+        :param lock_path: File locked to serialize processes, or None for threads only.
+        """
+        self._i2c = i2c
+        self.lock_path = lock_path
+        self._open_lock = threading.Lock()
+        self._lock = threading.RLock()
+        self._depth = 0
+        self._lock_file = None
+        self._held_since = None
+        self._stats_lock = threading.Lock()
+        self.created = time.monotonic()
+        self.busy_time = 0.0
+        self.wait_time = 0.0
+        self.acquisitions = 0
+        self.contended = 0
+        self.merged = 0
+        self.devices = {}  # address -> {"transfers", "bytes", "time", "max"}
+
+    @property
+    def i2c(self):
+        with self._open_lock:
+            if self._i2c is None:
+                # Imported here so the lock also serves SMBus users without Blinka
+                import board
+                import busio
+                self._i2c = busio.I2C(board.SCL, board.SDA)
+                logger.info("Opened I2C bus")
+            return self._i2c
+
+    def _flock(self, start, timeout):
+        if fcntl is None or self.lock_path is None:
+            return True
+        if self._lock_file is None:
+            try:
+                os.makedirs(os.path.dirname(self.lock_path) or ".", exist_ok=True)
+                self._lock_file = open(self.lock_path, "a+")
+            except OSError as e:
+                logger.warning("Cannot open %s, locking within this process only: %s", self.lock_path, e)
+                self.lock_path = None
+                return True
+        while True:
+            try:
+                fcntl.flock(self._lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                return True
+            except BlockingIOError:
+                if timeout is not None and time.monotonic() - start >= timeout:
+                    return False
+                time.sleep(FLOCK_POLL)
+
+    def _acquire(self, timeout=None):
+        start = time.monotonic()
+        if not self._lock.acquire(timeout=-1 if timeout is None else timeout):
+            return False
+        if self._depth == 0:
+            if not self._flock(start, timeout):
+                self._lock.release()
+                return False
+            self._held_since = time.monotonic()
+            waited = self._held_since - start
+            with self._stats_lock:
+                self.acquisitions += 1
+                self.wait_time += waited
+                if waited >= CONTENDED:
+                    self.contended += 1
+        self._depth += 1
+        return True
+
+    def _release(self):
+        self._depth -= 1
+        if self._depth == 0:
+            if self._lock_file is not None:
+                fcntl.flock(self._lock_file, fcntl.LOCK_UN)
+            with self._stats_lock:
+                self.busy_time += time.monotonic() - self._held_since
+        self._lock.release()
+
+    # busio.I2C locking protocol, used by adafruit_bus_device around each transfer
+    def try_lock(self):
+        return self._acquire(TRY_LOCK_WAIT)
+
+    def unlock(self):
+        self._release()
+
+    @contextmanager
+    def locked(self, timeout=None):
+        """
+        Hold the bus for a block of operations.
+        """
+        if not self._acquire(timeout):
+            raise TimeoutError(f"I2C bus busy for more than {timeout}s")
+        try:
+            yield self
+        finally:
+            self._release()
+
+    @contextmanager
+    def transaction(self, address, write_block=None, read_block=None):
+        """
+        Hold the bus for a batch of register operations on one device.
+        See Transaction for write_block/read_block.
+        """
+        with self.locked():
+            batch = Transaction(self, address, write_block, read_block)
+            yield batch
+            batch.flush()
+
+    def _timed(self, address, nbytes, fn, *args, **kwargs):
+        with self.locked():
+            start = time.monotonic()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                elapsed = time.monotonic() - start
+                with self._stats_lock:
+                    device = self.devices.setdefault(address, {"transfers": 0, "bytes": 0, "time": 0.0, "max": 0.0})
+                    device["transfers"] += 1
+                    device["bytes"] += nbytes
+                    device["time"] += elapsed
+                    device["max"] = max(device["max"], elapsed)
+
+    def writeto(self, address, buffer, *, start=0, end=None):
+        end = len(buffer) if end is None else end
+        return self._timed(address, end - start, self.i2c.writeto, address, buffer, start=start, end=end)
+
+    def readfrom_into(self, address, buffer, *, start=0, end=None):
+        end = len(buffer) if end is None else end
+        return self._timed(address, end - start, self.i2c.readfrom_into, address, buffer, start=start, end=end)
+
+    def writeto_then_readfrom(self, address, buffer_out, buffer_in, *, out_start=0, out_end=None,
+                              in_start=0, in_end=None):
+        out_end = len(buffer_out) if out_end is None else out_end
+        in_end = len(buffer_in) if in_end is None else in_end
+        return self._timed(address, (out_end - out_start) + (in_end - in_start), self.i2c.writeto_then_readfrom,
+                           address, buffer_out, buffer_in, out_start=out_start, out_end=out_end,
+                           in_start=in_start, in_end=in_end)
+
+    def scan(self):
+        with self.locked():
+            return self.i2c.scan()
+
+    def deinit(self):
+        # Shared by every driver; one driver's cleanup must not close it for the rest
+        pass
+
+    def __getattr__(self, name):
+        # Anything else (frequency, port-specific extras) comes from the real bus
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return getattr(self.i2c, name)
+
+    def get_stats(self):
+        """
+        Return bus utilization, lock contention and per-device transfer latency.
+        """
+        with self._stats_lock:
+            elapsed = time.monotonic() - self.created
+            return {
+                "utilization": self.busy_time / elapsed if elapsed > 0 else 0.0,
+                "busy_time": self.busy_time,
+                "acquisitions": self.acquisitions,
+                "contended": self.contended,
+                "wait_time": self.wait_time,
+                "merged_writes": self.merged,
+                "devices": {
+                    hex(address): {
+                        "transfers": d["transfers"],
+                        "bytes": d["bytes"],
+                        "mean_ms": 1000 * d["time"] / d["transfers"],
+                        "max_ms": 1000 * d["max"],
+                    }
+                    for address, d in self.devices.items()
+                },
+            }
+
+
+_bus = None
+_bus_lock = threading.Lock()
+
+
+def get_bus():
+    """
+    Return the process-wide SharedI2C.
+    """
+    global _bus
+    with _bus_lock:
+        if _bus is None:
+            _bus = SharedI2C()
+        return _bus
+
+
+def get_stats():
+    return get_bus().get_stats()
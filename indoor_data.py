@@ -1,16 +1,18 @@
 from weather_gov import RemoteWeather
 from openweatheraqi import RemoteAQI
-from bme import BME688Sensor
-from sgp30_sensor import SGP30Sensor
 from location import Location
+import sensors
 
 class DataAggregator:
 
     def fetch_all_data(self):
+        # Start both conversions so they run at the same time
+        bme_read = sensors.start_read(sensors.BME)
+        sgp30_read = sensors.start_read(sensors.SGP30)
         # --- BME688 ---
-        bme = BME688Sensor().read_data()
+        bme = sensors.collect(sensors.BME, bme_read)
         # --- SGP30 ---
-        sgp30 = SGP30Sensor().read_data()
+        sgp30 = sensors.collect(sensors.SGP30, sgp30_read)
         # --- Compose data dicts for rendering ---
         return bme, sgp30
     
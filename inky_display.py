@@ -1,8 +1,12 @@
+import threading
 import time
 from datetime import datetime
 from PIL import Image, ImageFont, ImageDraw
 from data_agg import DataAggregator
 from inky.auto import auto
+from location import Location
+from alerts import AlertPoller
+from forecast_diff import ForecastDiffer
 from log_config import get_logger
 
 # Configure module logger (file-backed)
@@ -13,6 +17,20 @@ logger = get_logger('inky_display', 'inky.log')
 BACKGROUND_IMAGE = "background_imgs/tree2.jpg"
 SMALL_FONT_SPACE = 30
 SLEEP_TIME = 900
+FORCE_RENDER_INTERVAL = 3600  # seconds; redraw at least this often so "Updated" stays current
+
+
+def fmt(value, fmt_str="{:.0f}"):
+    """Format a sensor value, or '--' if it is missing."""
+    return fmt_str.format(value) if value is not None else "--"
+
+
+def indoor_values(bme, sgp30):
+    """The indoor sensor values as the render draws them."""
+    bme_temp_f = (bme['temperature'] * 9 / 5) + 32 if bme['temperature'] is not None else None
+    return (fmt(bme_temp_f, '{:.1f}'), fmt(bme['humidity']), fmt(bme['pressure']),
+            fmt(sgp30['eCO2']), fmt(sgp30['TVOC']))
+
 
 class InkyDisplay:
     def __init__(self):
@@ -45,15 +63,18 @@ class InkyDisplay:
         self.clear()
         # --- Center: Current Weather (smaller font) ---
         x_c, y_c = 280, 60
-        self.draw.text((x_c, y_c), f"{weather['current_temp']}°F", self.display.BLACK, font=self.font_large)
+        alerts = weather.get('alerts') or []
+        if alerts:
+            self.draw.text((x_c, y_c-45), f"ALERT: {alerts[0].event}", self.display.BLACK, font=self.font_small)
+        self.draw.text((x_c, y_c), f"{fmt(weather['current_temp'])}°F", self.display.BLACK, font=self.font_large)
         self.draw.text((x_c, y_c+60), f"{weather['current_desc']}", self.display.BLACK, font=self.font_small)
         self.draw.text((x_c, y_c+110), "Indoor Sensors", self.display.BLACK, font=self.font_med2)
-        bme_temp_f = (bme['temperature'] * 9 / 5) + 32
-        self.draw.text((x_c + 5, y_c+140), f"Temp: {bme_temp_f:.1f}°F", self.display.BLACK, font=self.font_small)
-        self.draw.text((x_c + 5, y_c+170), f"Humidity: {bme['humidity']:.0f}%", self.display.BLACK, font=self.font_small)
-        self.draw.text((x_c + 5, y_c+200), f"Pressure: {bme['pressure']:.0f} hPa", self.display.BLACK, font=self.font_small)
-        self.draw.text((x_c + 5, y_c+230), f"eCO2: {sgp30['eCO2']} ppm", self.display.BLACK, font=self.font_small)
-        self.draw.text((x_c + 5, y_c+260), f"TVOC: {sgp30['TVOC']} ppb", self.display.BLACK, font=self.font_small)
+        bme_temp_f = (bme['temperature'] * 9 / 5) + 32 if bme['temperature'] is not None else None
+        self.draw.text((x_c + 5, y_c+140), f"Temp: {fmt(bme_temp_f, '{:.1f}')}°F", self.display.BLACK, font=self.font_small)
+        self.draw.text((x_c + 5, y_c+170), f"Humidity: {fmt(bme['humidity'])}%", self.display.BLACK, font=self.font_small)
+        self.draw.text((x_c + 5, y_c+200), f"Pressure: {fmt(bme['pressure'])} hPa", self.display.BLACK, font=self.font_small)
+        self.draw.text((x_c + 5, y_c+230), f"eCO2: {fmt(sgp30['eCO2'])} ppm", self.display.BLACK, font=self.font_small)
+        self.draw.text((x_c + 5, y_c+260), f"TVOC: {fmt(sgp30['TVOC'])} ppb", self.display.BLACK, font=self.font_small)
         
 
         # --- Right: 6-day Forecast ---
@@ -63,7 +84,7 @@ class InkyDisplay:
         for day in weather['daily'][:4]:
             day_label = day['name']
             self.draw.text((x_r, y_r), f"{day_label}", self.display.BLACK, font=self.font_small)
-            self.draw.text((x_r+5, y_r + SMALL_FONT_SPACE), f"{day['low_temp']} / {day['high_temp']}°", self.display.BLACK, font=self.font_small)
+            self.draw.text((x_r+5, y_r + SMALL_FONT_SPACE), f"{fmt(day['low_temp'])} / {fmt(day['high_temp'])}°", self.display.BLACK, font=self.font_small)
             self.draw.text((x_r+5, y_r + 2 * SMALL_FONT_SPACE), f"Precip:{day.get('percentageOfPrecipitation', '--')}%", self.display.BLACK, font=self.font_small)
             y_r += 90
 
@@ -83,6 +104,10 @@ class InkyDisplay:
         sunset = weather.get('sunset', '--:--')
         self.draw.text((self.width//2-250, self.height-50), f"Sunrise: {sunrise}   Sunset: {sunset}", self.display.BLACK, font=self.font_small)
         timestamp = datetime.now().strftime("Updated: %Y-%m-%d %H:%M")
+        if weather.get('partial'):
+            timestamp += " (partial)"
+        elif weather.get('stale'):
+            timestamp += " (cached)"
         self.draw.text((self.width//2-250, self.height-20), timestamp, self.display.BLACK, font=self.font_xsmall)    
         self.display.set_image(self.image)
         self.display.show()
@@ -90,19 +115,50 @@ class InkyDisplay:
 
 
 
+def start_alerts(wake):
+    """Start the alerts poller, or return None if it cannot be set up right now."""
+    try:
+        location = Location()
+        # Polls active alerts every minute and wakes the loop for new or upgraded ones
+        return AlertPoller(location.get_lat(), location.get_lon(), wake=wake).start()
+    except Exception as e:
+        logger.exception("Alerts unavailable, rendering without them: %s", e)
+        return None
+
+
 def main():
     logger.info("Starting main loop")
     inky = InkyDisplay()
-    data = DataAggregator()
+    data = DataAggregator(concurrent=True)
+    wake = threading.Event()
+    alerts = None
+    differ = ForecastDiffer()
+    last_indoor = None
+    last_render = 0
     while True:
+        wake.clear()
+        if alerts is None:
+            alerts = start_alerts(wake)
         try:
             weather, aqi, bme, sgp30 = data.fetch_all_data()
-            logger.info("Fetched data: daily=%d hourly=%d", len(weather.get('daily', [])), len(weather.get('hourly', [])))
-            inky.render(weather, aqi, bme, sgp30)
+            weather['alerts'] = alerts.active() if alerts is not None else []
+            changes = differ.update(weather, aqi)
+            indoor = indoor_values(bme, sgp30)
+            logger.info("Fetched data: daily=%d hourly=%d, changes: %s", len(weather.get('daily', [])),
+                        len(weather.get('hourly', [])), changes.summary())
+            # An e-ink refresh is slow and visible; skip it when nothing drawn has changed
+            if changes.empty and indoor == last_indoor and time.monotonic() - last_render < FORCE_RENDER_INTERVAL:
+                logger.info("Nothing displayed changed, skipping render")
+            else:
+                inky.render(weather, aqi, bme, sgp30)
+                last_indoor = indoor
+                last_render = time.monotonic()
         except Exception as e:
             logger.exception("Error during fetch/render loop: %s", e)
-        # Update every hour
-        time.sleep(SLEEP_TIME)
+            last_render = 0  # make sure the next cycle redraws
+        # Update every SLEEP_TIME seconds, or at once when an alert comes in
+        if wake.wait(SLEEP_TIME) and alerts is not None:
+            logger.info("Woken early by alert: %s", alerts.headline())
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,170 @@
+"""Streaming decompression and incremental JSON decoding.
+
+Forecast payloads are mostly one long array (NWS "periods", OpenWeather
+"list"). iter_array_items() decodes the elements of that array one at a time
+from a stream of byte chunks and can stop after a limit, so memory use scales
+with the elements kept rather than with the whole document.
+"""
+
+import codecs
+import json
+import zlib
+
+# Constants
+CHUNK_SIZE = 16 * 1024
+_WHITESPACE = " \t\n\r"
+
+
+def decompressor(encoding):
+    """
+    Return a zlib decompress object for a Content-Encoding, or None for identity.
+    """
+    encoding = (encoding or "identity").strip().lower()
+    if encoding in ("gzip", "x-gzip"):
+        return zlib.decompressobj(16 + zlib.MAX_WBITS)
+    if encoding == "deflate":
+        return _DeflateDecompressor()
+    if encoding == "identity":
+        return None
+    raise ValueError(f"Unsupported Content-Encoding: {encoding}")
+
+
+class _DeflateDecompressor:
+    """
+    Decompresses 'deflate' bodies, which servers send either zlib-wrapped
+    (as the RFC says) or as a raw deflate stream.
+    """
+
+    def __init__(self):
+        self._obj = zlib.decompressobj(zlib.MAX_WBITS)
+        self._first = True
+
+    def decompress(self, data):
+        if self._first:
+            self._first = False
+            try:
+                return self._obj.decompress(data)
+            except zlib.error:
+                self._obj = zlib.decompressobj(-zlib.MAX_WBITS)
+        return self._obj.decompress(data)
+
+    def flush(self):
+        return self._obj.flush()
+
+
+def decompress(data, encoding):
+    """
+    Decompress a whole body for a Content-Encoding.
+    """
+    d = decompressor(encoding)
+    if d is None:
+        return data
+    return d.decompress(data) + d.flush()
+
+
+def iter_decompressed(chunks, encoding):
+    """
+    Decompress an iterable of byte chunks as they arrive.
+    """
+    d = decompressor(encoding)
+    for chunk in chunks:
+        data = d.decompress(chunk) if d is not None else chunk
+        if data:
+            yield data
+    if d is not None:
+        tail = d.flush()
+        if tail:
+            yield tail
+
+
+def iter_bytes(data, chunk_size=CHUNK_SIZE):
+    """
+    Split a bytes object into chunks.
+    """
+    for start in range(0, len(data), chunk_size):
+        yield data[start:start + chunk_size]
+
+
+def iter_array_items(chunks, key, limit=None):
+    """
+    Incrementally decode the elements of the first JSON array stored under
+    `key` in a stream of UTF-8 byte chunks, yielding each element as soon as
+    it is complete and stopping after `limit` elements.
+    """
+    decoder = json.JSONDecoder()
+    text = codecs.getincrementaldecoder("utf8")()
+    chunks = iter(chunks)
+    buf = ""
+    exhausted = False
+
+    def more():
+        nonlocal buf, exhausted
+        try:
+            buf += text.decode(next(chunks))
+        except StopIteration:
+            buf += text.decode(b"", final=True)
+            exhausted = True
+
+    # Find `"key"`, then the ':' and the '[' that opens the array
+    marker = f'"{key}"'
+    pos = None
+    while pos is None:
+        idx = buf.find(marker)
+        if idx < 0:
+            if exhausted:
+                return
+            buf = buf[-len(marker):]
+            more()
+            continue
+        j = idx + len(marker)
+        while True:
+            while j < len(buf) and buf[j] in _WHITESPACE:
+                j += 1
+            if j < len(buf) or exhausted:
+                break
+            more()
+        if j < len(buf) and buf[j] == ":":
+            j += 1
+            while True:
+                while j < len(buf) and buf[j] in _WHITESPACE:
+                    j += 1
+                if j < len(buf) or exhausted:
+                    break
+                more()
+            if j < len(buf) and buf[j] == "[":
+                pos = j + 1
+                continue
+        if exhausted and j >= len(buf):
+            return
+        # The marker was a value, not the key we want; keep looking after it
+        buf = buf[idx + len(marker):]
+
+    buf = buf[pos:]
+    count = 0
+    while limit is None or count < limit:
+        i = 0
+        while True:
+            while i < len(buf) and buf[i] in _WHITESPACE + ",":
+                i += 1
+            if i < len(buf) or exhausted:
+                break
+            more()
+        if i >= len(buf) or buf[i] == "]":
+            return
+        buf = buf[i:]
+        while True:
+            try:
+                item, end = decoder.raw_decode(buf)
+            except json.JSONDecodeError:
+                if exhausted:
+                    raise
+                more()
+                continue
+            # A number at the very end of the buffer may still be incomplete
+            if end == len(buf) and not exhausted:
+                more()
+                continue
+            break
+        buf = buf[end:]
+        count += 1
+        yield item
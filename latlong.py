@@ -1,7 +1,6 @@
 #!/usr/bin/python3
 
-import urllib.request
-import json
+import http_client
 from log_config import get_logger
 
 logger = get_logger('latlong', 'latlong.log')
@@ -36,15 +35,14 @@ class LatLong:
         """
         Fetch the user's public IP address.
         """
-        return urllib.request.urlopen('https://ident.me').read().decode('utf8')
+        return http_client.get_text('https://ident.me')
 
     def get_ip_data(self, ipaddr):
         """
         Fetch location data based on the user's IP address.
         """
         url = f'http://ip-api.com/json/{ipaddr}'
-        response = urllib.request.urlopen(url)
-        return json.loads(response.read().decode('utf8'))
+        return http_client.get_json(url)
 
     def get_lat(self):
         """
@@ -0,0 +1,103 @@
+"""Vectorized conversion of UTC epoch timestamps to local wall time.
+
+Instead of one datetime/astimezone/strftime round trip per entry, localize()
+works out the local UTC offset for each DST segment covering a series once
+(cached), assigns offsets to the whole epoch array with searchsorted, and
+returns structured date/hour fields that grouping and formatting can use
+directly.
+"""
+
+import time
+from datetime import datetime, timezone
+from functools import lru_cache
+
+import numpy as np
+
+# Constants
+PROBE_INTERVAL = 7 * 86400  # DST transitions are months apart; probing weekly finds each one
+LOCAL_DTYPE = np.dtype([
+    ("local", "datetime64[s]"),
+    ("date", "datetime64[D]"),
+    ("hour", np.int8),
+    ("minute", np.int8),
+    ("offset", np.int32),
+])
+
+
+def utc_offset(epoch):
+    """
+    Return the local UTC offset in seconds at an epoch timestamp.
+    """
+    return int(datetime.fromtimestamp(int(epoch), timezone.utc).astimezone().utcoffset().total_seconds())
+
+
+def _find_transition(lo, hi, lo_offset):
+    """
+    Binary search for the first second in (lo, hi] whose offset differs from lo_offset.
+    """
+    while hi - lo > 1:
+        mid = (lo + hi) // 2
+        if utc_offset(mid) == lo_offset:
+            lo = mid
+        else:
+            hi = mid
+    return hi
+
+
+@lru_cache(maxsize=32)
+def _segments(first_probe, last_probe, tz_key):
+    """
+    Return (boundaries, offsets) for the probe range: offsets[i] applies from
+    boundaries[i] up to boundaries[i + 1]. tz_key only keys the cache so a
+    change of local zone is not answered from stale segments.
+    """
+    boundaries = [first_probe]
+    offsets = [utc_offset(first_probe)]
+    probe = first_probe
+    while probe < last_probe:
+        next_probe = probe + PROBE_INTERVAL
+        next_offset = utc_offset(next_probe)
+        if next_offset != offsets[-1]:
+            boundaries.append(_find_transition(probe, next_probe, offsets[-1]))
+            offsets.append(next_offset)
+        probe = next_probe
+    return np.array(boundaries, dtype=np.int64), np.array(offsets, dtype=np.int64)
+
+
+def segments_for(epochs):
+    """
+    Return the cached (boundaries, offsets) DST segments covering a series.
+    """
+    first_probe = int(epochs.min()) // PROBE_INTERVAL * PROBE_INTERVAL
+    last_probe = (int(epochs.max()) // PROBE_INTERVAL + 1) * PROBE_INTERVAL
+    return _segments(first_probe, last_probe, (time.tzname, time.timezone, time.altzone))
+
+
+def localize(epochs):
+    """
+    Convert an array of UTC epoch seconds into a structured array of local
+    wall time with 'local', 'date', 'hour', 'minute' and 'offset' fields.
+    """
+    epochs = np.asarray(epochs, dtype=np.int64)
+    out = np.empty(len(epochs), dtype=LOCAL_DTYPE)
+    if len(epochs) == 0:
+        return out
+    boundaries, offsets = segments_for(epochs)
+    offset = offsets[np.searchsorted(boundaries, epochs, side="right") - 1]
+    local = epochs + offset
+    seconds_of_day = local % 86400
+    out["local"] = local.astype("datetime64[s]")
+    out["date"] = (local // 86400).astype("datetime64[D]")
+    out["hour"] = seconds_of_day // 3600
+    out["minute"] = seconds_of_day % 3600 // 60
+    out["offset"] = offset
+    return out
+
+
+def format_local(localized, sep=" "):
+    """
+    Format the 'local' field of localize() output as 'YYYY-MM-DD HH:MM:SS'
+    strings in one pass.
+    """
+    text = np.datetime_as_string(localized["local"], unit="s")
+    return np.char.replace(text, "T", sep).tolist()
@@ -1,7 +1,7 @@
 #!/usr/bin/python3
 
-import urllib.request
-import json
+import bootstrap_cache
+import resilience
 
 # Default location data
 DEFAULT_DATA = {
@@ -18,11 +18,21 @@ class Location:
     A class to fetch and validate location data based on the user's IP address.
     """
 
-    def __init__(self):
+    def __init__(self, use_cache=True):
+        cache = bootstrap_cache.get_cache() if use_cache else None
+        if cache is not None:
+            data = cache.get_location()
+            if data is not None:
+                self.data = data
+                return
         try:
             ip = self.get_ip()
-            data = self.get_ip_data(ip)
-            # print("IP Data:", data)
+            data = cache.get_location_for_ip(ip) if cache is not None else None
+            if data is None:
+                data = self.get_ip_data(ip)
+                # print("IP Data:", data)
+                if self.validate_data(data) and cache is not None:
+                    cache.put_location(ip, data)
             if self.validate_data(data):
                 self.data = data
             else:
@@ -36,15 +46,14 @@ class Location:
         """
         Fetch the user's public IP address.
         """
-        return urllib.request.urlopen('https://ident.me').read().decode('utf8')
+        return resilience.get_text('https://ident.me')
 
     def get_ip_data(self, ipaddr):
         """
         Fetch location data based on the user's IP address.
         """
         url = f'http://ip-api.com/json/{ipaddr}'
-        response = urllib.request.urlopen(url)
-        return json.loads(response.read().decode('utf8'))
+        return resilience.get_json(url)
 
     def get_zip(self):
         """
@@ -0,0 +1,114 @@
+"""OpenWeather One Call provider in the display schema.
+
+OneCallWeather makes one One Call request (current, hourly and daily in
+imperial units) and answers the same methods as weather_gov.RemoteWeather,
+in the same shapes, so DataAggregator can build the `weather` dict the
+renderer expects from a single HTTP request instead of ~six.
+"""
+
+import importlib
+from datetime import datetime
+
+import localtime
+import solar
+
+# The module name has a hyphen, so it cannot be imported with a plain import statement
+weather_open = importlib.import_module("weather-open")
+
+# Constants
+COMPASS_POINTS = ("N", "NNE", "NE", "ENE", "E", "ESE", "SE", "SSE",
+                  "S", "SSW", "SW", "WSW", "W", "WNW", "NW", "NNW")
+
+
+def compass(degrees):
+    """
+    Convert a wind direction in degrees to a 16-point compass label like NWS uses.
+    """
+    if degrees is None:
+        return ""
+    return COMPASS_POINTS[int((degrees % 360) / 22.5 + 0.5) % 16]
+
+
+def _description(entry):
+    weather = entry.get("weather") or [{}]
+    return (weather[0].get("description") or "").capitalize()
+
+
+def _precip(entry):
+    pop = entry.get("pop")
+    return round(pop * 100) if pop is not None else None
+
+
+class OneCallWeather:
+    """
+    Weather for a lat/lon from one OpenWeather One Call response, with the
+    RemoteWeather interface.
+    """
+
+    def __init__(self, lat, lon, key=None):
+        self.lat = lat
+        self.lon = lon
+        self.data = weather_open.RemoteWeatherOpen(lat, lon, key, units="imperial").data
+
+    def get_current_weather(self):
+        """
+        Get the current weather conditions.
+        """
+        current = self.data["current"]
+        return {
+            "temperature": round(current["temp"]),
+            "wind_speed": f"{round(current.get('wind_speed', 0))} mph",
+            "short_forecast": _description(current),
+            "temp_unit": "F",
+        }
+
+    def get_daily_forecast(self):
+        """
+        Get one entry per day with the high, low and precipitation chance.
+        """
+        return [
+            {
+                "name": datetime.fromtimestamp(day["dt"]).strftime("%a"),
+                "high_temp": round(day["temp"]["max"]),
+                "low_temp": round(day["temp"]["min"]),
+                "percentageOfPrecipitation": _precip(day) or 0,
+            }
+            for day in self.data.get("daily", [])
+        ]
+
+    def get_hourly_forecast(self, limit=None):
+        """
+        Get the hourly weather forecast, optionally only the first `limit` hours.
+        """
+        hours = self.data.get("hourly", [])[:limit]
+        local = localtime.localize([hour["dt"] for hour in hours])
+        return [
+            {
+                "hour": f"{int(local_hour):02d}",
+                "temperature": round(hour["temp"]),
+                "wind_speed": f"{round(hour.get('wind_speed', 0))} mph",
+                "wind_direction": compass(hour.get("wind_deg")),
+                "short_forecast": _description(hour),
+                "probabilityOfPrecipitation": _precip(hour),
+            }
+            for hour, local_hour in zip(hours, local["hour"])
+        ]
+
+    def _sun_event(self, name):
+        timestamp = self.data["current"].get(name)
+        if timestamp is None:
+            # Polar day or night: One Call omits the event
+            return "--:--"
+        return datetime.fromtimestamp(timestamp).strftime(solar.OUT_TIME_FORMAT)
+
+    def get_sunrise(self):
+        """
+        Get the local sunrise time from the One Call response.
+        """
+        return self._sun_event("sunrise")
+
+    def get_sunset(self):
+        """
+        Get the local sunset time from the One Call response.
+        """
+        return self._sun_event("sunset")
@@ -1,13 +1,20 @@
 #!/usr/bin/python3
 
-import urllib.request
-import json
+import threading
+import time
 from datetime import datetime, timezone
+from functools import cached_property
+import coalesce
+import forecast_records
+import forecast_store
+import localtime
+import resilience
 
 # Constants
 AQI_URL = 'http://api.openweathermap.org/data/2.5/air_pollution/forecast?lat={lat}&lon={lon}&appid={key}'
 KEY_FILE = '/private/keys/openweather.txt'
 OUT_TIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+SNAPSHOT_TTL = 600  # seconds; OpenWeather updates the forecast hourly
 
 # AQI Categories
 AQI_GOOD = 1
@@ -34,154 +41,211 @@ COMPONENT_NAMES = {
     "nh3": "Ammonia"
 }
 
-class RemoteAQI:
+def _copy_view(view):
     """
-    A class to fetch and process AQI data from the OpenWeatherMap API.
+    Return a copy of a memoized view's lists and dicts, so a caller that
+    modifies its result does not change what later callers get.
+    """
+    if isinstance(view, list):
+        return [_copy_view(item) for item in view]
+    if isinstance(view, dict):
+        return {key: _copy_view(value) for key, value in view.items()}
+    return view
+
+
+class AqiSnapshot:
+    """
+    One immutable AQI forecast download. The derived views are computed on
+    first use and memoized for the life of the snapshot; RemoteAQI hands
+    callers copies of them (see _copy_view), never the memoized objects.
     """
 
-    def __init__(self, lat, lon, key):
+    def __init__(self, raw_data, fetched_at):
+        self.entries = tuple(forecast_records.decode_aqi(raw_data['list']))
+        self.fetched_at = fetched_at
+
+    def age(self):
         """
-        Initialize the RemoteAQI class with latitude, longitude, and API key.
+        Seconds since this snapshot was fetched.
         """
-        self.lat = lat
-        self.lon = lon
-        self.key = key
-        self.forecast_url = AQI_URL.format(lat=self.lat, lon=self.lon, key=self.key)
-        print(f"Forecast URL: {self.forecast_url}")
+        return time.time() - self.fetched_at
 
-    def get_raw_forecast_data(self):
+    @cached_property
+    def store(self):
         """
-        Fetch raw AQI forecast data from the API.
+        The forecast as a columnar ForecastStore.
         """
-        response = urllib.request.urlopen(self.forecast_url)
-        return json.loads(response.read().decode('utf8'))
+        return forecast_store.ForecastStore.from_aqi(self.entries)
 
-    def get_forecast(self):
+    @cached_property
+    def forecast(self):
         """
-        Get a detailed AQI forecast including local timestamps, AQI values, and categories.
+        Every entry with its local timestamp, AQI value, category and components.
         """
-        raw_data = self.get_raw_forecast_data()
         forecast = []
+        # Convert all UTC timestamps to local time in one pass
+        timestamps = convert_timestamps_to_local([entry.dt for entry in self.entries])
 
-        for entry in raw_data['list']:
-            timestamp = entry['dt']
-            # Convert UTC timestamp to local time
-            date_time = convert_timestamp_to_local(timestamp)
-
-            aqi = entry['main']['aqi']
-            category = AQI_CATEGORY_MAP.get(aqi, "Unknown")
-            components = entry['components']
-
+        for entry, timestamp in zip(self.entries, timestamps):
             forecast.append({
-                "timestamp": date_time,
-                "aqi": aqi,
-                "category": category,
-                "components": components
+                "timestamp": timestamp,
+                "aqi": entry.aqi,
+                "category": AQI_CATEGORY_MAP.get(entry.aqi, "Unknown"),
+                "components": entry.components
             })
 
         return forecast
 
-    def get_hourly_aqi_forecast(self):
+    @cached_property
+    def hourly(self):
         """
-        Get the hourly AQI forecast for the next 24 hours.
+        The next 24 hours without components.
         """
-        forecast = self.get_forecast()
         hourly_aqi = []
 
-        for entry in forecast[:24]:
-            timestamp = entry["timestamp"]
-            aqi = entry["aqi"]
-            category = entry["category"]
-
+        for entry in self.forecast[:24]:
             hourly_aqi.append({
-                "timestamp": timestamp,
-                "aqi": aqi,
-                "category": category
+                "timestamp": entry["timestamp"],
+                "aqi": entry["aqi"],
+                "category": entry["category"]
             })
         return hourly_aqi
-    
-    # Take the hourly forecast and return time periods that group unchanged AQI values
-    def get_hourly_aqi_forecast_periods(self):
+
+    @cached_property
+    def hourly_periods(self):
         """
-        Get the hourly AQI forecast for the next 24 hours, grouped by unchanged AQI values.
+        The next 24 hours grouped into runs of unchanged AQI.
         """
-        forecast = self.get_hourly_aqi_forecast()
-        hourly_aqi = []
-        current_aqi = None
-        start_time = None
-        current_category = None
-
-        for entry in forecast[:24]:
-            timestamp = entry["timestamp"]
-            aqi = entry["aqi"]
-            category = entry["category"]
-
-            if current_aqi is None or aqi != current_aqi:
-                if current_aqi is not None:
-                    hourly_aqi.append({
-                        "start_time": start_time,
-                        "end_time": timestamp,
-                        "aqi": current_aqi,
-                        "category": current_category
-                    })
-                start_time = timestamp
-                current_aqi = aqi
-                current_category = category
-        # Add the last period
-        if current_aqi is not None:
-            hourly_aqi.append({
-                "start_time": start_time,
-                "end_time": forecast[23]["timestamp"],
-                "aqi": current_aqi,
-                "category": category
-            })
+        forecast = self.hourly
+        starts, ends = self.store.head(24).runs("aqi")
+        last = len(forecast) - 1
 
-        return hourly_aqi
-    
-    def get_detailed_current_aqi(self):
+        # Each period ends where the next one starts; the last ends at the final hour
+        return [
+            {
+                "start_time": forecast[start]["timestamp"],
+                "end_time": forecast[min(end, last)]["timestamp"],
+                "aqi": forecast[start]["aqi"],
+                "category": forecast[start]["category"]
+            }
+            for start, end in zip(starts, ends)
+        ]
+
+    @cached_property
+    def detailed_current(self):
         """
-        Get the current AQI and its components with human-readable names.
+        The current AQI with human-readable component names.
         """
-        forecast = self.get_forecast()
-        current_aqi = forecast[0]
-        timestamp = current_aqi["timestamp"]
-        aqi = current_aqi["aqi"]
-        category = current_aqi["category"]
-        components = current_aqi["components"]
+        current_aqi = self.forecast[0]
 
         # Convert components to a human-readable format
         components = {
-            COMPONENT_NAMES.get(k, k): f"{v} μg/m³" for k, v in components.items()
+            COMPONENT_NAMES.get(k, k): f"{v} μg/m³" for k, v in current_aqi["components"].items()
         }
 
         return {
-            "timestamp": timestamp,
-            "aqi": aqi,
-            "category": category,
+            "timestamp": current_aqi["timestamp"],
+            "aqi": current_aqi["aqi"],
+            "category": current_aqi["category"],
             "components": components
         }
-    
-    def get_daily_aqi_forecast(self):
+
+    @cached_property
+    def daily(self):
         """
-        Get the daily AQI forecast by calculating the maximum AQI for each day.
+        The maximum AQI for each local day.
+        """
+        days, daily_max = self.store.daily_reduce("aqi", "max")
+        return [
+            {
+                "date": str(day),
+                "aqi": int(aqi),
+                "category": AQI_CATEGORY_MAP.get(int(aqi), "Unknown")
+            }
+            for day, aqi in zip(days, daily_max)
+        ]
+
+
+class RemoteAQI:
+    """
+    A class to fetch and process AQI data from the OpenWeatherMap API.
+    The forecast is held as one AqiSnapshot per TTL; every view is derived
+    from it, so repeated calls within the TTL neither download nor re-parse.
+    """
+
+    def __init__(self, lat, lon, key, ttl=SNAPSHOT_TTL):
+        """
+        Initialize the RemoteAQI class with latitude, longitude, and API key.
         """
-        forecast = self.get_forecast()
-        daily_aqi = {}
+        self.lat = lat
+        self.lon = lon
+        self.key = key
+        self.ttl = ttl
+        self.forecast_url = AQI_URL.format(lat=self.lat, lon=self.lon, key=self.key)
+        self._snapshot = None
+        self._snapshot_lock = threading.Lock()
 
-        for entry in forecast:
-            date = entry["timestamp"].split(" ")[0]  # Extract the date (YYYY-MM-DD)
-            aqi = entry["aqi"]
-            category = entry["category"]
+    def get_raw_forecast_data(self):
+        """
+        Fetch raw AQI forecast data from the API, through the HTTP response cache.
+        Identical requests within a refresh cycle share one download.
+        """
+        return coalesce.fetch(self.forecast_url, lambda: resilience.get_json(self.forecast_url, cache=True))
 
-            if date not in daily_aqi or aqi > daily_aqi[date]["aqi"]:
-                daily_aqi[date] = {
-                    "date": date,
-                    "aqi": aqi,
-                    "category": category
-                }
+    def get_snapshot(self):
+        """
+        Return the current AqiSnapshot, fetching a new one once the TTL has
+        expired. Replacing the snapshot drops all of its memoized views.
+        """
+        with self._snapshot_lock:
+            if self._snapshot is None or self._snapshot.age() > self.ttl:
+                self._snapshot = AqiSnapshot(self.get_raw_forecast_data(), time.time())
+            return self._snapshot
 
-        # Convert the dictionary to a sorted list of daily AQI forecasts
-        return [daily_aqi[date] for date in sorted(daily_aqi.keys())]
+    def get_forecast_entries(self, limit=None):
+        """
+        Get the AQI forecast as AqiEntry records, at most `limit` of them.
+        """
+        return [entry._replace(components=dict(entry.components))
+                for entry in self.get_snapshot().entries[:limit]]
+
+    def get_forecast_store(self, limit=None):
+        """
+        Get the AQI forecast as a columnar ForecastStore.
+        """
+        store = self.get_snapshot().store
+        return store if limit is None else store.head(limit)
+
+    def get_forecast(self, limit=None):
+        """
+        Get a detailed AQI forecast including local timestamps, AQI values, and categories.
+        """
+        return _copy_view(self.get_snapshot().forecast[:limit])
+
+    def get_hourly_aqi_forecast(self):
+        """
+        Get the hourly AQI forecast for the next 24 hours.
+        """
+        return _copy_view(self.get_snapshot().hourly)
+
+    # Take the hourly forecast and return time periods that group unchanged AQI values
+    def get_hourly_aqi_forecast_periods(self):
+        """
+        Get the hourly AQI forecast for the next 24 hours, grouped by unchanged AQI values.
+        """
+        return _copy_view(self.get_snapshot().hourly_periods)
+
+    def get_detailed_current_aqi(self):
+        """
+        Get the current AQI and its components with human-readable names.
+        """
+        return _copy_view(self.get_snapshot().detailed_current)
+
+    def get_daily_aqi_forecast(self):
+        """
+        Get the daily AQI forecast by calculating the maximum AQI for each day.
+        """
+        return _copy_view(self.get_snapshot().daily)
 
 def convert_timestamp_to_local(timestamp): 
     """
@@ -191,6 +255,13 @@ def convert_timestamp_to_local(timestamp):
     local_time = utc_time.astimezone()  # Converts to local time zone
     return local_time.strftime(OUT_TIME_FORMAT)
 
+def convert_timestamps_to_local(timestamps):
+    """
+    Convert a sequence of UTC timestamps to local time strings (OUT_TIME_FORMAT)
+    using cached per-DST-segment UTC offsets.
+    """
+    return localtime.format_local(localtime.localize(timestamps))
+
 def main():
     """
     Main function to fetch and display AQI data.
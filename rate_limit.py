@@ -0,0 +1,235 @@
+"""Cross-process rate limiting for the upstream APIs.
+
+clock.py, inky_display.py, data_agg.py and indoor_data.py run as separate
+processes. RateLimiter keeps one token bucket per upstream host in a small
+JSON file guarded by an exclusive flock, so every process on the device
+draws from the same per-host request budget. Callers that are over budget
+are expected to serve cached data (see http_cache and resilience) rather
+than fail.
+"""
+
+import json
+import os
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:  # not available on Windows; the budget is then per process
+    fcntl = None
+
+from log_config import get_logger
+
+logger = get_logger('rate_limit', 'rate_limit.log')
+
+# Constants
+# Anchored to this directory so processes started from anywhere share one budget
+STATE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "cache", "ratelimit.json")
+MAX_WAIT = 5  # seconds a caller with nothing cached may wait for a token
+DEFAULT_RETRY_AFTER = 60  # seconds to back off after a 429 without Retry-After
+
+
+class Budget:
+    """
+    A token bucket: `rate` requests per second sustained, bursts of up to `burst`.
+    """
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+
+
+DEFAULT_BUDGET = Budget(rate=1.0, burst=10)
+BUDGETS = {
+    # NWS does not publish a number; it asks for "reasonable" use and throttles bursts
+    "api.weather.gov": Budget(rate=0.5, burst=10),
+    # Free tier: 60 calls per minute
+    "api.openweathermap.org": Budget(rate=50 / 60, burst=10),
+    # 500 requests per hour per key
+    "www.airnowapi.org": Budget(rate=400 / 3600, burst=5),
+    # 45 requests per minute
+    "ip-api.com": Budget(rate=30 / 60, burst=5),
+    "ident.me": Budget(rate=0.2, burst=3),
+}
+
+
+class RateLimitedError(Exception):
+    """
+    Raised when a host's budget is exhausted and no token became available in time.
+    """
+
+    def __init__(self, host, retry_after):
+        super().__init__(f"request budget for {host} exhausted, next token in {retry_after:.1f}s")
+        self.host = host
+        self.retry_after = retry_after
+
+
+class RateLimiter:
+    """
+    Per-host token buckets shared between processes through a locked file.
+    """
+
+    def __init__(self, path=STATE_FILE, budgets=None):
+        self.path = path
+        self.budgets = BUDGETS if budgets is None else budgets
+        self._lock = threading.Lock()
+        self._memory = {}  # bucket state when the state file is unusable
+        self.granted = {}
+        self.throttled = {}
+        try:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        except OSError:
+            logger.warning("Could not create rate limit directory for %s", self.path)
+
+    def _budget(self, host):
+        return self.budgets.get(host, DEFAULT_BUDGET)
+
+    def _update(self, host, fn):
+        """
+        Apply fn(bucket, budget, now) to a host's bucket under the thread and
+        file locks, write the state back and return fn's result. Without a
+        usable state file the bucket lives in memory only.
+        """
+        with self._lock:
+            try:
+                f = open(self.path, "a+", encoding="utf-8")
+            except OSError as e:
+                logger.warning("Could not open rate limit state %s: %s", self.path, e)
+                f = None
+            try:
+                if f is not None and fcntl is not None:
+                    fcntl.flock(f, fcntl.LOCK_EX)
+                if f is not None:
+                    f.seek(0)
+                    try:
+                        state = json.loads(f.read() or "{}")
+                    except ValueError:
+                        state = {}
+                else:
+                    state = self._memory
+                budget = self._budget(host)
+                now = time.time()
+                bucket = state.get(host) or {"tokens": budget.burst, "updated": now, "blocked_until": 0}
+                # Refill for the time since the last update, up to the burst size
+                elapsed = max(0.0, now - bucket["updated"])
+                bucket["tokens"] = min(budget.burst, bucket["tokens"] + elapsed * budget.rate)
+                bucket["updated"] = now
+                result = fn(bucket, budget, now)
+                state[host] = bucket
+                if f is not None:
+                    f.seek(0)
+                    f.truncate()
+                    json.dump(state, f)
+                    f.flush()
+                else:
+                    self._memory = state
+                return result
+            finally:
+                if f is not None:
+                    f.close()  # also releases the flock
+
+    def _take(self, bucket, budget, now):
+        """
+        Take one token if available. Returns the seconds until one is, 0 on success.
+        """
+        if now < bucket.get("blocked_until", 0):
+            return bucket["blocked_until"] - now
+        if bucket["tokens"] >= 1:
+            bucket["tokens"] -= 1
+            return 0
+        return (1 - bucket["tokens"]) / budget.rate
+
+    def _wait(self, bucket, budget, now):
+        """
+        Return the seconds until a token is available, without taking it.
+        """
+        if now < bucket.get("blocked_until", 0):
+            return bucket["blocked_until"] - now
+        return 0 if bucket["tokens"] >= 1 else (1 - bucket["tokens"]) / budget.rate
+
+    def _count(self, host, granted):
+        counts = self.granted if granted else self.throttled
+        counts[host] = counts.get(host, 0) + 1
+
+    def wait_time(self, host):
+        """
+        Return the seconds until a request to a host would be allowed (0 if
+        one is allowed now), without spending any budget.
+        """
+        return self._update(host, self._wait)
+
+    def try_acquire(self, host):
+        """
+        Take one request from a host's budget if one is available now.
+        Returns True if it was taken.
+        """
+        granted = not self._update(host, self._take)
+        self._count(host, granted)
+        return granted
+
+    def acquire(self, host, max_wait=MAX_WAIT):
+        """
+        Take one request from a host's budget, waiting up to max_wait seconds
+        for a token. Raises RateLimitedError if none becomes available.
+        """
+        deadline = time.monotonic() + max_wait
+        while True:
+            wait = self._update(host, self._take)
+            if not wait:
+                self._count(host, True)
+                return
+            remaining = deadline - time.monotonic()
+            if wait > remaining:
+                self._count(host, False)
+                raise RateLimitedError(host, wait)
+            time.sleep(wait)
+
+    def penalize(self, host, retry_after=None):
+        """
+        Block a host's budget after the server answered 429 Too Many Requests.
+        """
+        try:
+            delay = float(retry_after) if retry_after is not None else DEFAULT_RETRY_AFTER
+        except ValueError:
+            delay = DEFAULT_RETRY_AFTER
+
+        def block(bucket, budget, now):
+            bucket["tokens"] = 0
+            bucket["blocked_until"] = max(bucket.get("blocked_until", 0), now + delay)
+
+        self._update(host, block)
+        logger.warning("%s throttled us, holding requests for %.0fs", host, delay)
+
+    def get_stats(self):
+        """
+        Return per-host counts of granted and throttled requests in this process.
+        """
+        hosts = set(self.granted) | set(self.throttled)
+        return {host: {"granted": self.granted.get(host, 0), "throttled": self.throttled.get(host, 0)}
+                for host in sorted(hosts)}
+
+
+_limiter = None
+_limiter_lock = threading.Lock()
+
+
+def get_limiter():
+    """
+    Return the process-wide RateLimiter.
+    """
+    global _limiter
+    with _limiter_lock:
+        if _limiter is None:
+            _limiter = RateLimiter()
+        return _limiter
+
+
+def set_limiter(limiter):
+    """
+    Replace the process-wide RateLimiter (None creates a new one on next
+    use). Returns the previous one, so callers can put it back.
+    """
+    global _limiter
+    with _limiter_lock:
+        previous, _limiter = _limiter, limiter
+        return previous
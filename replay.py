@@ -0,0 +1,304 @@
+"""Record and replay the upstream APIs for offline benchmarks.
+
+Record mode observes the shared HttpClient and saves every response it
+completes (status, headers and the body exactly as transferred) as a fixture
+file. Replay mode serves those fixtures from a local HTTP stand-in with a
+configurable per-request latency; pointing http_client at it (set_upstream()
+or ALARM_CLOCK_UPSTREAM) sends every fetch class in the repo there, so
+DataAggregator runs end to end offline and gives the same answers every time.
+
+API keys are stripped from the URLs before fixtures are keyed or saved.
+
+    python replay.py record                  # one real refresh, saved to fixtures/
+    python replay.py serve --latency 0.08    # stand-in on 127.0.0.1:8765
+    python replay.py bench --runs 10 --latency 0.08 --cold
+"""
+
+import argparse
+import base64
+import hashlib
+import json
+import os
+import statistics
+import tempfile
+import threading
+import time
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlencode, urlsplit
+
+import bootstrap_cache
+import grid_index
+import http_cache
+import http_client
+import rate_limit
+import resilience
+from log_config import get_logger
+
+logger = get_logger('replay', 'replay.log')
+
+# Constants
+FIXTURE_DIR = "fixtures"
+DEFAULT_PORT = 8765
+DEFAULT_LATENCY = 0.0  # seconds added to every replayed response
+SECRET_PARAMS = {"appid", "api_key", "key", "token"}
+HOP_BY_HOP = {"connection", "keep-alive", "transfer-encoding", "content-length", "date", "age"}
+
+
+def fixture_key(url):
+    """
+    Key a URL by host, path and its non-secret query parameters.
+    """
+    parts = urlsplit(url)
+    query = sorted((k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True)
+                   if k.lower() not in SECRET_PARAMS)
+    return f"{parts.hostname}{parts.path or '/'}?{urlencode(query)}"
+
+
+def fixture_path(directory, url):
+    return os.path.join(directory, hashlib.sha1(fixture_key(url).encode("utf8")).hexdigest() + ".json")
+
+
+class Recorder:
+    """
+    Saves every response the shared HttpClient completes as a fixture.
+    """
+
+    def __init__(self, directory=FIXTURE_DIR):
+        self.directory = directory
+        self.recorded = 0
+        os.makedirs(self.directory, exist_ok=True)
+
+    def __call__(self, response):
+        # A 304 carries no body; keep the full response recorded earlier
+        if response.status == 304:
+            return
+        date = http_cache.parse_http_date(response.headers.get("Date"))
+        fixture = {
+            "key": fixture_key(response.url),
+            "status": response.status,
+            "reason": response.reason,
+            "headers": [(k, v) for k, v in response.headers.items()],
+            "recorded_at": date or time.time(),
+            "body": base64.b64encode(response.raw).decode("ascii"),
+        }
+        path = fixture_path(self.directory, response.url)
+        with open(path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(fixture, f, indent=1)
+        os.replace(path + ".tmp", path)
+        self.recorded += 1
+        logger.info("Recorded %s (%d)", fixture["key"], response.status)
+
+    def start(self):
+        http_client.add_observer(self)
+        return self
+
+
+class _ReplayHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, like the real hosts
+
+    def do_GET(self):
+        server = self.server
+        host, _, rest = self.path.lstrip("/").partition("/")
+        url = f"http://{host}/{rest}"
+        fixture = server.load(url)
+        time.sleep(server.latency_for(host))
+        if fixture is None:
+            logger.warning("No fixture for %s", fixture_key(url))
+            self.send_error(404, "No fixture recorded")
+            return
+
+        headers = [(k, v) for k, v in fixture["headers"] if k.lower() not in HOP_BY_HOP]
+        etag = next((v for k, v in headers if k.lower() == "etag"), None)
+        body = base64.b64decode(fixture["body"])
+        if etag is not None and self.headers.get("If-None-Match") == etag:
+            status, body = 304, b""
+        else:
+            status = fixture["status"]
+        self.send_response(status, fixture["reason"])
+        # Shift Date/Expires so freshness is what it was when recorded
+        now = time.time()
+        shift = now - fixture["recorded_at"]
+        for k, v in headers:
+            if k.lower() == "expires":
+                expires = http_cache.parse_http_date(v)
+                if expires is not None:
+                    v = formatdate(expires + shift, usegmt=True)
+            self.send_header(k, v)
+        self.send_header("Date", formatdate(now, usegmt=True))
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        logger.debug(format, *args)
+
+
+class ReplayServer(ThreadingHTTPServer):
+    """
+    A local stand-in that serves recorded fixtures.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, directory=FIXTURE_DIR, port=DEFAULT_PORT, latency=DEFAULT_LATENCY, host_latency=None):
+        """
+        :param latency: Seconds added to every response.
+        :param host_latency: {upstream host: seconds} overriding `latency` per host.
+        """
+        super().__init__(("127.0.0.1", port), _ReplayHandler)
+        self.directory = directory
+        self.latency = latency
+        self.host_latency = host_latency or {}
+        self._fixtures = {}
+        self._thread = None
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+    def latency_for(self, host):
+        return self.host_latency.get(host, self.latency)
+
+    def load(self, url):
+        path = fixture_path(self.directory, url)
+        fixture = self._fixtures.get(path)
+        if fixture is None:
+            try:
+                with open(path, encoding="utf-8") as f:
+                    fixture = self._fixtures[path] = json.load(f)
+            except (OSError, ValueError):
+                return None
+        return fixture
+
+    def start(self):
+        """
+        Serve on a background thread.
+        """
+        self._thread = threading.Thread(target=self.serve_forever, name="replay", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+def replay_hosts(directory=FIXTURE_DIR):
+    """
+    Return the upstream hosts with recorded fixtures.
+    """
+    hosts = set()
+    for name in os.listdir(directory):
+        if name.endswith(".json"):
+            with open(os.path.join(directory, name), encoding="utf-8") as f:
+                hosts.add(json.load(f)["key"].split("/", 1)[0])
+    return hosts
+
+
+def _isolate(scratch, limiter=None, suffix=""):
+    """
+    Point the process-wide caches, grid index and source state (and, if given,
+    the rate limiter) at fresh instances under scratch. Returns what they
+    replaced, for _restore().
+    """
+    originals = {
+        "http_cache": http_cache.set_cache(http_cache.ResponseCache(os.path.join(scratch, f"http{suffix}"))),
+        "bootstrap_cache": bootstrap_cache.set_cache(
+            bootstrap_cache.BootstrapCache(os.path.join(scratch, f"bootstrap{suffix}.json"))),
+        "grid_index": grid_index.set_index(grid_index.GridIndex()),  # so /points is requested, not inferred
+        "sources": resilience.reset_sources(),
+    }
+    if limiter is not None:
+        originals["limiter"] = rate_limit.set_limiter(limiter)
+    return originals
+
+
+def _restore(originals):
+    http_cache.set_cache(originals["http_cache"])
+    bootstrap_cache.set_cache(originals["bootstrap_cache"])
+    grid_index.set_index(originals["grid_index"])
+    resilience.reset_sources(originals["sources"])
+    if "limiter" in originals:
+        rate_limit.set_limiter(originals["limiter"])
+
+
+def record(args):
+    # Imported here so serve works on machines without the sensor libraries
+    from data_agg import DataAggregator
+
+    # Start from empty caches so every upstream request is made and recorded
+    scratch = tempfile.mkdtemp(prefix="record-")
+    originals = _isolate(scratch)
+    try:
+        recorder = Recorder(args.fixtures).start()
+        DataAggregator().fetch_all_data()
+    finally:
+        _restore(originals)
+    print(f"Recorded {recorder.recorded} responses to {args.fixtures}/")
+
+
+def serve(args):
+    server = ReplayServer(args.fixtures, args.port, args.latency)
+    print(f"Replaying {args.fixtures}/ on {server.url} with {args.latency}s latency")
+    print(f"Point clients at it with {http_client.UPSTREAM_ENV}={server.url}")
+    server.serve_forever()
+
+
+def bench(args):
+    from data_agg import DataAggregator
+
+    server = ReplayServer(args.fixtures, 0, args.latency).start()
+    http_client.set_upstream(server.url)
+    scratch = tempfile.mkdtemp(prefix="replay-")
+    # Replayed traffic must not spend, or be throttled by, the real request budget
+    limiter = rate_limit.RateLimiter(
+        os.path.join(scratch, "ratelimit.json"),
+        budgets={host: rate_limit.Budget(1e6, 1e6) for host in replay_hosts(args.fixtures)})
+    # Resolve the recorded location and grid, and keep replayed data out of the real caches
+    originals = _isolate(scratch, limiter)
+    aggregator = DataAggregator(concurrent=args.concurrent)
+    timings = []
+    try:
+        for run in range(args.runs):
+            # Breakers, last good values and stale markers must not carry over between runs;
+            # a cold run also starts from empty caches (originals stay saved from above)
+            if args.cold:
+                _isolate(scratch, suffix=f"-{run}")
+            else:
+                resilience.reset_sources()
+            start = time.perf_counter()
+            weather, _, _, _ = aggregator.fetch_all_data()
+            timings.append(time.perf_counter() - start)
+            missing = weather.get("missing") or []
+            print(f"run {run + 1}: {timings[-1] * 1000:.1f} ms" + (f" (missing {', '.join(missing)})" if missing else ""))
+    finally:
+        _restore(originals)
+        http_client.set_upstream(None)
+        server.stop()
+    timings.sort()
+    print(f"median {statistics.median(timings) * 1000:.1f} ms, "
+          f"p90 {timings[int(0.9 * (len(timings) - 1))] * 1000:.1f} ms, "
+          f"min {timings[0] * 1000:.1f} ms over {len(timings)} runs")
+    print("connections:", http_client.get_stats())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--fixtures", default=FIXTURE_DIR)
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("record")
+    serve_parser = sub.add_parser("serve")
+    serve_parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    serve_parser.add_argument("--latency", type=float, default=DEFAULT_LATENCY)
+    bench_parser = sub.add_parser("bench")
+    bench_parser.add_argument("--runs", type=int, default=5)
+    bench_parser.add_argument("--latency", type=float, default=DEFAULT_LATENCY)
+    bench_parser.add_argument("--cold", action="store_true", help="empty HTTP cache on every run")
+    bench_parser.add_argument("--concurrent", action="store_true")
+    args = parser.parse_args()
+    {"record": record, "serve": serve, "bench": bench}[args.command](args)
+
+
+if __name__ == "__main__":
+    main()
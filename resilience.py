@@ -0,0 +1,309 @@
+"""Resilience layer for the remote data sources.
+
+Each upstream host gets a ResilientSource with a per-source timeout, bounded
+retries with full jitter and a circuit breaker. When a fetch fails, or the
+breaker is open, or the host's cross-process request budget is spent, the
+last good value for that URL is served instead, its age
+is recorded, and a background refresh is started, so one hung or failing
+source cannot stall the render cycle.
+"""
+
+import random
+import threading
+import time
+import urllib.error
+from urllib.parse import urlsplit
+
+import http_cache
+import http_client
+import rate_limit
+from log_config import get_logger
+
+logger = get_logger('resilience', 'resilience.log')
+
+# Circuit breaker states
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class SourcePolicy:
+    """
+    Timeout, retry and circuit breaker settings for one source.
+    """
+
+    def __init__(self, timeout=10, retries=2, backoff_base=0.5, backoff_cap=4.0,
+                 failure_threshold=5, reset_timeout=300, max_stale=6 * 3600):
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.max_stale = max_stale
+
+
+DEFAULT_POLICY = SourcePolicy()
+POLICIES = {
+    "api.weather.gov": SourcePolicy(timeout=10, retries=2),
+    "api.openweathermap.org": SourcePolicy(timeout=10, retries=2),
+    "www.airnowapi.org": SourcePolicy(timeout=10, retries=1),
+    "ident.me": SourcePolicy(timeout=5, retries=1),
+    "ip-api.com": SourcePolicy(timeout=5, retries=1),
+}
+
+
+class CircuitOpenError(Exception):
+    """
+    Raised when a source's circuit breaker is open and no stale value exists.
+    """
+
+
+def is_transient(error):
+    """
+    Return True for errors worth retrying: network failures, timeouts,
+    throttling and server errors.
+    """
+    if isinstance(error, urllib.error.HTTPError):
+        return error.code == 429 or error.code >= 500
+    return isinstance(error, (OSError, TimeoutError))
+
+
+class CircuitBreaker:
+    """
+    Opens after a run of consecutive failures and lets one trial call through
+    once the reset timeout has passed.
+    """
+
+    def __init__(self, failure_threshold, reset_timeout):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = None
+        self._lock = threading.Lock()
+
+    def allow(self):
+        with self._lock:
+            if self.state == CLOSED:
+                return True
+            if self.state == OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+                self.state = HALF_OPEN
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.state = CLOSED
+            self.failures = 0
+
+    def release(self):
+        """
+        Give back a trial call that ended without an answer from the host
+        (cancelled, or not sent for lack of budget), so the next call makes it.
+        """
+        with self._lock:
+            if self.state == HALF_OPEN:
+                self.state = OPEN  # opened_at is kept, so allow() lets the next call through
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == HALF_OPEN or self.failures >= self.failure_threshold:
+                self.state = OPEN
+                self.opened_at = time.monotonic()
+
+
+class ResilientSource:
+    """
+    Wraps fetches to one upstream host with timeouts, retries, a circuit
+    breaker and stale-while-revalidate.
+    """
+
+    def __init__(self, name, policy=DEFAULT_POLICY):
+        self.name = name
+        self.policy = policy
+        self.breaker = CircuitBreaker(policy.failure_threshold, policy.reset_timeout)
+        self._lock = threading.Lock()
+        self._last_good = {}  # key -> (value, fetched_at)
+        self._refreshing = set()
+        self._stale = {}  # key -> (age in seconds, monotonic time served) while served stale
+
+    def _attempt(self, fn, retries):
+        """
+        Call fn(timeout) with up to `retries` jittered retries on transient errors.
+        """
+        attempt = 0
+        while True:
+            if not self.breaker.allow():
+                raise CircuitOpenError(f"circuit open for {self.name}")
+            try:
+                value = fn(self.policy.timeout)
+            except Exception as e:
+                if isinstance(e, urllib.error.HTTPError) and e.code == 429:
+                    rate_limit.get_limiter().penalize(self.name, e.headers.get("Retry-After") if e.headers else None)
+                if isinstance(e, (http_client.RequestCancelled, rate_limit.RateLimitedError)):
+                    self.breaker.release()
+                    raise
+                if not is_transient(e):
+                    # The host answered (a 404, an undecodable body): it is reachable
+                    self.breaker.record_success()
+                    raise
+                self.breaker.record_failure()
+                if attempt >= retries:
+                    raise
+                delay = random.uniform(0, min(self.policy.backoff_cap, self.policy.backoff_base * 2 ** attempt))
+                logger.warning("%s failed (%s), retrying in %.2fs", self.name, e, delay)
+                time.sleep(delay)
+                attempt += 1
+                continue
+            self.breaker.record_success()
+            return value
+
+    def call(self, key, fn):
+        """
+        Return fn(timeout) for key. If a last good value exists, only one
+        attempt is made in the foreground; on failure that value is served and
+        a retrying refresh continues in the background.
+        """
+        with self._lock:
+            last = self._last_good.get(key)
+        if last is not None and time.time() - last[1] > self.policy.max_stale:
+            last = None
+
+        try:
+            value = self._attempt(fn, 0 if last is not None else self.policy.retries)
+        except Exception as e:
+            if last is None or not (is_transient(e) or isinstance(e, (CircuitOpenError, rate_limit.RateLimitedError))):
+                raise
+            age = time.time() - last[1]
+            logger.warning("%s unavailable (%s), serving data %.0fs old", self.name, e, age)
+            with self._lock:
+                self._stale[key] = (age, time.monotonic())
+            self._refresh_in_background(key, fn)
+            return last[0]
+
+        with self._lock:
+            self._last_good[key] = (value, time.time())
+            self._stale.pop(key, None)
+        return value
+
+    def _refresh_in_background(self, key, fn):
+        with self._lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+
+        def refresh():
+            try:
+                value = self._attempt(fn, self.policy.retries)
+                with self._lock:
+                    # The stale value was already served; a foreground success clears it
+                    self._last_good[key] = (value, time.time())
+            except Exception as e:
+                logger.warning("Background refresh of %s failed: %s", self.name, e)
+            finally:
+                with self._lock:
+                    self._refreshing.discard(key)
+
+        threading.Thread(target=refresh, name=f"refresh-{self.name}", daemon=True).start()
+
+    def stale_ages(self, since=None):
+        """
+        Return the ages of the values served stale (since a monotonic time,
+        if given) that have not been refreshed yet.
+        """
+        with self._lock:
+            return [age for age, served_at in self._stale.values() if since is None or served_at >= since]
+
+
+_sources = {}
+_sources_lock = threading.Lock()
+
+
+def get_source(name):
+    """
+    Return the process-wide ResilientSource for an upstream host.
+    """
+    with _sources_lock:
+        source = _sources.get(name)
+        if source is None:
+            source = _sources[name] = ResilientSource(name, POLICIES.get(name, DEFAULT_POLICY))
+        return source
+
+
+def reset_sources(sources=None):
+    """
+    Replace the process-wide sources (breakers, last good values, stale
+    markers) with `sources`, empty by default. Returns the previous ones, so
+    callers can put them back.
+    """
+    global _sources
+    with _sources_lock:
+        previous, _sources = _sources, {} if sources is None else sources
+        return previous
+
+
+def _budgeted(host, fn):
+    """
+    Wrap an uncached fetch so it first takes a request from the host's budget.
+    The HTTP response cache does this itself so it can serve cached data instead.
+    """
+    def call(timeout):
+        rate_limit.get_limiter().acquire(host)
+        return fn(timeout)
+    return call
+
+
+def get_json(url, cache=False):
+    """
+    Fetch a URL as JSON through its host's ResilientSource, optionally via
+    the HTTP response cache.
+    """
+    host = urlsplit(url).hostname
+    if cache:
+        fn = lambda timeout: http_cache.get_json(url, timeout=timeout)
+    else:
+        fn = _budgeted(host, lambda timeout: http_client.get_json(url, timeout=timeout))
+    return get_source(host).call(url, fn)
+
+
+def get_array_items(url, key, limit=None):
+    """
+    Fetch the array stored under `key` in a JSON response through the HTTP
+    response cache, decoding it incrementally and keeping at most `limit` items.
+    """
+    fn = lambda timeout: list(http_cache.get_cache().iter_array_items(url, key, limit, timeout=timeout))
+    return get_source(urlsplit(url).hostname).call((url, key, limit), fn)
+
+
+def get_text(url):
+    """
+    Fetch a URL as text through its host's ResilientSource.
+    """
+    host = urlsplit(url).hostname
+    return get_source(host).call(url, _budgeted(host, lambda timeout: http_client.get_text(url, timeout=timeout)))
+
+
+def stale_sources(since=None):
+    """
+    Return {source name: age in seconds of its oldest value} for every source
+    with answers served from stale data, limited to those served since a
+    monotonic time if given (e.g. the start of a fetch cycle).
+    """
+    with _sources_lock:
+        sources = list(_sources.values())
+    stale = {}
+    for source in sources:
+        ages = source.stale_ages(since)
+        if ages:
+            stale[source.name] = round(max(ages))
+    return stale
+
+
+def get_status():
+    """
+    Return the circuit breaker state of every source.
+    """
+    with _sources_lock:
+        return {name: source.breaker.state for name, source in _sources.items()}
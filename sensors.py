@@ -0,0 +1,213 @@
+"""Process-wide registry of the indoor I2C sensors.
+
+Creating BME688Sensor/SGP30Sensor objects per cycle opens a new busio.I2C
+each time, re-probes the BME addresses and calls iaq_init() on the SGP30,
+which throws away its learned baseline. SensorRegistry opens the bus once,
+initializes each device once, remembers the address that worked and hands
+out the same instances. A device that fails a read is dropped and
+re-initialized on next use at its known address, without touching the
+other devices.
+
+start_read() begins a read in the background and returns a Future, so the
+devices convert at the same time as each other and as the network fetches.
+"""
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import i2c_bus
+from bme import BME688Sensor
+from log_config import get_logger
+from sgp30_sensor import SGP30Sensor
+from veml7700_sensor import VEML7700Sensor
+
+logger = get_logger('sensors', 'sensors.log')
+
+# Constants
+BME = "bme"
+SGP30 = "sgp30"
+VEML7700 = "veml7700"
+EMPTY_BME = {
+    "temperature": None,
+    "temperature_f": None,
+    "humidity": None,
+    "pressure": None,
+    "gas_resistance": None,
+    "relative_humidity": None,
+    "altitude": None,
+}
+EMPTY_SGP30 = {"eCO2": None, "TVOC": None}
+EMPTY_VEML7700 = {"ambient_light": None, "white_light": None}
+EMPTY = {BME: EMPTY_BME, SGP30: EMPTY_SGP30, VEML7700: EMPTY_VEML7700}  # what a failed device reports
+
+
+def _bme_failed(data):
+    return data.get("temperature") is None
+
+
+def _sgp30_failed(data):
+    return data.get("eCO2") is None
+
+
+def _veml7700_failed(data):
+    return data.get("ambient_light") is None
+
+
+class SensorRegistry:
+    """
+    Long-lived sensor instances on one shared I2C bus.
+    """
+
+    # name -> (factory(i2c, address), failed(data))
+    DEVICES = {
+        BME: (lambda i2c, address: BME688Sensor(i2c, address=address), _bme_failed),
+        # Sampled in the background at 1 Hz by one process; reads return the latest sample
+        SGP30: (lambda i2c, address: SGP30Sensor(i2c, sample=True), _sgp30_failed),
+        VEML7700: (lambda i2c, address: VEML7700Sensor(i2c), _veml7700_failed),
+    }
+
+    def __init__(self, i2c=None):
+        self._lock = threading.Lock()
+        self._device_locks = {name: threading.Lock() for name in self.DEVICES}
+        self._i2c = i2c
+        self._sensors = {}  # name -> sensor instance
+        self.addresses = {}  # name -> I2C address that worked
+        self.inits = {name: 0 for name in self.DEVICES}
+        self.failures = {name: 0 for name in self.DEVICES}
+        self._executor = None
+
+    def bus(self):
+        """
+        Return the I2C bus: the one passed in, or the process-wide shared bus.
+        """
+        with self._lock:
+            if self._i2c is None:
+                self._i2c = i2c_bus.get_bus()
+            return self._i2c
+
+    def get(self, name):
+        """
+        Return the sensor instance for a device, initializing it if needed.
+        """
+        with self._device_locks[name]:
+            return self._get(name)
+
+    def _get(self, name):
+        sensor = self._sensors.get(name)
+        if sensor is None:
+            factory, _ = self.DEVICES[name]
+            address = self.addresses.get(name)
+            try:
+                sensor = factory(self.bus(), address)
+            except Exception:
+                if address is None:
+                    raise
+                # The device may have come back at another address; probe it alone
+                logger.warning("%s not found at 0x%02X, probing again", name, address)
+                self.addresses.pop(name, None)
+                sensor = factory(self.bus(), None)
+            self._sensors[name] = sensor
+            self.addresses[name] = getattr(sensor, "address", None)
+            self.inits[name] += 1
+            logger.info("Initialized %s (address=%s, init #%d)", name,
+                        hex(self.addresses[name]) if self.addresses[name] is not None else "auto", self.inits[name])
+        return sensor
+
+    def invalidate(self, name):
+        """
+        Drop a failed device so it is re-initialized on next use.
+        """
+        with self._device_locks[name]:
+            self._drop(name)
+
+    def _drop(self, name):
+        sensor = self._sensors.pop(name, None)
+        if sensor is not None:
+            self.failures[name] += 1
+            logger.warning("Dropped %s after a failed read", name)
+            close = getattr(sensor, "close", None)
+            if close is not None:
+                try:
+                    close()
+                except Exception as e:
+                    logger.warning("Closing %s failed: %s", name, e)
+
+    def read(self, name):
+        """
+        Read a device. A failed read drops the device, so the next read
+        re-initializes it, and raises RuntimeError.
+        """
+        _, failed = self.DEVICES[name]
+        with self._device_locks[name]:
+            sensor = self._get(name)
+            try:
+                data = sensor.read_data()
+            except Exception as e:
+                self._drop(name)
+                raise RuntimeError(f"{name} read failed: {e}") from e
+            if failed(data):
+                self._drop(name)
+                raise RuntimeError(f"{name} read failed: {getattr(sensor, 'last_error', None) or 'no data'}")
+            return data
+
+    def start_read(self, name):
+        """
+        Start reading a device in the background and return a Future for its
+        data (or the RuntimeError of a failed read). Different devices convert
+        in parallel; reads of one device stay serialized by its lock.
+        """
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=len(self.DEVICES), thread_name_prefix="sensor")
+        return self._executor.submit(self.read, name)
+
+    def get_stats(self):
+        """
+        Return per-device init and failure counts and cached addresses.
+        """
+        return {
+            name: {"inits": self.inits[name], "failures": self.failures[name],
+                   "address": self.addresses.get(name)}
+            for name in self.DEVICES
+        }
+
+
+_registry = None
+_registry_lock = threading.Lock()
+
+
+def get_registry():
+    """
+    Return the process-wide SensorRegistry.
+    """
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            _registry = SensorRegistry()
+        return _registry
+
+
+def read(name):
+    """
+    Read a device through the process-wide SensorRegistry.
+    """
+    return get_registry().read(name)
+
+
+def start_read(name):
+    """
+    Start reading a device through the process-wide SensorRegistry; returns a Future.
+    """
+    return get_registry().start_read(name)
+
+
+def collect(name, future, timeout=None):
+    """
+    Return the data of a read started with start_read(), or the device's
+    empty values (see EMPTY) if it failed or took longer than timeout.
+    """
+    try:
+        return future.result(timeout=timeout)
+    except Exception as e:
+        logger.warning("Sensor %s unavailable: %s", name, e)
+        return dict(EMPTY[name])
@@ -1,42 +1,304 @@
+import json
+import os
+import threading
 import time
-import board
-import busio
+
+try:
+    import fcntl
+except ImportError:  # not available on Windows; every process then samples its own sensor
+    fcntl = None
+
 from adafruit_sgp30 import Adafruit_SGP30
+import i2c_bus
+from log_config import get_logger
+
+logger = get_logger('sgp30', 'sgp30.log')
+
+# Constants
+SAMPLE_INTERVAL = 1.0  # seconds; the SGP30's dynamic baseline algorithm expects 1 Hz
+# Shared by every process that may own the sampler, so anchored to this directory
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "cache")
+BASELINE_FILE = os.path.join(CACHE_DIR, "sgp30_baseline.json")
+BASELINE_SAVE_INTERVAL = 3600  # seconds
+BASELINE_MAX_AGE = 7 * 24 * 3600  # Sensirion: a stored baseline older than a week must not be restored
+BASELINE_LEARNING_TIME = 12 * 3600  # seconds of sampling before a fresh baseline is worth saving
+MAX_SAMPLE_AGE = 10  # seconds; older samples mean the sampler has stalled
+OWNER_LOCK_FILE = os.path.join(CACHE_DIR, "sgp30.lock")  # held by the one process that samples
+# Rewritten every second for the other processes; kept off the SD card where tmpfs exists
+LATEST_FILE = os.path.join("/dev/shm" if os.path.isdir("/dev/shm") else CACHE_DIR, "sgp30_latest.json")
+CLAIM_RETRY_INTERVAL = 60  # seconds between a reader's attempts to take over a silent owner
+
+
+def load_baseline(path=BASELINE_FILE):
+    """
+    Return the saved (eCO2, TVOC) baseline, or None if missing or too old.
+    """
+    try:
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        if time.time() - data["saved_at"] > BASELINE_MAX_AGE:
+            return None
+        return data["eCO2"], data["TVOC"]
+    except (OSError, ValueError, KeyError):
+        return None
+
+
+def save_baseline(eco2, tvoc, path=BASELINE_FILE):
+    """
+    Save an (eCO2, TVOC) baseline with the current time.
+    """
+    tmp_path = path + ".tmp"
+    try:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"eCO2": eco2, "TVOC": tvoc, "saved_at": time.time()}, f)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        logger.warning("Could not save SGP30 baseline to %s: %s", path, e)
+
+
+_lock_warned = False
+_claim_failed_at = None  # when this process last found the sampler owned elsewhere
+
+
+def _claim_owner(path=OWNER_LOCK_FILE):
+    """
+    Take the sampler ownership lock without waiting. Returns the open lock
+    file (keep it open to stay owner), or None if another process owns it
+    or the lock file is unusable.
+    """
+    global _lock_warned
+    try:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        f = open(path, "a+")
+    except OSError as e:
+        # Sampling without the lock would let every process re-init the sensor
+        if not _lock_warned:
+            logger.warning("Cannot open %s, not sampling the SGP30: %s", path, e)
+            _lock_warned = True
+        return None
+    if fcntl is not None:
+        try:
+            fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            f.close()
+            return None
+    return f
+
+
+def publish_sample(eco2, tvoc, path=LATEST_FILE):
+    """
+    Share a sample with the processes that do not own the sampler.
+    """
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"eCO2": eco2, "TVOC": tvoc, "at": time.time()}, f)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        logger.debug("Could not publish SGP30 sample to %s: %s", path, e)
+
+
+def read_published(path=LATEST_FILE):
+    """
+    Return the owning process's latest sample; None values if there is no recent one.
+    """
+    try:
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        if time.time() - data["at"] <= MAX_SAMPLE_AGE:
+            return {"eCO2": data["eCO2"], "TVOC": data["TVOC"]}
+    except (OSError, ValueError, KeyError):
+        pass
+    return {"eCO2": None, "TVOC": None}
+
+
+class SGP30Sampler:
+    """
+    Reads an SGP30 once a second on a background thread and keeps the latest
+    sample, restoring the saved baseline at start and saving it periodically.
+    """
+
+    def __init__(self, sensor, interval=SAMPLE_INTERVAL, baseline_file=BASELINE_FILE, latest_file=None):
+        """
+        :param latest_file: Also publish each sample there (see publish_sample()).
+        """
+        self.sensor = sensor
+        self.interval = interval
+        self.baseline_file = baseline_file
+        self.latest_file = latest_file
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._sampled = threading.Event()
+        self._thread = None
+        self.latest = None  # (eCO2, TVOC, monotonic time)
+        self.errors = 0
+        self.started_at = None
+        self.baseline_restored = False
+        self.baseline_saved_at = None
+
+    def start(self):
+        baseline = load_baseline(self.baseline_file)
+        if baseline is not None:
+            self.sensor.set_iaq_baseline(*baseline)
+            self.baseline_restored = True
+            logger.info("Restored SGP30 baseline eCO2=0x%04X TVOC=0x%04X", *baseline)
+        self.started_at = time.monotonic()
+        self._thread = threading.Thread(target=self._run, name="sgp30-sampler", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=2 * self.interval)
+        self.save_baseline()
+
+    def _baseline_valid(self):
+        # A restored baseline is valid at once; a fresh one only after the learning period
+        return self.baseline_restored or time.monotonic() - self.started_at >= BASELINE_LEARNING_TIME
+
+    def save_baseline(self):
+        """
+        Save the sensor's current baseline, if it has been learned.
+        """
+        if self.started_at is None or not self._baseline_valid():
+            return
+        try:
+            baseline = self.sensor.baseline_eCO2, self.sensor.baseline_TVOC
+        except Exception as e:
+            logger.warning("Could not read SGP30 baseline: %s", e)
+            return
+        save_baseline(*baseline, path=self.baseline_file)
+        self.baseline_saved_at = time.monotonic()
+
+    def _run(self):
+        next_sample = time.monotonic()
+        last_save = time.monotonic()
+        while not self._stop.is_set():
+            try:
+                eco2, tvoc = self.sensor.iaq_measure()
+                with self._lock:
+                    self.latest = (eco2, tvoc, time.monotonic())
+                self._sampled.set()
+                if self.latest_file is not None:
+                    publish_sample(eco2, tvoc, self.latest_file)
+            except Exception as e:
+                self.errors += 1
+                logger.warning("SGP30 sample failed: %s", e)
+            if time.monotonic() - last_save >= BASELINE_SAVE_INTERVAL:
+                self.save_baseline()
+                last_save = time.monotonic()
+            # Keep a fixed cadence rather than drifting by the read time
+            next_sample += self.interval
+            self._stop.wait(max(0, next_sample - time.monotonic()))
+
+    def read_data(self):
+        """
+        Return the latest sample without touching the bus; None values if
+        there is no recent sample.
+        """
+        # Only a read right after start waits, for the first sample
+        self._sampled.wait(timeout=2 * self.interval)
+        with self._lock:
+            latest = self.latest
+        if latest is None or time.monotonic() - latest[2] > MAX_SAMPLE_AGE:
+            return {"eCO2": None, "TVOC": None}
+        return {"eCO2": latest[0], "TVOC": latest[1]}
+
 
 class SGP30Sensor:
     """
     A class to interface with the SGP30 air quality sensor using CircuitPython.
     """
 
-    def __init__(self, i2c=None):
+    def __init__(self, i2c=None, sample=False):
         """
         Initialize the SGP30 sensor.
-        :param i2c: Optional I2C bus object. If None, a default I2C bus is created.
+        :param i2c: Optional I2C bus object. If None, the shared bus (i2c_bus) is used.
+        :param sample: Sample in the background at 1 Hz with baseline persistence;
+                       read_data() then returns the latest sample. Only one process
+                       samples (and calls iaq_init()); the others read its samples.
         """
         if i2c is None:
-            i2c = busio.I2C(board.SCL, board.SDA)
-        self.sensor = Adafruit_SGP30(i2c, address=0x58)
+            i2c = i2c_bus.get_bus()
+        self.i2c = i2c
+        self.address = 0x58
+        self.sensor = None
+        self.sampler = None
+        self._owner_lock = None
+        if not sample:
+            self._init_sensor()
+        elif not self._claim():
+            logger.info("SGP30 is sampled by another process; reading its samples")
+
+    def _init_sensor(self):
+        self.sensor = Adafruit_SGP30(self.i2c, address=self.address)
 
         # Initialize the sensor
         self.sensor.iaq_init()
         # print("SGP30 sensor initialized.")
         # print(f"Serial Number: {self.sensor.serial}")
 
+    def _claim(self):
+        """
+        Become the process that samples the SGP30, if no other process is.
+        After a failed attempt, the process waits CLAIM_RETRY_INTERVAL before
+        trying again, however many instances the registry creates meanwhile.
+        """
+        global _claim_failed_at
+        if _claim_failed_at is not None and time.monotonic() - _claim_failed_at < CLAIM_RETRY_INTERVAL:
+            return False
+        lock = _claim_owner()
+        if lock is None:
+            _claim_failed_at = time.monotonic()
+            return False
+        _claim_failed_at = None
+        try:
+            self._init_sensor()
+            self.sampler = SGP30Sampler(self.sensor, latest_file=LATEST_FILE).start()
+        except Exception:
+            lock.close()
+            raise
+        self._owner_lock = lock
+        return True
+
     def read_data(self):
         """
         Read data from the SGP30 sensor.
         :return: A dictionary containing eCO2 and TVOC levels.
         """
+        if self.sampler is None and self.sensor is None:
+            # Another process samples; take over only if it has gone quiet
+            data = read_published()
+            if data["eCO2"] is not None or not self._claim():
+                return data
+        if self.sampler is not None:
+            return self.sampler.read_data()
         return {
             "eCO2": self.sensor.eCO2,  # Equivalent CO2 in ppm
             "TVOC": self.sensor.TVOC   # Total Volatile Organic Compounds in ppb
         }
 
+    def close(self):
+        """
+        Stop background sampling, saving the baseline.
+        """
+        if self.sampler is not None:
+            self.sampler.stop()
+            self.sampler = None
+        if self._owner_lock is not None:
+            self._owner_lock.close()  # releases ownership to another process
+            self._owner_lock = None
+
     def get_baseline(self):
         """
         Get the current baseline values from the sensor.
-        :return: A tuple containing the eCO2 and TVOC baseline values.
+        :return: A tuple containing the eCO2 and TVOC baseline values,
+                 or (None, None) if another process owns the sensor.
         """
+        if self.sensor is None:
+            return None, None
         return self.sensor.baseline_eCO2, self.sensor.baseline_TVOC
 
 def main():
@@ -0,0 +1,193 @@
+"""Local solar ephemeris: sunrise, sunset and twilight times.
+
+Implements the NOAA solar position equations so sunrise/sunset can be
+computed from latitude, longitude and date instead of calling
+sunrise-sunset.org. The math is written against NumPy arrays so year_table()
+builds a full year of events in one vectorized call; the scalar helpers run
+the same code on a single day.
+"""
+
+from datetime import date, datetime, timedelta, timezone
+
+import numpy as np
+
+# Constants
+OUT_TIME_FORMAT = "%I:%M %p"
+EPOCH_JULIAN_DAY = 2440587.5  # Julian day of 1970-01-01T00:00Z
+J2000 = 2451545.0
+
+# Solar zenith angles (degrees) for each event
+ZENITH_SUNRISE = 90.833  # refraction + solar disc radius
+ZENITH_CIVIL = 96.0
+ZENITH_NAUTICAL = 102.0
+ZENITH_ASTRONOMICAL = 108.0
+
+EVENTS = {
+    "sunrise": ZENITH_SUNRISE,
+    "civil": ZENITH_CIVIL,
+    "nautical": ZENITH_NAUTICAL,
+    "astronomical": ZENITH_ASTRONOMICAL,
+}
+
+
+def _solar_terms(days, lon):
+    """
+    Return (declination, equation of time) in (degrees, minutes) for each
+    day number (days since 1970-01-01), evaluated at local solar noon.
+    """
+    jd = days + EPOCH_JULIAN_DAY + 0.5 - lon / 360.0
+    t = (jd - J2000) / 36525.0
+
+    mean_long = np.mod(280.46646 + t * (36000.76983 + t * 0.0003032), 360.0)
+    mean_anom = 357.52911 + t * (35999.05029 - 0.0001537 * t)
+    eccent = 0.016708634 - t * (0.000042037 + 0.0000001267 * t)
+    m = np.radians(mean_anom)
+    center = (np.sin(m) * (1.914602 - t * (0.004817 + 0.000014 * t))
+              + np.sin(2 * m) * (0.019993 - 0.000101 * t)
+              + np.sin(3 * m) * 0.000289)
+    omega = np.radians(125.04 - 1934.136 * t)
+    app_long = mean_long + center - 0.00569 - 0.00478 * np.sin(omega)
+    mean_obliq = 23.0 + (26.0 + (21.448 - t * (46.815 + t * (0.00059 - t * 0.001813))) / 60.0) / 60.0
+    obliq = np.radians(mean_obliq + 0.00256 * np.cos(omega))
+
+    declination = np.degrees(np.arcsin(np.sin(obliq) * np.sin(np.radians(app_long))))
+
+    y = np.tan(obliq / 2.0) ** 2
+    l0 = np.radians(mean_long)
+    eq_time = 4.0 * np.degrees(
+        y * np.sin(2 * l0)
+        - 2 * eccent * np.sin(m)
+        + 4 * eccent * y * np.sin(m) * np.cos(2 * l0)
+        - 0.5 * y * y * np.sin(4 * l0)
+        - 1.25 * eccent * eccent * np.sin(2 * m)
+    )
+    return declination, eq_time
+
+
+def event_minutes(lat, lon, days, zenith=ZENITH_SUNRISE):
+    """
+    Return (rise, noon, set) as minutes after 00:00 UTC of each day number.
+    Rise and set are NaN on days the sun never crosses the given zenith.
+    """
+    days = np.asarray(days, dtype=np.float64)
+    declination, eq_time = _solar_terms(days, lon)
+    lat_r = np.radians(lat)
+    decl_r = np.radians(declination)
+    cos_ha = (np.cos(np.radians(zenith)) / (np.cos(lat_r) * np.cos(decl_r))
+              - np.tan(lat_r) * np.tan(decl_r))
+    with np.errstate(invalid="ignore"):
+        hour_angle = np.degrees(np.arccos(np.where(np.abs(cos_ha) <= 1.0, cos_ha, np.nan)))
+    noon = 720.0 - 4.0 * lon - eq_time
+    return noon - 4.0 * hour_angle, noon, noon + 4.0 * hour_angle
+
+
+def _to_datetime64(days, minutes):
+    """
+    Convert day numbers plus minutes after midnight UTC into datetime64[s],
+    with NaT where minutes is NaN.
+    """
+    seconds = np.asarray(days, dtype=np.int64) * 86400 + np.round(np.nan_to_num(minutes) * 60.0).astype(np.int64)
+    out = seconds.astype("datetime64[s]")
+    out[np.isnan(minutes)] = np.datetime64("NaT")
+    return out
+
+
+def year_table(lat, lon, year):
+    """
+    Build a table of every day in a year with sunrise, sunset, solar noon and
+    civil/nautical/astronomical dawn and dusk, as UTC datetime64[s] values
+    (NaT where the event does not occur).
+    """
+    lat = float(lat)
+    lon = float(lon)
+    first = np.datetime64(f"{year}-01-01", "D")
+    last = np.datetime64(f"{year + 1}-01-01", "D")
+    dates = np.arange(first, last)
+    days = dates.astype(np.int64)
+
+    fields = [("date", "datetime64[D]"), ("solar_noon", "datetime64[s]")]
+    for name in EVENTS:
+        rise_name = "sunrise" if name == "sunrise" else f"{name}_dawn"
+        set_name = "sunset" if name == "sunrise" else f"{name}_dusk"
+        fields += [(rise_name, "datetime64[s]"), (set_name, "datetime64[s]")]
+    table = np.empty(len(dates), dtype=fields)
+    table["date"] = dates
+
+    for name, zenith in EVENTS.items():
+        rise, noon, sunset = event_minutes(lat, lon, days, zenith)
+        if name == "sunrise":
+            table["solar_noon"] = _to_datetime64(days, noon)
+            table["sunrise"] = _to_datetime64(days, rise)
+            table["sunset"] = _to_datetime64(days, sunset)
+        else:
+            table[f"{name}_dawn"] = _to_datetime64(days, rise)
+            table[f"{name}_dusk"] = _to_datetime64(days, sunset)
+    return table
+
+
+def sun_times(lat, lon, day=None):
+    """
+    Return a dict of UTC datetimes (or None) for sunrise, sunset, solar noon
+    and each twilight on the given local date (default today).
+    """
+    if day is None:
+        day = date.today()
+    day_number = (day - date(1970, 1, 1)).days
+    midnight = datetime(day.year, day.month, day.day, tzinfo=timezone.utc)
+
+    def at(minutes):
+        minutes = float(minutes)
+        if np.isnan(minutes):
+            return None
+        return midnight + timedelta(minutes=minutes)
+
+    times = {}
+    for name, zenith in EVENTS.items():
+        rise, noon, sunset = event_minutes(float(lat), float(lon), day_number, zenith)
+        if name == "sunrise":
+            times["solar_noon"] = at(noon)
+            times["sunrise"] = at(rise)
+            times["sunset"] = at(sunset)
+        else:
+            times[f"{name}_dawn"] = at(rise)
+            times[f"{name}_dusk"] = at(sunset)
+    return times
+
+
+def format_local(utc_time):
+    """
+    Format a UTC datetime as local wall time, the way the renderer expects.
+    """
+    if utc_time is None:
+        return "--:--"
+    return utc_time.astimezone().strftime(OUT_TIME_FORMAT)
+
+
+def get_sunrise(lat, lon, day=None):
+    """
+    Get the local sunrise time string for a lat/lon.
+    """
+    return format_local(sun_times(lat, lon, day)["sunrise"])
+
+
+def get_sunset(lat, lon, day=None):
+    """
+    Get the local sunset time string for a lat/lon.
+    """
+    return format_local(sun_times(lat, lon, day)["sunset"])
+
+
+def main():
+    """
+    Main function to test the solar calculator.
+    """
+    lat, lon = 47.697, -122.3222  # Example coordinates
+    for name, value in sun_times(lat, lon).items():
+        print(f"{name}: {format_local(value)}")
+    table = year_table(lat, lon, date.today().year)
+    print(f"{len(table)} days, shortest day length:",
+          (table["sunset"] - table["sunrise"]).min())
+
+
+if __name__ == "__main__":
+    main()
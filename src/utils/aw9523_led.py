@@ -20,8 +20,9 @@ Example (CircuitPython/Blika):
 
 from __future__ import annotations
 
+import contextlib
 import time
-from typing import Sequence, List
+from typing import Dict, Sequence, List
 
 # Try CircuitPython/Adafruit driver first
 try:
@@ -39,13 +40,20 @@ try:
 except Exception:  # pragma: no cover - environment dependent
     SMBus = None  # type: ignore
 
+# The repo's shared, locked I2C bus (needs the repository root on sys.path)
+try:
+    import i2c_bus as shared_i2c  # type: ignore
+except Exception:  # pragma: no cover - run standalone from src/utils
+    shared_i2c = None  # type: ignore
+
 
 class AW9523LED:
     """Controller for AW9523 LEDs.
 
     This implementation uses `adafruit_aw9523` when available. It accepts
     either a pre-created CircuitPython `I2C` object via the `i2c` arg or
-    will create one using `board.SCL`/`board.SDA` if running under Blinka.
+    uses the shared bus from `i2c_bus` (falling back to creating one with
+    `board.SCL`/`board.SDA` if that module is not importable).
 
     If Adafruit libraries are not installed it falls back to a simple
     `smbus2` register write implementation compatible with the previous
@@ -67,6 +75,8 @@ class AW9523LED:
             # Use provided I2C or create one from board if possible
             if i2c is not None:
                 self._i2c = i2c
+            elif shared_i2c is not None:
+                self._i2c = shared_i2c.get_bus()
             else:
                 if busio is None or board is None:
                     raise RuntimeError("Adafruit AW9523 driver available but busio/board not found; pass an I2C object via `i2c=`")
@@ -103,15 +113,40 @@ class AW9523LED:
     def address(self) -> int:
         return self._address
 
-    def _write_register(self, register: int, value: int) -> None:
-        if not (0 <= value <= 0xFF):
-            raise ValueError("value must be 0..255")
-        if self._backend == "smbus":
-            self._bus.write_byte_data(self._address, register & 0xFF, value & 0xFF)
+    def _bus_lock(self):
+        """Hold the shared bus lock for SMBus access, so other drivers don't interleave."""
+        if shared_i2c is not None:
+            return shared_i2c.get_bus().locked()
+        return contextlib.nullcontext()
+
+    def _write_block(self, register: int, data: bytes) -> None:
+        if len(data) == 1:
+            self._bus.write_byte_data(self._address, register & 0xFF, data[0])
         else:
+            self._bus.write_i2c_block_data(self._address, register & 0xFF, list(data))
+
+    def _read_block(self, register: int, length: int) -> bytes:
+        return bytes(self._bus.read_i2c_block_data(self._address, register & 0xFF, length))
+
+    def _write_registers(self, values: Dict[int, int]) -> None:
+        """Write several registers; writes to adjacent registers go out as one block transfer."""
+        for value in values.values():
+            if not (0 <= value <= 0xFF):
+                raise ValueError("value must be 0..255")
+        if self._backend != "smbus":
             # Try to use driver-level APIs if present; otherwise attempt direct register access
             # Adafruit driver doesn't expose raw register write; fall back to using pwm API
             raise RuntimeError("Direct register writes are not supported with the Adafruit backend")
+        if shared_i2c is None:
+            for register, value in values.items():
+                self._bus.write_byte_data(self._address, register & 0xFF, value & 0xFF)
+            return
+        with shared_i2c.get_bus().transaction(self._address, self._write_block, self._read_block) as batch:
+            for register, value in values.items():
+                batch.write(register & 0xFF, value & 0xFF)
+
+    def _write_register(self, register: int, value: int) -> None:
+        self._write_registers({register: value})
 
     def set_brightness(self, channel: int, brightness: int) -> None:
         """Set brightness for a channel (0-255)."""
@@ -156,6 +191,20 @@ class AW9523LED:
         reg = self.PWM_BASE + int(channel)
         self._write_register(reg, brightness)
 
+    def set_brightnesses(self, levels: Dict[int, int]) -> None:
+        """Set brightness for several channels (0-255) in one bus transaction where possible."""
+        for channel, brightness in levels.items():
+            if channel not in self._led_channels:
+                raise ValueError(f"channel {channel} not configured; choose from {self._led_channels}")
+            if not (0 <= brightness <= 255):
+                raise ValueError("brightness must be in range 0..255")
+        if self._backend == "adafruit":
+            for channel, brightness in levels.items():
+                self.set_brightness(channel, brightness)
+            return
+        # Adjacent channels have adjacent PWM registers; sorted, they merge into one write
+        self._write_registers({self.PWM_BASE + int(ch): int(b) for ch, b in sorted(levels.items())})
+
     def on(self, channel: int, brightness: int = 255) -> None:
         self.set_brightness(channel, brightness)
 
@@ -191,14 +240,15 @@ class AW9523LED:
                     pass
             return found
 
-        # smbus fallback: try reading PWM registers
-        for ch in self._led_channels:
-            reg = self.PWM_BASE + ch
-            try:
-                val = self._bus.read_byte_data(self._address, reg)
-                found.append(ch)
-            except Exception:
-                pass
+        # smbus fallback: try reading PWM registers, all under one bus hold
+        with self._bus_lock():
+            for ch in self._led_channels:
+                reg = self.PWM_BASE + ch
+                try:
+                    val = self._bus.read_byte_data(self._address, reg)
+                    found.append(ch)
+                except Exception:
+                    pass
         return found
 
     def cleanup(self) -> None:
@@ -0,0 +1,88 @@
+from datetime import datetime
+
+import numpy as np
+import pytest
+
+import forecast_records
+import forecast_store
+from forecast_store import ForecastStore
+
+
+def named_period(name, start, is_daytime, temperature, precip=None, wind="5 mph"):
+    return forecast_records.DailyPeriod(name, start, is_daytime, temperature, "F", wind, "Sunny", precip)
+
+
+def test_parse_iso_series_matches_fromisoformat():
+    timestamps = ["2025-03-24T21:00:00-07:00", "2025-03-25T02:30:00+05:30", "2025-03-25T00:00:00+00:00"]
+    epochs, days = forecast_store.parse_iso_series(timestamps)
+    assert epochs.tolist() == [int(datetime.fromisoformat(t).timestamp()) for t in timestamps]
+    assert [str(d) for d in days] == ["2025-03-24", "2025-03-25", "2025-03-25"]
+
+
+def test_parse_iso_series_falls_back_for_other_formats():
+    epochs, days = forecast_store.parse_iso_series(["2025-03-24T21:00:00Z"])
+    assert epochs.tolist() == [int(datetime.fromisoformat("2025-03-24T21:00:00+00:00").timestamp())]
+    assert str(days[0]) == "2025-03-24"
+
+
+@pytest.mark.parametrize("wind, speed", [("5 to 10 mph", 10.0), ("7 mph", 7.0), ("", None), (None, None)])
+def test_parse_wind_takes_the_highest_speed(wind, speed):
+    value = forecast_store.parse_wind(wind)
+    assert (np.isnan(value) if speed is None else value == speed)
+
+
+def store(days, values, field="temperature"):
+    time = np.arange(len(days), dtype=np.int64) * 3600
+    return ForecastStore(time, np.array(days, dtype="datetime64[D]"), **{field: np.array(values, dtype=float)})
+
+
+def test_daily_reduce_ignores_nan_and_masked_values():
+    s = store(["2025-01-01"] * 3 + ["2025-01-02"] * 2, [5, np.nan, 9, 3, 4])
+    days, highs = s.daily_reduce("temperature", "max")
+    assert [str(d) for d in days] == ["2025-01-01", "2025-01-02"]
+    assert highs.tolist() == [9, 4]
+    _, lows = s.daily_reduce("temperature", "min", mask=np.array([True, True, False, True, True]))
+    assert lows.tolist() == [5, 3]
+    _, sums = s.daily_reduce("temperature", "sum")
+    assert sums.tolist() == [14, 7]
+
+
+def test_daily_reduce_rejects_unknown_reductions():
+    with pytest.raises(ValueError):
+        store(["2025-01-01"], [1]).daily_reduce("temperature", "mean")
+
+
+def test_runs_group_equal_consecutive_values():
+    s = store(["2025-01-01"] * 6, [1, 1, 2, 2, 2, 1], field="aqi")
+    starts, ends = s.runs("aqi")
+    assert starts.tolist() == [0, 2, 5]
+    assert ends.tolist() == [2, 5, 6]
+
+
+def test_window_and_head_slice_every_column():
+    s = store(["2025-01-01"] * 4, [10, 11, 12, 13])
+    assert s.window(3600, 3 * 3600).temperature.tolist() == [11, 12]
+    assert s.window(start=2 * 3600).time.tolist() == [7200, 10800]
+    head = s.head(2)
+    assert len(head) == 2 and head.day.tolist() == s.day[:2].tolist()
+
+
+def test_empty_store():
+    s = ForecastStore.from_daily([])
+    assert len(s) == 0
+    assert s.daily_summary() == []
+    assert [len(a) for a in s.runs("temperature")] == [0, 0]
+
+
+def test_daily_summary_rolls_up_named_periods_and_drops_a_leading_tonight():
+    periods = [
+        named_period("Tonight", "2025-03-24T18:00:00-07:00", False, 41, precip=20),
+        named_period("Tuesday", "2025-03-25T06:00:00-07:00", True, 58, precip=10),
+        named_period("Tuesday Night", "2025-03-25T18:00:00-07:00", False, 44, precip=60),
+        named_period("Wednesday", "2025-03-26T06:00:00-07:00", True, 61),
+    ]
+    summary = ForecastStore.from_daily(periods).daily_summary()
+    assert summary == [
+        {"name": "Tue", "high_temp": 58, "low_temp": 44, "percentageOfPrecipitation": 60},
+        {"name": "Wed", "high_temp": 61, "low_temp": None, "percentageOfPrecipitation": 0},
+    ]
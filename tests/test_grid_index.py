@@ -0,0 +1,85 @@
+import numpy as np
+import pytest
+
+import grid_index
+from grid_index import GridIndex
+
+OFFICE = "SEW"
+STEP = 0.02  # degrees per grid cell in the synthetic office grid
+
+
+def office_samples(office=OFFICE, lat0=47.0, lon0=-122.0, x0=100, y0=50, size=5, skip=()):
+    """
+    /points answers on a regular grid: gridX follows longitude, gridY latitude.
+    """
+    return [
+        (lat0 + i * STEP, lon0 + j * STEP, office, x0 + j, y0 + i)
+        for i in range(size) for j in range(size) if (i, j) not in skip
+    ]
+
+
+def test_exact_coordinates_are_answered_from_the_hash():
+    index = GridIndex(office_samples())
+    assert index.lookup(47.02, -121.96) == (OFFICE, 102, 51)
+    assert index.get_stats()["hits"] == 1
+
+
+def test_new_coordinates_inside_the_sampled_area_are_inferred():
+    index = GridIndex(office_samples())
+    assert index.lookup(47.0405, -121.9395) == (OFFICE, 103, 52)
+    assert index.get_stats()["inferred"] == 1
+
+
+def test_string_coordinates_are_accepted():
+    index = GridIndex((str(lat), str(lon), office, x, y) for lat, lon, office, x, y in office_samples())
+    assert index.lookup("47.0405", "-121.9395") == (OFFICE, 103, 52)
+
+
+def test_points_outside_the_sampled_hull_are_not_inferred():
+    index = GridIndex(office_samples())
+    # Same spatial bin, same office, but beyond every sample
+    assert index.lookup(47.2, -121.9) is None
+
+
+def test_cells_never_returned_by_points_are_not_inferred():
+    index = GridIndex(office_samples(skip={(2, 2)}))
+    assert index.lookup(47.0401, -121.9601) is None
+    assert index.lookup(47.0201, -121.9801) == (OFFICE, 101, 51)
+
+
+def test_points_near_a_cell_boundary_are_not_inferred():
+    index = GridIndex(office_samples())
+    assert index.lookup(47.03, -121.95) is None
+
+
+def test_bins_shared_by_two_offices_are_not_inferred():
+    samples = office_samples() + [(47.09, -121.91, "PQR", 10, 10)]
+    index = GridIndex(samples)
+    assert index.lookup(47.0405, -121.9395) is None
+
+
+def test_too_few_samples_are_not_fitted():
+    index = GridIndex(office_samples(size=2))
+    assert index.lookup(47.01, -121.99) is None
+    assert index.get_stats()["misses"] == 1
+
+
+def test_added_points_replace_the_fit():
+    index = GridIndex(office_samples(skip={(2, 2)}))
+    assert index.lookup(47.0401, -121.9601) is None
+    index.add(47.04, -121.96, OFFICE, 102, 52)
+    assert index.lookup(47.0401, -121.9601) == (OFFICE, 102, 52)
+
+
+def test_convex_hull_drops_interior_and_collinear_points():
+    points = [(0, 0), (2, 0), (2, 2), (0, 2), (1, 1), (1, 0)]
+    hull = grid_index.convex_hull(points)
+    assert sorted(map(tuple, hull.tolist())) == [(0, 0), (0, 2), (2, 0), (2, 2)]
+
+
+@pytest.mark.parametrize("point, inside", [((1.0, 1.0), True), ((2.0, 1.0), True), ((2.5, 1.0), False)])
+def test_office_model_covers_its_hull(point, inside):
+    samples = [(lat, lon, 0, 0) for lat, lon in [(0, 0), (2, 0), (2, 2), (0, 2)]]
+    model = grid_index._OfficeModel(samples)
+    assert model.covers(*point) is inside
+    assert np.isfinite(model.residual)
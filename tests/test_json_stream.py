@@ -0,0 +1,85 @@
+import gzip
+import json
+import zlib
+
+import pytest
+
+import json_stream
+
+DOCUMENT = {
+    "type": "Feature",
+    "properties": {
+        "units": "us",
+        "periods": [
+            {"number": i, "name": f"Période {i}", "temperature": 50 + i, "detailed": "x" * (i * 7)}
+            for i in range(1, 21)
+        ],
+    },
+}
+BODY = json.dumps(DOCUMENT, ensure_ascii=False).encode("utf8")
+PERIODS = DOCUMENT["properties"]["periods"]
+
+
+def chunked(data, size):
+    return list(json_stream.iter_bytes(data, size))
+
+
+@pytest.mark.parametrize("size", [1, 2, 3, 7, 64, len(BODY)])
+def test_items_decode_across_any_chunk_boundary(size):
+    assert list(json_stream.iter_array_items(chunked(BODY, size), "periods")) == PERIODS
+
+
+def test_limit_stops_reading_early():
+    chunks = chunked(BODY, 16)
+    consumed = []
+
+    def source():
+        for chunk in chunks:
+            consumed.append(chunk)
+            yield chunk
+
+    items = list(json_stream.iter_array_items(source(), "periods", limit=2))
+    assert items == PERIODS[:2]
+    assert len(consumed) < len(chunks) // 2
+
+
+def test_key_appearing_as_a_value_is_skipped():
+    body = b'{"name": "periods", "note": ["periods"], "periods": [1, 2]}'
+    assert list(json_stream.iter_array_items(chunked(body, 1), "periods")) == [1, 2]
+
+
+def test_missing_key_or_non_array_value_yields_nothing():
+    assert list(json_stream.iter_array_items([b'{"other": [1, 2]}'], "periods")) == []
+    assert list(json_stream.iter_array_items([b'{"periods": {"a": 1}}'], "periods")) == []
+
+
+def test_numbers_split_at_a_chunk_end_are_not_cut_short():
+    body = b'{"list": [12345, 6.5e3, -7]}'
+    assert list(json_stream.iter_array_items(chunked(body, 4), "list")) == [12345, 6.5e3, -7]
+
+
+def test_empty_array():
+    assert list(json_stream.iter_array_items([b'{"list": [ ]}'], "list")) == []
+
+
+def test_truncated_body_raises():
+    with pytest.raises(json.JSONDecodeError):
+        list(json_stream.iter_array_items(chunked(BODY[:-40], 16), "periods"))
+
+
+@pytest.mark.parametrize("encoding, compress", [
+    ("gzip", gzip.compress),
+    ("deflate", zlib.compress),
+    ("deflate", lambda data: zlib.compress(data)[2:-4]),  # raw deflate, as some servers send it
+    ("identity", lambda data: data),
+    (None, lambda data: data),
+])
+def test_iter_decompressed_round_trips(encoding, compress):
+    chunks = chunked(compress(BODY), 5)
+    assert b"".join(json_stream.iter_decompressed(chunks, encoding)) == BODY
+    assert json_stream.decompress(compress(BODY), encoding) == BODY
+
+
+def test_unsupported_encoding_is_rejected():
+    with pytest.raises(ValueError):
+        json_stream.decompressor("br")
@@ -0,0 +1,174 @@
+import threading
+
+import pytest
+
+import rate_limit
+from rate_limit import Budget, RateLimitedError, RateLimiter
+
+HOST = "api.example.com"
+
+
+class FakeClock:
+    """
+    Stands in for the time module: time only moves when a test (or sleep) moves it.
+    """
+
+    def __init__(self, now=1_000_000.0):
+        self.now = now
+        self.slept = 0.0
+
+    def time(self):
+        return self.now
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.slept += seconds
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(rate_limit, "time", clock)
+    return clock
+
+
+@pytest.fixture
+def state_file(tmp_path):
+    return str(tmp_path / "ratelimit.json")
+
+
+def limiter(state_file, rate=1.0, burst=2):
+    return RateLimiter(state_file, budgets={HOST: Budget(rate=rate, burst=burst)})
+
+
+def test_try_acquire_takes_the_burst_then_refuses(clock, state_file):
+    rl = limiter(state_file)
+    assert rl.try_acquire(HOST) is True
+    assert rl.try_acquire(HOST) is True
+    assert rl.try_acquire(HOST) is False
+    assert rl.get_stats() == {HOST: {"granted": 2, "throttled": 1}}
+
+
+def test_tokens_refill_at_the_budget_rate(clock, state_file):
+    rl = limiter(state_file, rate=0.5)
+    rl.try_acquire(HOST)
+    rl.try_acquire(HOST)
+    clock.now += 1.0
+    assert rl.try_acquire(HOST) is False
+    clock.now += 1.0
+    assert rl.try_acquire(HOST) is True
+
+
+def test_refill_is_capped_at_the_burst(clock, state_file):
+    rl = limiter(state_file, burst=2)
+    rl.try_acquire(HOST)
+    clock.now += 3600
+    assert [rl.try_acquire(HOST) for _ in range(3)] == [True, True, False]
+
+
+def test_wait_time_does_not_spend_budget(clock, state_file):
+    rl = limiter(state_file, rate=0.25)
+    assert rl.wait_time(HOST) == 0
+    assert rl.wait_time(HOST) == 0
+    rl.try_acquire(HOST)
+    rl.try_acquire(HOST)
+    assert rl.wait_time(HOST) == pytest.approx(4.0)
+    assert rl.get_stats()[HOST]["granted"] == 2
+
+
+def test_acquire_waits_for_the_next_token(clock, state_file):
+    rl = limiter(state_file, rate=0.5)
+    rl.acquire(HOST)
+    rl.acquire(HOST)
+    rl.acquire(HOST, max_wait=5)
+    assert clock.slept == pytest.approx(2.0)
+    assert rl.get_stats() == {HOST: {"granted": 3, "throttled": 0}}
+
+
+def test_acquire_raises_when_the_wait_exceeds_max_wait(clock, state_file):
+    rl = limiter(state_file, rate=0.1)
+    rl.acquire(HOST)
+    rl.acquire(HOST)
+    with pytest.raises(RateLimitedError) as excinfo:
+        rl.acquire(HOST, max_wait=5)
+    assert excinfo.value.host == HOST
+    assert excinfo.value.retry_after == pytest.approx(10.0)
+    assert clock.slept == 0
+    assert rl.get_stats() == {HOST: {"granted": 2, "throttled": 1}}
+
+
+def test_penalize_blocks_the_host_until_retry_after(clock, state_file):
+    rl = limiter(state_file)
+    rl.penalize(HOST, "30")
+    assert rl.try_acquire(HOST) is False
+    assert rl.wait_time(HOST) == pytest.approx(30.0)
+    clock.now += 29
+    assert rl.try_acquire(HOST) is False
+    clock.now += 1
+    assert rl.try_acquire(HOST) is True
+
+
+def test_penalize_without_a_usable_retry_after_uses_the_default(clock, state_file):
+    rl = limiter(state_file)
+    rl.penalize(HOST, "Wed, 21 Oct 2015 07:28:00 GMT")
+    assert rl.wait_time(HOST) == pytest.approx(rate_limit.DEFAULT_RETRY_AFTER)
+
+
+def test_penalize_never_shortens_an_existing_block(clock, state_file):
+    rl = limiter(state_file)
+    rl.penalize(HOST, 60)
+    rl.penalize(HOST, 5)
+    assert rl.wait_time(HOST) == pytest.approx(60.0)
+
+
+def test_hosts_have_separate_budgets(clock, state_file):
+    rl = RateLimiter(state_file, budgets={HOST: Budget(rate=1.0, burst=1)})
+    assert rl.try_acquire(HOST) is True
+    assert rl.try_acquire(HOST) is False
+    # Hosts without a budget of their own get the default one
+    assert rl.try_acquire("other.example.com") is True
+
+
+def test_limiters_on_one_state_file_share_the_budget(clock, state_file):
+    a = limiter(state_file)
+    b = limiter(state_file)
+    assert a.try_acquire(HOST) is True
+    assert b.try_acquire(HOST) is True
+    assert a.try_acquire(HOST) is False
+    assert b.try_acquire(HOST) is False
+    b.penalize(HOST, 10)
+    clock.now += 5
+    assert a.wait_time(HOST) == pytest.approx(5.0)
+
+
+def test_contending_limiters_never_overspend(clock, state_file):
+    # Two limiters stand in for two processes: each opens the state file itself,
+    # so only the flock keeps their read-modify-write cycles apart
+    burst = 25
+    limiters = [limiter(state_file, rate=1e-9, burst=burst) for _ in range(2)]
+    start = threading.Barrier(8)
+
+    def hammer(rl):
+        start.wait()
+        for _ in range(20):
+            rl.try_acquire(HOST)
+
+    threads = [threading.Thread(target=hammer, args=(limiters[i % 2],)) for i in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    granted = sum(rl.get_stats()[HOST]["granted"] for rl in limiters)
+    throttled = sum(rl.get_stats()[HOST]["throttled"] for rl in limiters)
+    assert granted == burst
+    assert granted + throttled == 8 * 20
+
+
+def test_unusable_state_file_falls_back_to_memory(clock, tmp_path):
+    blocker = tmp_path / "not-a-dir"
+    blocker.write_text("")
+    rl = limiter(str(blocker / "ratelimit.json"))
+    assert [rl.try_acquire(HOST) for _ in range(3)] == [True, True, False]
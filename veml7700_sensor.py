@@ -1,7 +1,6 @@
 import time
-import board
-import busio
 from adafruit_veml7700 import VEML7700
+import i2c_bus
 
 class VEML7700Sensor:
     """
@@ -11,11 +10,12 @@ class VEML7700Sensor:
     def __init__(self, i2c=None):
         """
         Initialize the VEML7700 sensor.
-        :param i2c: Optional I2C bus object. If None, a default I2C bus is created.
+        :param i2c: Optional I2C bus object. If None, the shared bus (i2c_bus) is used.
         """
         if i2c is None:
-            i2c = busio.I2C(board.SCL, board.SDA)
-        self.sensor = VEML7700(i2c, address=0x10)
+            i2c = i2c_bus.get_bus()
+        self.address = 0x10
+        self.sensor = VEML7700(i2c, address=self.address)
 
     def read_data(self):
         """
@@ -1,8 +1,8 @@
-import urllib.request
-import json
+import coalesce
+import resilience
 from datetime import datetime
 
-OWM_ONECALL_URL = "https://api.openweathermap.org/data/3.0/onecall?lat={lat}&lon={lon}&exclude=minutely,hourly,alerts&units=metric&appid={key}"
+OWM_ONECALL_URL = "https://api.openweathermap.org/data/3.0/onecall?lat={lat}&lon={lon}&exclude=minutely,alerts&units={units}&appid={key}"
 KEY_FILE = '/private/keys/openweather.txt'
 
 class RemoteWeatherOpen:
@@ -10,19 +10,24 @@ class RemoteWeatherOpen:
     Fetch and process weather data from OpenWeatherMap One Call API.
     """
 
-    def __init__(self, lat, lon, key=None):
+    def __init__(self, lat, lon, key=None, units="metric"):
         self.lat = lat
         self.lon = lon
         if key is None:
             with open(KEY_FILE, encoding="utf-8") as f:
                 key = f.read().strip()
         self.key = key
-        self.url = OWM_ONECALL_URL.format(lat=self.lat, lon=self.lon, key=self.key)
+        self.units = units
+        self.url = OWM_ONECALL_URL.format(lat=self.lat, lon=self.lon, units=self.units, key=self.key)
         self.data = self._fetch_data()
 
     def _fetch_data(self):
-        response = urllib.request.urlopen(self.url)
-        return json.loads(response.read().decode('utf8'))
+        """
+        Fetch the One Call response (current, hourly and daily in one request)
+        through the HTTP response cache; identical requests within a refresh
+        cycle share one download.
+        """
+        return coalesce.fetch(self.url, lambda: resilience.get_json(self.url, cache=True))
 
     def get_current_weather(self):
         """
@@ -1,20 +1,25 @@
 #!/usr/bin/python3
 
-import urllib.request
-import json
-from datetime import datetime, timezone, timedelta
+import bootstrap_cache
+import coalesce
+import forecast_records
+import forecast_store
+import grid_index
+import resilience
+import solar
 
 # Constants
 DAILY_FORECAST_URL = "https://api.weather.gov/gridpoints/{gridId}/{gridX},{gridY}/forecast"
 HOURLY_FORECAST_URL = "https://api.weather.gov/gridpoints/{gridId}/{gridX},{gridY}/forecast/hourly"
-WEATHER_TIME_FORMAT = "%Y-%m-%dT%H:%M:%S%z"
+WEATHER_TIME_FORMAT = "%Y-%m-%dT%H:%M:%S%z"  # parsed by forecast_records.iso_hour/iso_date
 
 class RemoteWeather:
     """
     A class to fetch and process weather data from the National Weather Service API.
     """
 
-    def __init__(self, lat, lon):
+    def __init__(self, lat, lon, use_cache=True):
+        self.use_cache = use_cache
         self.lat = lat
         self.lon = lon
         self.grid_id = None
@@ -26,14 +31,25 @@ class RemoteWeather:
     def initialize_grid_data(self):
         """
         Fetch grid data for the given latitude and longitude to construct the forecast URL.
-        """
+        Answers from the bootstrap cache when the grid was resolved recently,
+        or from the offline grid index when it can infer the cell; /points is
+        only called for cells the index has never seen.
+        """
+        cache = bootstrap_cache.get_cache() if self.use_cache else None
+        if cache is not None:
+            grid = cache.get_grid(self.lat, self.lon) or grid_index.get_index().lookup(self.lat, self.lon)
+            if grid is not None:
+                self.grid_id, self.grid_x, self.grid_y = grid
+                return
         points_url = f"https://api.weather.gov/points/{self.lat},{self.lon}"
-        response = urllib.request.urlopen(points_url)
-        data = json.loads(response.read().decode("utf8"))
+        data = resilience.get_json(points_url)
         properties = data["properties"]
         self.grid_id = properties["gridId"]
         self.grid_x = properties["gridX"]
         self.grid_y = properties["gridY"]
+        if cache is not None:
+            cache.put_grid(self.lat, self.lon, self.grid_id, self.grid_x, self.grid_y)
+            grid_index.get_index().add(self.lat, self.lon, self.grid_id, self.grid_x, self.grid_y)
         print(self.daily_forecast_url)
 
     def get_raw_daily_forecast_data(self):
@@ -47,10 +63,10 @@ class RemoteWeather:
     
     def get_raw_forecast_data(self, url):
         """
-        Fetch raw forecast data from the API.
+        Fetch raw forecast data from the API, through the HTTP response cache.
+        Identical requests within a refresh cycle share one download.
         """
-        response = urllib.request.urlopen(url)
-        return json.loads(response.read().decode("utf8"))
+        return coalesce.fetch(url, lambda: resilience.get_json(url, cache=True))
     
     def get_raw_hourly_forecast_data(self):
         """
@@ -60,6 +76,39 @@ class RemoteWeather:
             gridId=self.grid_id, gridX=self.grid_x, gridY=self.grid_y
         )
         return self.get_raw_forecast_data(hourly_forecast_url)
+
+    def get_raw_hourly_periods(self, limit=None):
+        """
+        Fetch the raw hourly forecast periods, streaming the gzip-compressed
+        payload and decoding only the first `limit` periods.
+        """
+        url = HOURLY_FORECAST_URL.format(
+            gridId=self.grid_id, gridX=self.grid_x, gridY=self.grid_y
+        )
+        return coalesce.fetch((url, limit), lambda: resilience.get_array_items(url, "periods", limit))
+
+    def get_daily_periods(self):
+        """
+        Get the named daily forecast periods as DailyPeriod records, decoded
+        once per refresh cycle.
+        """
+        url = DAILY_FORECAST_URL.format(
+            gridId=self.grid_id, gridX=self.grid_x, gridY=self.grid_y
+        )
+        return coalesce.fetch(("daily_periods", url), lambda: forecast_records.decode_daily(
+            self.get_raw_daily_forecast_data()["properties"]["periods"]))
+
+    def get_hourly_store(self, limit=None):
+        """
+        Get the hourly forecast as a columnar ForecastStore.
+        """
+        return forecast_store.ForecastStore.from_hourly(self.get_hourly_periods(limit))
+
+    def get_hourly_periods(self, limit=None):
+        """
+        Get the hourly forecast as HourlyPeriod records, decoding at most `limit` periods.
+        """
+        return forecast_records.decode_hourly(self.get_raw_hourly_periods(limit), limit)
     
 
     def get_daily_forecast_old(self):
@@ -83,102 +132,43 @@ class RemoteWeather:
     
     def get_daily_forecast(self):
         """
-        Get the daily weather forecast for the next 7 days.
+        Get the daily weather forecast for the next 7 days: one entry per local
+        day with the daytime high, overnight low and highest precipitation chance.
         """
-        raw_data = self.get_raw_daily_forecast_data()
-        periods = raw_data["properties"]["periods"]
-        daily_forecast = []
-        current_day = None
-        low = None
-        high = None
-        max_precip = None
-
-        for period in periods:
-            print(period)
-            if period["name"] == "Tonight" or "name" == "Today":
-                continue
-            elif current_day is None or current_day != period["name"][:3]:
-                if current_day is not None:
-                    daily_forecast.append({
-                    "name": current_day,
-                    "high_temp": high,
-                    "low_temp": low,
-                    "percentageOfPrecipitation": max_precip
-                })
-                current_day = period["name"][:3]
-                max_precip = period["probabilityOfPrecipitation"].get("value", 0) or 0
-                print("max_precip:", max_precip)
-                if "Night" in period["name"]:
-                    low = period["temperature"]
-                else:
-                    high = period["temperature"]
-            else:
-                if "Night" in period["name"]:
-                    low = period["temperature"]
-                else:
-                    high = period["temperature"]
-                print("current_day:", current_day)
-                print("max_precip:", max_precip)
-                precip = period["probabilityOfPrecipitation"].get("value", 0) or 0
-                max_precip = max(max_precip, precip)
+        return forecast_store.ForecastStore.from_daily(self.get_daily_periods()).daily_summary()
 
-        return daily_forecast
-
-    def get_hourly_forecast(self):
+    def get_hourly_forecast(self, limit=None):
         """
-        Get the hourly weather forecast for the next 24 hours.
+        Get the hourly weather forecast, optionally only the first `limit` hours.
         """
-        raw_data = self.get_raw_hourly_forecast_data()
-        periods = raw_data["properties"]["periods"]
-        hourly_forecast = []
-
-        for period in periods:
-            hourly_forecast.append({
-                "hour": datetime.strptime(period["startTime"], WEATHER_TIME_FORMAT).strftime("%H"),
-                "temperature": period["temperature"],
-                "wind_speed": period["windSpeed"],
-                "wind_direction": period["windDirection"],
-                "short_forecast": period["shortForecast"],
-                "probabilityOfPrecipitation": period["probabilityOfPrecipitation"]["value"]
-            })
-        return hourly_forecast
+        return [period.as_dict() for period in self.get_hourly_periods(limit)]
 
 
     def get_current_weather(self):
         """
         Get the current weather conditions.
         """
-        current_conditions = self.get_raw_daily_forecast_data()["properties"]["periods"][0]
+        current_conditions = self.get_daily_periods()[0]
         return {
-            "temperature": current_conditions["temperature"],
-            "wind_speed": current_conditions["windSpeed"],
-            "short_forecast": current_conditions["shortForecast"],
-            "temp_unit": current_conditions["temperatureUnit"],
+            "temperature": current_conditions.temperature,
+            "wind_speed": current_conditions.wind_speed,
+            "short_forecast": current_conditions.short_forecast,
+            "temp_unit": current_conditions.temp_unit,
         }
 
     def get_sunrise(self):
         """
         Get the local sunrise time for the current lat/lon.
+        Computed locally by the solar module; no network call is made.
         """
-        url = f"https://api.sunrise-sunset.org/json?lat={self.lat}&lng={self.lon}&formatted=0"
-        response = urllib.request.urlopen(url)
-        data = json.loads(response.read().decode("utf8"))
-        sunrise_utc = datetime.fromisoformat(data["results"]["sunrise"]).replace(tzinfo=timezone.utc)
-        # Convert to local time (system local time)
-        local_sunrise = sunrise_utc.astimezone()
-        return local_sunrise.strftime("%I:%M %p")
+        return solar.get_sunrise(self.lat, self.lon)
 
     def get_sunset(self):
         """
         Get the local sunset time for the current lat/lon.
+        Computed locally by the solar module; no network call is made.
         """
-        url = f"https://api.sunrise-sunset.org/json?lat={self.lat}&lng={self.lon}&formatted=0"
-        response = urllib.request.urlopen(url)
-        data = json.loads(response.read().decode("utf8"))
-        sunset_utc = datetime.fromisoformat(data["results"]["sunset"]).replace(tzinfo=timezone.utc)
-        # Convert to local time (system local time)
-        local_sunset = sunset_utc.astimezone()
-        return local_sunset.strftime("%I:%M %p")
+        return solar.get_sunset(self.lat, self.lon)
     
 def main():
     """
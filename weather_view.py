@@ -0,0 +1,23 @@
+"""The weather dict the renderer draws from.
+
+Kept free of sensor and hardware imports, so server-side code such as fleet
+mode can build the same shape as DataAggregator without the Adafruit libraries.
+"""
+
+# Constants
+HOURLY_HORIZON = 24  # hourly periods decoded per cycle
+
+
+def compose_weather(current, daily, hourly, sunrise, sunset):
+    """
+    Compose the weather dict the renderer expects. Missing parts are left
+    empty (None, [] or '--:--').
+    """
+    return {
+        'current_temp': int(current['temperature']) if current else None,
+        'current_desc': current['short_forecast'] if current else '',
+        'daily': daily or [],
+        'hourly': hourly or [],
+        'sunrise': sunrise or '--:--',
+        'sunset': sunset or '--:--',
+    }